@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               benchmarks/run_benchmarks.py
+# Purpose:                Time the converters, the Document, and a whole Lychee action.
+#
+# Copyright (C) 2016 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Time the converters, the :class:`~lychee.document.Document`, and a whole Lychee action.
+
+Run this script from a Lychee checkout. It imports Lychee from the checkout, not an installed copy:
+
+.. sourcecode:: bash
+
+    $ python benchmarks/run_benchmarks.py --output results.json
+    $ python benchmarks/run_benchmarks.py --staves 8 --measures 64 --layers 2 --chords 0.5
+    $ python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+
+Every benchmark uses the same synthetic score, generated by :mod:`synthetic` from the size given
+on the command line. Each benchmark runs ``--repeat`` times, with any preparation (like emptying
+caches or making a new repository directory) done outside the timed part. The results are printed
+and, with ``--output``, written as JSON.
+
+With ``--baseline``, the results are compared against an earlier JSON file. A benchmark whose
+median run is more than ``--tolerance`` slower than the baseline, and more than ``--floor`` seconds
+slower, is a regression, and the script exits with status 1. The floor keeps the noise in very
+short benchmarks from being reported. The baseline must have been made with the same score size.
+Timings depend on the computer, so make your own baseline (with ``--output``) before changing
+anything, and compare against it afterward.
+
+The log messages usually printed by :func:`lychee.signals.simple_log_outputter` are turned off,
+so they don't add console output time to the results.
+'''
+
+from __future__ import print_function
+
+import argparse
+import copy
+import json
+import os.path
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+
+# the repository's root directory, so "lychee" is imported from this checkout
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lxml import etree
+
+import synthetic
+
+import lychee
+from lychee import document
+from lychee import logs
+from lychee import signals
+from lychee.converters.inbound import lilypond as inbound_lilypond
+from lychee.converters.outbound import lilypond as outbound_lilypond
+from lychee.converters.outbound import mei as outbound_mei
+from lychee.converters.outbound import verovio
+from lychee.document import cache
+from lychee.namespaces import mei
+from lychee.workflow import session
+
+
+# outbound formats registered for the "action_start" benchmark
+_ACTION_FORMATS = ('lilypond', 'mei', 'verovio')
+_ERR_SIZE_MISMATCH = 'the baseline was made with a different score size: {0}'
+
+
+class Benchmark(object):
+    '''
+    One thing to time.
+
+    Subclasses set :attr:`name` and override :meth:`run`, plus :meth:`setup`, :meth:`teardown`, and
+    :meth:`close` for work that shouldn't be timed. :meth:`setup` is called before every run, and its
+    return value is given to :meth:`run` and :meth:`teardown`. Subclasses that process a fixed
+    number of things may set :attr:`items`, so the results include the time per item.
+    '''
+
+    name = None
+    items = None
+
+    def __init__(self, score):
+        '''
+        :param str score: The synthetic LilyPond score.
+        '''
+        self.score = score
+
+    def setup(self):
+        return None
+
+    def run(self, prepared):
+        raise NotImplementedError()
+
+    def teardown(self, prepared):
+        pass
+
+    def close(self):
+        '''
+        Called once, after the last run.
+        '''
+        pass
+
+    def time(self, repeat):
+        '''
+        Run the benchmark ``repeat`` times.
+
+        :returns: The time taken by each run, in seconds.
+        :rtype: list of float
+        '''
+        times = []
+        for _ in range(repeat):
+            prepared = self.setup()
+            try:
+                start = timeit.default_timer()
+                self.run(prepared)
+                times.append(timeit.default_timer() - start)
+            finally:
+                self.teardown(prepared)
+        return times
+
+
+class InboundLilyPond(Benchmark):
+    '''
+    :func:`lychee.converters.inbound.lilypond.convert_no_signals`, with empty caches.
+    '''
+
+    name = 'inbound_lilypond'
+    backend = 'grako'
+
+    def setup(self):
+        inbound_lilypond.clear_caches()
+
+    def run(self, prepared):
+        inbound_lilypond.convert_no_signals(self.score, backend=self.backend)
+
+
+class InboundLilyPondFast(InboundLilyPond):
+    '''
+    As :class:`InboundLilyPond`, with the hand-written parser.
+    '''
+
+    name = 'inbound_lilypond_fast'
+    backend = 'fast'
+
+
+class InboundLilyPondQuiet(InboundLilyPondFast):
+    '''
+    As :class:`InboundLilyPondFast`, with the ``debug`` actions made quiet by
+    :func:`lychee.logs.set_level`.
+    '''
+
+    name = 'inbound_lilypond_quiet'
+
+    def setup(self):
+        super(InboundLilyPondQuiet, self).setup()
+        logs.set_level('info')
+
+    def teardown(self, prepared):
+        logs.set_level('debug')
+
+
+class ConvertedBenchmark(Benchmark):
+    '''
+    A benchmark that starts from the converted LMEI <section>, given to :meth:`run`.
+
+    The outbound caches are emptied before every run. If :attr:`warm` is set, the benchmark is then
+    run once to fill them, and the timed run converts a copy of the <section> with one note
+    changed, like after an action that changes one measure.
+    '''
+
+    warm = False
+
+    def __init__(self, score):
+        super(ConvertedBenchmark, self).__init__(score)
+        inbound_lilypond.clear_caches()
+        self.section = inbound_lilypond.convert_no_signals(score, backend='fast')
+        inbound_lilypond.clear_caches()
+
+        self.edited = copy.deepcopy(self.section)
+        notes = list(self.edited.iter(mei.NOTE))
+        note = notes[len(notes) // 2]
+        note.set('pname', 'd' if note.get('pname') == 'c' else 'c')
+
+    def setup(self):
+        outbound_lilypond.clear_caches()
+        outbound_mei.clear_caches()
+        verovio.clear_caches()
+        if self.warm:
+            self.run(self.section)
+            return self.edited
+        return self.section
+
+
+class OutboundLilyPond(ConvertedBenchmark):
+    '''
+    :func:`lychee.converters.outbound.lilypond.convert`
+    '''
+
+    name = 'outbound_lilypond'
+
+    def run(self, prepared):
+        outbound_lilypond.convert(prepared)
+
+
+class OutboundLilyPondWarm(OutboundLilyPond):
+    '''
+    As :class:`OutboundLilyPond`, with the fragment cache filled before one note was changed.
+    '''
+
+    name = 'outbound_lilypond_warm'
+    warm = True
+
+
+class CreateMeasures(ConvertedBenchmark):
+    '''
+    :func:`lychee.converters.outbound.mei.create_measures`
+    '''
+
+    name = 'outbound_mei_create_measures'
+
+    def run(self, prepared):
+        outbound_mei.create_measures(prepared)
+
+
+class CreateMeasuresWarm(CreateMeasures):
+    '''
+    As :class:`CreateMeasures`, with the <layer> cache filled before one note was changed.
+    '''
+
+    name = 'outbound_mei_create_measures_warm'
+    warm = True
+
+
+class FixTies(Benchmark):
+    '''
+    :func:`lychee.converters.inbound.lilypond.fix_ties_in_layer` on a <layer> of 10,000 notes and
+    chords, about a tenth of them tied. The synthetic score is not used.
+    '''
+
+    name = 'inbound_fix_ties'
+    items = 10000
+
+    def __init__(self, score):
+        super(FixTies, self).__init__(score)
+        self.layer = synthetic.make_tied_layer(self.items)
+
+    def setup(self):
+        return copy.deepcopy(self.layer)
+
+    def run(self, prepared):
+        inbound_lilypond.fix_ties_in_layer(prepared)
+
+
+class ExportForVerovio(ConvertedBenchmark):
+    '''
+    :func:`lychee.converters.outbound.verovio.export_for_verovio`
+    '''
+
+    name = 'verovio_export'
+
+    def run(self, prepared):
+        verovio.export_for_verovio(prepared)
+
+
+class ExportForVerovioWarm(ExportForVerovio):
+    '''
+    As :class:`ExportForVerovio`, with the <layer> and <measure> caches filled before one note was
+    changed.
+    '''
+
+    name = 'verovio_export_warm'
+    warm = True
+
+
+class DocumentSave(ConvertedBenchmark):
+    '''
+    :meth:`Document.save_everything` into a new repository directory.
+    '''
+
+    name = 'document_save'
+
+    def setup(self):
+        repo_dir = tempfile.mkdtemp()
+        doc = document.Document(repo_dir)
+        score = etree.Element(mei.SCORE)
+        score.append(etree.fromstring(etree.tostring(self.section)))
+        doc.put_score(score)
+        return repo_dir, doc
+
+    def run(self, prepared):
+        prepared[1].save_everything()
+
+    def teardown(self, prepared):
+        shutil.rmtree(prepared[0])
+
+
+class DocumentLoad(DocumentSave):
+    '''
+    Loading every <section> with a new :class:`Document`, with an empty section cache.
+    '''
+
+    name = 'document_load'
+
+    def setup(self):
+        repo_dir, doc = super(DocumentLoad, self).setup()
+        doc.save_everything()
+        cache.SECTION_CACHE.clear()
+        return repo_dir, doc
+
+    def run(self, prepared):
+        doc = document.Document(prepared[0])
+        for section_id in doc.get_section_ids():
+            doc.get_section(section_id)
+
+
+class ActionStart(Benchmark):
+    '''
+    A whole ``ACTION_START`` through an :class:`InteractiveSession` without VCS: the inbound
+    LilyPond conversion, the document step, and outbound conversion to LilyPond, MEI, and Verovio.
+    Each run uses a new repository directory.
+    '''
+
+    name = 'action_start'
+
+    def __init__(self, score):
+        super(ActionStart, self).__init__(score)
+        self.finished = []
+        self.session = session.InteractiveSession(vcs=None)
+        for dtype in _ACTION_FORMATS:
+            signals.outbound.REGISTER_FORMAT.emit(dtype=dtype, who=self.name)
+        signals.outbound.CONVERSION_FINISHED.connect(self._finished)
+
+    def _finished(self, dtype, **kwargs):
+        self.finished.append(dtype)
+
+    def setup(self):
+        inbound_lilypond.clear_caches()
+        outbound_lilypond.clear_caches()
+        outbound_mei.clear_caches()
+        verovio.clear_caches()
+        cache.SECTION_CACHE.clear()
+        self.finished = []
+        self.session.set_repo_dir('')
+
+    def run(self, prepared):
+        signals.ACTION_START.emit(dtype='LilyPond', doc=self.score)
+
+    def teardown(self, prepared):
+        self.session.unset_repo_dir()
+        if sorted(self.finished) != sorted(_ACTION_FORMATS):
+            raise RuntimeError('action_start did not finish: {0}'.format(self.finished))
+
+    def close(self):
+        signals.outbound.CONVERSION_FINISHED.disconnect(self._finished)
+        for dtype in _ACTION_FORMATS:
+            signals.outbound.UNREGISTER_FORMAT.emit(dtype=dtype, who=self.name)
+        # so the session can be garbage-collected before the interpreter shuts down
+        signals.ACTION_START.disconnect(self.session._action_start)
+        signals.inbound.CONVERSION_FINISH.disconnect(self.session.inbound_conversion_finish)
+        signals.inbound.VIEWS_FINISH.disconnect(self.session.inbound_views_finish)
+        self.session = None
+
+
+BENCHMARKS = (
+    InboundLilyPond,
+    InboundLilyPondFast,
+    InboundLilyPondQuiet,
+    OutboundLilyPond,
+    OutboundLilyPondWarm,
+    CreateMeasures,
+    CreateMeasuresWarm,
+    FixTies,
+    ExportForVerovio,
+    ExportForVerovioWarm,
+    DocumentSave,
+    DocumentLoad,
+    ActionStart,
+)
+
+
+def summarize_times(times, items=None):
+    '''
+    Return the fastest, median, and mean of a list of times, plus the fastest time per item if
+    ``items`` is given.
+    '''
+    ordered = sorted(times)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        median = ordered[middle]
+    else:
+        median = (ordered[middle - 1] + ordered[middle]) / 2.0
+    post = {
+        'min': ordered[0],
+        'median': median,
+        'mean': sum(ordered) / len(ordered),
+        'runs': len(ordered),
+    }
+    if items:
+        post['per_item'] = ordered[0] / items
+    return post
+
+
+def run_benchmarks(size, repeat, names=None, out=None):
+    '''
+    Run the benchmarks.
+
+    :param size: The dimensions of the synthetic score.
+    :type size: :class:`synthetic.ScoreSize`
+    :param int repeat: How many times to run each benchmark.
+    :param names: The names of the benchmarks to run. The default runs all of them.
+    :type names: list of str
+    :param out: Where to print each result as it finishes. The default is :const:`sys.stdout`.
+    :returns: The results, ready to be serialized as JSON.
+    :rtype: dict
+    '''
+    out = sys.stdout if out is None else out
+    score = synthetic.make_score(size)
+    results = {}
+
+    for benchmark_class in BENCHMARKS:
+        if names and benchmark_class.name not in names:
+            continue
+        benchmark = benchmark_class(score)
+        try:
+            summary = summarize_times(benchmark.time(repeat), benchmark.items)
+        finally:
+            benchmark.close()
+        results[benchmark_class.name] = summary
+        line = '{0:34} {1:9.4f}s min  {2:9.4f}s median'.format(
+            benchmark_class.name, summary['min'], summary['median'])
+        if 'per_item' in summary:
+            line += '  {0:7.2f}us per item'.format(summary['per_item'] * 1e6)
+        print(line, file=out)
+
+    return {
+        'lychee_version': lychee.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'size': size._asdict(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(results, baseline, tolerance, floor=0.0):
+    '''
+    Compare the median times of results against a baseline.
+
+    :param dict results: From :func:`run_benchmarks`.
+    :param dict baseline: Earlier results from :func:`run_benchmarks`.
+    :param float tolerance: How much slower a benchmark may be before it's a regression, as a
+        proportion of the baseline (so ``0.25`` allows 25% slower).
+    :param float floor: How much slower a benchmark may be before it's a regression, in seconds.
+        A benchmark is only a regression (or faster) when the difference is more than both.
+    :returns: A line of text for every benchmark in both, and the names of the regressions.
+    :rtype: 2-tuple of list of str
+    :raises: :exc:`ValueError` when the baseline was made with a different score size.
+    '''
+    if baseline['size'] != results['size']:
+        raise ValueError(_ERR_SIZE_MISMATCH.format(baseline['size']))
+
+    lines = []
+    regressions = []
+    for name in sorted(results['results']):
+        if name not in baseline['results']:
+            continue
+        now = results['results'][name]['median']
+        before = baseline['results'][name]['median']
+        ratio = now / before if before > 0 else 1.0
+        if abs(now - before) <= floor:
+            verdict = 'same'
+        elif ratio > 1.0 + tolerance:
+            regressions.append(name)
+            verdict = 'REGRESSION'
+        elif ratio < 1.0 - tolerance:
+            verdict = 'faster'
+        else:
+            verdict = 'same'
+        lines.append('{0:34} {1:9.4f}s -> {2:9.4f}s  {3:6.2f}x  {4}'.format(
+            name, before, now, ratio, verdict))
+
+    return lines, regressions
+
+
+def main(argv=None):
+    '''
+    Run the benchmarks from the command line.
+
+    :returns: The exit status: ``0`` normally, ``1`` for a regression, ``2`` for a baseline that
+        can't be compared.
+    :rtype: int
+    '''
+    default = synthetic.DEFAULT_SIZE
+    parser = argparse.ArgumentParser(description='Time the Lychee converters and workflow.')
+    parser.add_argument('--staves', type=int, default=default.staves)
+    parser.add_argument('--measures', type=int, default=default.measures)
+    parser.add_argument('--layers', type=int, default=default.layers)
+    parser.add_argument('--chords', type=float, default=default.chord_density,
+                        help='Proportion of notes that are chords (default: %(default)s).')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Runs of each benchmark (default: %(default)s).')
+    parser.add_argument('--only', action='append', metavar='NAME',
+                        choices=[x.name for x in BENCHMARKS],
+                        help='Run only this benchmark. May be given more than once.')
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    parser.add_argument('--baseline', help='Compare the results to this JSON file.')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown before a regression (default: %(default)s).')
+    parser.add_argument('--floor', type=float, default=0.005,
+                        help='Allowed slowdown in seconds, for short benchmarks '
+                             '(default: %(default)s).')
+    args = parser.parse_args(argv)
+
+    size = synthetic.ScoreSize(args.staves, args.measures, args.layers, args.chords)
+
+    signals.LOG_MESSAGE.disconnect(signals.simple_log_outputter)
+    try:
+        results = run_benchmarks(size, args.repeat, args.only)
+    finally:
+        signals.LOG_MESSAGE.connect(signals.simple_log_outputter)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=4, sort_keys=True, separators=(',', ': '))
+            output.write('\n')
+
+    if args.baseline:
+        with open(args.baseline, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+        try:
+            lines, regressions = compare(results, baseline, args.tolerance, args.floor)
+        except ValueError as exc:
+            print(exc, file=sys.stderr)
+            return 2
+        print('\ncompared with {0}:'.format(args.baseline))
+        print('\n'.join(lines))
+        if regressions:
+            print('regressions: {0}'.format(', '.join(regressions)))
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
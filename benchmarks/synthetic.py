@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               benchmarks/synthetic.py
+# Purpose:                Generate synthetic LilyPond scores for the benchmarks.
+#
+# Copyright (C) 2016 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Generate synthetic LilyPond scores for the benchmarks.
+
+The scores use only what the inbound LilyPond converter understands, and every measure fills a 4/4
+bar exactly, so the outbound converters can divide the music into measures. The same arguments
+and ``seed`` always produce the same score.
+'''
+
+import collections
+import random
+
+from lxml import etree
+
+from lychee.namespaces import mei
+
+
+ScoreSize = collections.namedtuple('ScoreSize', ('staves', 'measures', 'layers', 'chord_density'))
+'''
+The dimensions of a synthetic score: the number of staves, measures in each staff, and layers in
+each measure, plus the proportion of notes that are chords (between 0.0 and 1.0).
+'''
+
+# big enough that most benchmarks take more than a few milliseconds
+DEFAULT_SIZE = ScoreSize(staves=8, measures=32, layers=2, chord_density=0.3)
+
+# rhythms that fill a 4/4 measure
+_RHYTHMS = (
+    ('4', '4', '4', '4'),
+    ('2', '4', '4'),
+    ('8', '8', '4', '2'),
+    ('16', '16', '8', '4', '2'),
+    ('2', '2'),
+    ('1',),
+)
+_PITCH_NAMES = 'cdefgab'
+_ACCIDENTALS = ('', '', '', 'is', 'es')
+_OCTAVES = ("", "'", "'", "''")
+_CLEFS = ('treble', 'bass', 'alto', 'tenor')
+
+
+def _pitch(rng):
+    '''
+    Return a random LilyPond pitch, like ``fis''``.
+    '''
+    return rng.choice(_PITCH_NAMES) + rng.choice(_ACCIDENTALS) + rng.choice(_OCTAVES)
+
+
+def _layer(rng, chord_density):
+    '''
+    Return the notes, chords, and rests for one layer of one measure.
+    '''
+    nodes = []
+    tied_pitch = None
+    for dur in rng.choice(_RHYTHMS):
+        roll = rng.random()
+        if tied_pitch is not None:
+            nodes.append('{0}{1}'.format(tied_pitch, dur))
+            tied_pitch = None
+        elif roll < 0.1:
+            nodes.append('r{0}'.format(dur))
+        elif roll < 0.1 + chord_density:
+            pitches = sorted(set(_pitch(rng) for _ in range(3)))
+            nodes.append('<{0}>{1}'.format(' '.join(pitches), dur))
+        else:
+            pitch = _pitch(rng)
+            if rng.random() < 0.1:
+                tied_pitch = pitch
+                nodes.append('{0}{1}~'.format(pitch, dur))
+            else:
+                nodes.append('{0}{1}'.format(pitch, dur))
+    if tied_pitch is not None:
+        # the tie can't cross the barline
+        nodes[-1] = nodes[-1].rstrip('~')
+    return ' '.join(nodes)
+
+
+def make_staff(rng, size, staff_n):
+    '''
+    Return one ``\\new Staff`` block of a synthetic score.
+
+    :param rng: The source of randomness.
+    :type rng: :class:`random.Random`
+    :param size: The dimensions of the score.
+    :type size: :class:`ScoreSize`
+    :param int staff_n: The number of this staff, starting at 1.
+    :rtype: str
+    '''
+    lines = [
+        '\\new Staff {',
+        '    \\set Staff.instrumentName = "Staff {0}"'.format(staff_n),
+        '    \\clef "{0}"'.format(_CLEFS[(staff_n - 1) % len(_CLEFS)]),
+        '    \\key {0} \\major'.format(rng.choice(('c', 'g', 'f', 'd', 'bes'))),
+        '    \\time 4/4',
+    ]
+    for meas_n in range(1, size.measures + 1):
+        if size.layers == 1:
+            music = _layer(rng, size.chord_density)
+        else:
+            music = '<< {0} >>'.format(' \\\\ '.join(
+                '{{ {0} }}'.format(_layer(rng, size.chord_density)) for _ in range(size.layers)))
+        lines.append('    %{{ m.{0} %}} {1} |'.format(meas_n, music))
+    lines.append('}')
+    return '\n'.join(lines)
+
+
+def make_score(size=DEFAULT_SIZE, seed=0):
+    '''
+    Return a synthetic LilyPond score.
+
+    :param size: The dimensions of the score.
+    :type size: :class:`ScoreSize`
+    :param int seed: The seed for the random choices.
+    :returns: The LilyPond score.
+    :rtype: str
+    '''
+    rng = random.Random(seed)
+    staves = [make_staff(rng, size, staff_n) for staff_n in range(1, size.staves + 1)]
+    return '\\version "2.18.2"\n\\score {\n<<\n' + '\n'.join(staves) + '\n>>\n\\layout { }\n}\n'
+
+
+def make_tied_layer(count, seed=0):
+    '''
+    Return an LMEI <layer> with notes and chords, some with @tie="i", like the inbound LilyPond
+    converter makes before fixing the ties.
+
+    :param int count: The number of notes and chords.
+    :param int seed: The seed for the random choices.
+    :rtype: :class:`lxml.etree.Element`
+    '''
+    rng = random.Random(seed)
+    layer = etree.Element(mei.LAYER, n='1')
+    for _ in range(count):
+        if rng.random() < 0.2:
+            elem = etree.SubElement(layer, mei.CHORD, dur='4')
+            notes = [etree.SubElement(elem, mei.NOTE) for _ in range(3)]
+        else:
+            elem = etree.SubElement(layer, mei.NOTE, dur='4')
+            notes = [elem]
+        for note in notes:
+            note.set('pname', rng.choice(_PITCH_NAMES[:3]))
+            note.set('oct', '4')
+            if rng.random() < 0.1:
+                note.set('tie', 'i')
+    return layer
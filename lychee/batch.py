@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               lychee/batch.py
+# Purpose:                Convert many LilyPond and Lychee-MEI files at once.
+#
+# Copyright (C) 2016 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Convert many LilyPond and Lychee-MEI files at once.
+
+Run this module with a list of files, directories, or glob patterns:
+
+.. sourcecode:: bash
+
+    $ python -m lychee.batch --output converted/ corpus/ extra/*.ly
+
+LilyPond files (``.ly``) are converted to Lychee-MEI (``.mei``), and Lychee-MEI files are converted to
+LilyPond. Directories are searched recursively. The output files are written in a directory tree
+that mirrors the input: a file found as ``corpus/bach/wtc1.ly`` is written to
+``converted/bach/wtc1.mei``.
+
+The files are converted in a pool of processes, so that each process imports *Lychee* only once
+and the conversions use every core. The time for each file is printed as it finishes, followed by
+the number of files converted per second.
+'''
+
+from __future__ import print_function
+
+import argparse
+import collections
+import glob
+import multiprocessing
+import os
+import sys
+import timeit
+
+from lxml import etree
+
+
+# input extension -> (output extension, name of the conversion function in this module)
+CONVERSIONS = {
+    '.ly': ('.mei', 'ly_to_lmei'),
+    '.mei': ('.ly', 'lmei_to_ly'),
+}
+
+Job = collections.namedtuple('Job', ('infile', 'outfile', 'backend'))
+'''
+A file to convert: the input and output pathnames, and the LilyPond parser backend.
+'''
+
+Result = collections.namedtuple('Result', ('job', 'seconds', 'error'))
+'''
+The outcome of a :class:`Job`: how long it took, and a description of the error if it failed.
+'''
+
+
+def ly_to_lmei(document, backend=None):
+    '''
+    Convert a LilyPond document to a Lychee-MEI document.
+
+    :param str document: The LilyPond document.
+    :param str backend: The LilyPond parser backend; see
+        :func:`lychee.converters.inbound.lilypond.convert_no_signals`.
+    :returns: The serialized Lychee-MEI document.
+    :rtype: bytes
+    '''
+    from lychee.converters.inbound import lilypond
+    if isinstance(document, bytes):
+        document = document.decode('utf-8')
+    section = lilypond.convert_no_signals(document, backend=backend)
+    return etree.tostring(section, pretty_print=True)
+
+
+def lmei_to_ly(document, backend=None):
+    '''
+    Convert a Lychee-MEI document to a LilyPond document.
+
+    :param bytes document: The Lychee-MEI document.
+    :param backend: Ignored.
+    :returns: The LilyPond document, encoded as UTF-8.
+    :rtype: bytes
+    '''
+    from lychee.converters.outbound import lilypond
+    converted = lilypond.convert(etree.fromstring(document))
+    if not isinstance(converted, bytes):
+        converted = converted.encode('utf-8')
+    return converted
+
+
+def _input_root(pattern):
+    '''
+    Return the directory to which the files matched by a path or glob pattern are relative.
+
+    :param str pattern: A file, directory, or glob pattern.
+    :returns: For a directory, the directory; otherwise the longest leading part of the pattern
+        without wildcards that is a directory.
+    :rtype: str
+    '''
+    if os.path.isdir(pattern):
+        return pattern
+
+    root = []
+    for part in os.path.dirname(pattern).split(os.sep):
+        if glob.has_magic(part):
+            break
+        root.append(part)
+    return os.sep.join(root) or os.curdir
+
+
+def find_jobs(inputs, output_dir, backend=None):
+    '''
+    Find the files to convert.
+
+    :param inputs: Files, directories, or glob patterns. Directories are searched recursively.
+    :type inputs: list of str
+    :param str output_dir: The directory that will hold the mirrored output tree.
+    :param str backend: The LilyPond parser backend.
+    :returns: A job for every input file with an extension in :const:`CONVERSIONS`, in the order
+        found, without duplicates.
+    :rtype: list of :class:`Job`
+    '''
+    jobs = []
+    seen = set()
+
+    for pattern in inputs:
+        root = _input_root(pattern)
+
+        if os.path.isdir(pattern):
+            found = []
+            for dirpath, dirnames, filenames in os.walk(pattern):
+                dirnames.sort()
+                found.extend(os.path.join(dirpath, name) for name in sorted(filenames))
+        else:
+            found = sorted(glob.glob(pattern))
+
+        for infile in found:
+            base, ext = os.path.splitext(infile)
+            if ext not in CONVERSIONS or not os.path.isfile(infile):
+                continue
+            absolute = os.path.abspath(infile)
+            if absolute in seen:
+                continue
+            seen.add(absolute)
+
+            relative = os.path.relpath(base, root) + CONVERSIONS[ext][0]
+            jobs.append(Job(infile, os.path.join(output_dir, relative), backend))
+
+    return jobs
+
+
+def convert_file(job):
+    '''
+    Convert one file. This runs in the worker processes.
+
+    :param job: The file to convert.
+    :type job: :class:`Job`
+    :returns: The outcome of the conversion. Exceptions are not raised, but recorded in the result.
+    :rtype: :class:`Result`
+    '''
+    start = timeit.default_timer()
+    try:
+        converter = globals()[CONVERSIONS[os.path.splitext(job.infile)[1]][1]]
+        with open(job.infile, 'rb') as infile:
+            converted = converter(infile.read(), backend=job.backend)
+
+        outdir = os.path.dirname(job.outfile)
+        if outdir and not os.path.isdir(outdir):
+            try:
+                os.makedirs(outdir)
+            except OSError:
+                # another process may have made it
+                if not os.path.isdir(outdir):
+                    raise
+        with open(job.outfile, 'wb') as outfile:
+            outfile.write(converted)
+
+        error = None
+    except Exception as exc:
+        # only the first line, since parser errors also show the text and the grammar rules
+        message = '{0}'.format(exc).strip().split('\n')[0]
+        error = '{0}: {1}'.format(type(exc).__name__, message)
+
+    return Result(job, timeit.default_timer() - start, error)
+
+
+def run(jobs, processes=None, out=None):
+    '''
+    Convert files in a pool of processes, printing the outcome of each file as it finishes.
+
+    :param jobs: The files to convert.
+    :type jobs: list of :class:`Job`
+    :param int processes: The number of worker processes. The default is one per CPU. With ``1``,
+        files are converted in this process.
+    :param out: Where to print the results. The default is :const:`sys.stdout`.
+    :returns: The results, in the order the conversions finished, and the total time taken.
+    :rtype: 2-tuple of list of :class:`Result` and float
+    '''
+    out = sys.stdout if out is None else out
+    start = timeit.default_timer()
+    results = []
+
+    if processes == 1 or len(jobs) < 2:
+        outcomes = (convert_file(job) for job in jobs)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes)
+        outcomes = pool.imap_unordered(convert_file, jobs)
+
+    try:
+        for result in outcomes:
+            results.append(result)
+            if result.error is None:
+                print('{0:8.3f}s  {1} -> {2}'.format(result.seconds, result.job.infile,
+                                                     result.job.outfile),
+                      file=out)
+            else:
+                print('  FAILED  {0}: {1}'.format(result.job.infile, result.error), file=out)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return results, timeit.default_timer() - start
+
+
+def summarize(results, seconds):
+    '''
+    Describe the outcome of a batch.
+
+    :param results: The results from :func:`run`.
+    :param float seconds: The total time taken.
+    :returns: A one-line summary with the number of files, failures, and files per second.
+    :rtype: str
+    '''
+    failed = sum(1 for result in results if result.error is not None)
+    rate = len(results) / seconds if seconds > 0 else 0.0
+    return '{count} files in {seconds:.2f}s ({rate:.1f} files/s), {failed} failed'.format(
+        count=len(results), seconds=seconds, rate=rate, failed=failed)
+
+
+def main(argv=None):
+    '''
+    Run the batch converter from the command line.
+
+    :param argv: The command-line arguments, not including the program name. The default is
+        :const:`sys.argv`.
+    :type argv: list of str
+    :returns: The exit status: ``0`` if every file was converted, ``1`` if any failed, or ``2`` if
+        no files were found.
+    :rtype: int
+    '''
+    parser = argparse.ArgumentParser(
+        prog='python -m lychee.batch',
+        description='Convert LilyPond files to Lychee-MEI, and Lychee-MEI files to LilyPond.')
+    parser.add_argument('inputs', nargs='+', metavar='INPUT',
+                        help='A file, a directory to search recursively, or a glob pattern.')
+    parser.add_argument('-o', '--output', default='converted',
+                        help='Directory for the mirrored output tree (default: %(default)s).')
+    parser.add_argument('-j', '--processes', type=int, default=None,
+                        help='Number of worker processes (default: one per CPU).')
+    parser.add_argument('--backend', choices=('grako', 'fast'), default=None,
+                        help='LilyPond parser backend (default: grako).')
+    args = parser.parse_args(argv)
+
+    jobs = find_jobs(args.inputs, args.output, args.backend)
+    if not jobs:
+        print('no .ly or .mei files found', file=sys.stderr)
+        return 2
+
+    results, seconds = run(jobs, args.processes)
+    print(summarize(results, seconds))
+
+    return 1 if any(result.error is not None for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -48,6 +48,7 @@ OUTBOUND_CONVERTERS = {'abjad': outbound.abjad.convert,
                        'mei': outbound.mei.convert,
                        'vcs': outbound.vcs.convert,
                        'verovio': outbound.verovio.convert,
+                       'verovio-stream': outbound.verovio.convert_to_stream,
                       }
 '''
 Mapping from the lowercase name of an outbound converter format to the :func:`convert` function that
@@ -45,10 +45,17 @@ Converts a LilyPond document to a Lychee-MEI document.
 from __future__ import unicode_literals
 
 import collections
+import copy
+import hashlib
+import re
+import threading
 
 from lxml import etree
+import six
 
 from lychee import exceptions
+from lychee.converters import layers
+from lychee.converters.inbound import lilypond_fast_parser
 from lychee.converters.inbound import lilypond_parser
 from lychee import exceptions
 from lychee.logs import INBOUND_LOG as log
@@ -117,6 +124,32 @@ _CLEF_MAPPING = {
 }
 # defined at end of file: _STAFF_SETTINGS_FUNCTIONS
 
+# Maximum number of entries in the parse and converted-staff caches. Each staff in a score is its
+# own entry, so this should comfortably hold a few versions of a large orchestral score.
+_CACHE_SIZE = 256
+# (parser backend, rule name, SHA-1 of LilyPond text) -> Grako AST
+_PARSE_CACHE = collections.OrderedDict()
+# id() of a staff's Grako AST -> (the AST, @n of the staff, <staff> elements, <staffDef> attributes)
+_STAFF_CACHE = collections.OrderedDict()
+
+# The parser backends that may be given to convert_no_signals(). They accept the same grammar and
+# produce the same ASTs, but the "fast" parser is hand-written rather than generated by Grako.
+BACKENDS = {
+    'grako': lilypond_parser.LilyPondParser,
+    'fast': lilypond_fast_parser.FastLilyPondParser,
+}
+DEFAULT_BACKEND = 'grako'
+_ERR_UNKNOWN_BACKEND = 'unknown LilyPond parser backend: {0}'
+
+# backend name -> the parser shared by all conversions, and the lock that protects parsers and caches
+_PARSERS = {}
+_PARSER_LOCK = threading.RLock()
+
+# finds comments, strings, the start of a "\new Staff" block, and braces
+_STAFF_TOKENS = re.compile(r'%\{.*?%\}|"[^"]*"|(\\new\s+Staff\s*\{)|(\{)|(\})')
+# used in place of each staff when parsing the rest of a score
+_PLACEHOLDER_STAFF = '\\new Staff { s }'
+
 
 def check(condition, message=None):
     """
@@ -155,33 +188,298 @@ def convert(document, **kwargs):
     :rtype: :class:`xml.etree.ElementTree.Element` or :class:`xml.etree.ElementTree.ElementTree`
     '''
     inbound.CONVERSION_STARTED.emit()
-    section = convert_no_signals(document)
+    section = convert_no_signals(document,
+                                 backend=kwargs.get('backend'),
+                                 streaming=kwargs.get('streaming', False))
     inbound.CONVERSION_FINISH.emit(converted=section)
     return section
 
 
-def convert_no_signals(document):
+def convert_no_signals(document, backend=None, streaming=False):
     '''
     It's the convert() function that returns the converted document rather than emitting it with
     the CONVERSION_FINISHED signal. Mostly for testing.
+
+    :param str document: The LilyPond document.
+    :param str backend: The parser to use: either ``'grako'`` for the Grako-generated parser or
+        ``'fast'`` for the hand-written parser. Defaults to :const:`DEFAULT_BACKEND`.
+    :param bool streaming: Whether to parse and convert a ``\\score`` one staff at a time.
+    :raises: :exc:`~lychee.exceptions.LilyPondError` when ``backend`` is not in :const:`BACKENDS`.
+
+    Parsed LilyPond documents and converted staves are cached, so converting the same text again,
+    or a score in which only some of the staves changed, only parses and converts what's new.
+
+    With ``streaming``, each staff is converted into the <section> as soon as it is parsed, then its
+    parsed form is discarded. The caches are not used, since they would hold every staff. Use this
+    for very long scores, so that memory use depends on the largest staff, not the whole score.
     '''
     # NOTE: this function has no tests because it will soon be changed; see T113
 
+    backend = DEFAULT_BACKEND if backend is None else backend
+    check(backend in BACKENDS, _ERR_UNKNOWN_BACKEND.format(backend))
+
+    if streaming:
+        return _convert_streaming(document, backend)
+
+    with log.info('parse LilyPond') as action:
+        parsed = parse(document, backend)
+
+    with log.info('convert LilyPond') as action:
+        converted = do_score(_as_score(parsed))
+
+    return converted
+
+
+def _as_score(parsed):
+    '''
+    Return the Grako AST of a whole document as a score, checking the version of a score.
+
+    :raises: :exc:`RuntimeError` when ``parsed`` is neither a score nor a staff.
+    '''
+    if parsed['ly_type'] == 'score':
+        check_version(parsed)
+    elif parsed['ly_type'] == 'staff':
+        parsed = {'ly_type': 'score', 'staves': [parsed]}
+    else:
+        raise RuntimeError('need score, staff, or measures for the top-level thing')
+    return parsed
+
+
+def _convert_streaming(document, backend):
+    '''
+    Convert a LilyPond document one staff at a time, for :func:`convert_no_signals`.
+
+    :param str document: The LilyPond document.
+    :param str backend: A key in :const:`BACKENDS`.
+    :returns: A converted Lychee-MEI <section> element.
+    :rtype: :class:`lxml.etree.Element`
+
+    The score is parsed with placeholders instead of the staves, then each staff is parsed and
+    converted in turn. If the staves can't be found this way, the whole document is parsed at once,
+    but each staff is still discarded once it's converted.
+    '''
+    spans = _find_staves(document) if '\\score' in document else None
     with log.info('parse LilyPond') as action:
-        parser = lilypond_parser.LilyPondParser(parseinfo=False)
-        parsed = parser.parse(document, filename='file', trace=False)
+        if spans:
+            l_score = _parse_uncached(_skeleton(document, spans), 'start', backend)
+            if l_score['ly_type'] != 'score' or len(l_score['staves']) != len(spans):
+                spans = None
+        if not spans:
+            l_score = _parse_uncached(document, 'start', backend)
 
     with log.info('convert LilyPond') as action:
-        if parsed['ly_type'] == 'score':
-            check_version(parsed)
-        elif parsed['ly_type'] == 'staff':
-            parsed = {'ly_type': 'score', 'staves': [parsed]}
+        l_score = _as_score(l_score)
+        if spans:
+            l_staves = (_parse_uncached(document[start:end], 'staff', backend) for start, end in spans)
         else:
-            raise RuntimeError('need score, staff, or measures for the top-level thing')
+            l_staves = _pop_each(list(l_score['staves']))
+        del l_score
 
-        converted = do_score(parsed)
+        m_section = _make_section(l_staves, do_staff)
 
-    return converted
+    return m_section
+
+
+def _make_section(l_staves, do_one_staff):
+    '''
+    Make an LMEI <section> with a <staffDef> in its <scoreDef> for every staff, then convert every
+    staff into the <section>.
+
+    :param l_staves: The LilyPond staves as parsed by Grako. This may be a generator, in which case
+        each staff is forgotten before the next is parsed.
+    :type l_staves: iterable of dict
+    :param do_one_staff: Converts one staff, called like :func:`do_staff` but without the action.
+    :type do_one_staff: callable
+    :returns: A converted Lychee-MEI <section> element.
+    :rtype: :class:`lxml.etree.Element`
+    '''
+    m_section = etree.Element(mei.SECTION)
+    m_scoredef = etree.SubElement(m_section, mei.SCORE_DEF)
+    m_staffgrp = etree.SubElement(m_scoredef, mei.STAFF_GRP)
+
+    # not enumerate(), which would keep a reference to each staff until the next is parsed
+    staff_n = 0
+    for l_staff in l_staves:
+        # @n starts at one
+        staff_n += 1
+        m_staffdef = etree.SubElement(m_staffgrp, mei.STAFF_DEF, {'n': str(staff_n), 'lines': '5'})
+        do_one_staff(l_staff, m_section, m_staffdef)
+        # forget this staff before parsing the next one
+        del l_staff
+
+    return m_section
+
+
+def _pop_each(items):
+    '''
+    Yield each of "items" in order, removing it from the list first.
+    '''
+    items.reverse()
+    while items:
+        yield items.pop()
+
+
+def clear_caches():
+    '''
+    Empty the caches of parsed LilyPond documents and converted staves.
+    '''
+    with _PARSER_LOCK:
+        _PARSE_CACHE.clear()
+        _STAFF_CACHE.clear()
+
+
+def _cache_get(cache, key):
+    '''
+    Return the value for "key" in an LRU "cache," or ``None``.
+    '''
+    value = cache.pop(key, None)
+    if value is not None:
+        cache[key] = value
+    return value
+
+
+def _cache_put(cache, key, value):
+    '''
+    Add "value" to an LRU "cache," discarding the least-recently used entries above _CACHE_SIZE.
+    '''
+    cache[key] = value
+    while len(cache) > _CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def _parse_rule(text, rule_name, backend=DEFAULT_BACKEND):
+    '''
+    Parse "text" with the shared parser for "backend," or return a cached AST for the same text.
+
+    :param str text: The LilyPond text to parse.
+    :param str rule_name: The grammar rule with which to start parsing.
+    :param str backend: A key in :const:`BACKENDS`.
+    :returns: The Grako AST. It must not be modified, since it may be returned again later.
+    :raises: :exc:`grako.exceptions.FailedParse` when "text" cannot be parsed.
+    '''
+    encoded = text.encode('utf-8') if isinstance(text, six.text_type) else text
+    key = (backend, rule_name, hashlib.sha1(encoded).hexdigest())
+
+    with _PARSER_LOCK:
+        parsed = _cache_get(_PARSE_CACHE, key)
+        if parsed is None:
+            parsed = _parse_uncached(text, rule_name, backend)
+            _cache_put(_PARSE_CACHE, key, parsed)
+
+    return parsed
+
+
+def _parse_uncached(text, rule_name, backend=DEFAULT_BACKEND):
+    '''
+    Parse "text" with the shared parser for "backend," without using the cache.
+
+    Arguments and return value are as for :func:`_parse_rule`, except the caller owns the AST.
+    '''
+    with _PARSER_LOCK:
+        parser = _PARSERS.get(backend)
+        if parser is None:
+            parser = _PARSERS[backend] = BACKENDS[backend](parseinfo=False)
+        parsed = parser.parse(text, rule_name=rule_name, filename='file', trace=False)
+        if getattr(parser, 'notes_per_second', None) is not None:
+            with log.debug('LilyPond parser throughput') as action:
+                action.success('{notes} notes at {rate} notes per second',
+                               notes=parser.note_count,
+                               rate=int(parser.notes_per_second))
+
+    return parsed
+
+
+def _find_staves(document):
+    '''
+    Find the "\\new Staff" blocks in a LilyPond score.
+
+    :param str document: The LilyPond document.
+    :returns: A list of (start, end) indices of each staff, or ``None`` if the braces don't match.
+    :rtype: list of tuple of int
+    '''
+    spans = []
+    depth = 0
+    start = None
+    start_depth = None
+    for match in _STAFF_TOKENS.finditer(document):
+        new_staff, brace_l, brace_r = match.groups()
+        if new_staff:
+            if start is None:
+                start = match.start()
+                start_depth = depth
+            depth += 1
+        elif brace_l:
+            depth += 1
+        elif brace_r:
+            depth -= 1
+            if depth < 0:
+                return None
+            elif depth == start_depth:
+                spans.append((start, match.end()))
+                start = start_depth = None
+
+    if depth != 0:
+        return None
+
+    return spans
+
+
+def _skeleton(document, spans):
+    '''
+    Return a LilyPond score with a placeholder instead of each staff.
+
+    :param str document: The LilyPond document.
+    :param spans: The (start, end) indices of each staff, as returned by :func:`_find_staves`.
+    :returns: The document with each staff replaced by :const:`_PLACEHOLDER_STAFF`.
+    :rtype: str
+    '''
+    skeleton = []
+    previous_end = 0
+    for start, end in spans:
+        skeleton.append(document[previous_end:start])
+        skeleton.append(_PLACEHOLDER_STAFF)
+        previous_end = end
+    skeleton.append(document[previous_end:])
+    return ''.join(skeleton)
+
+
+def parse(document, backend=DEFAULT_BACKEND):
+    '''
+    Parse a LilyPond document into a Grako AST.
+
+    :param str document: The LilyPond document.
+    :param str backend: A key in :const:`BACKENDS`.
+    :returns: The Grako AST. It must not be modified, since it may be returned again later.
+    :raises: :exc:`grako.exceptions.FailedParse` when ``document`` cannot be parsed.
+
+    The parser is shared, and the results are cached by the hash of the text. In a
+    ``\\score``, each ``\\new Staff`` block is parsed and cached separately, so that only the
+    staves whose text changed since an earlier call are parsed again.
+    '''
+    whole_key = (backend, 'start', hashlib.sha1(
+        document.encode('utf-8') if isinstance(document, six.text_type) else document).hexdigest())
+    with _PARSER_LOCK:
+        parsed = _cache_get(_PARSE_CACHE, whole_key)
+    if parsed is not None:
+        return parsed
+
+    spans = _find_staves(document) if '\\score' in document else None
+    if not spans:
+        return _parse_rule(document, 'start', backend)
+
+    # parse the score with placeholders instead of the staves, then each staff by itself
+    staves = [_parse_rule(document[start:end], 'staff', backend) for start, end in spans]
+    parsed = _parse_rule(_skeleton(document, spans), 'start', backend)
+    if parsed['ly_type'] != 'score' or len(parsed['staves']) != len(staves):
+        # the staves weren't where _find_staves() thought; this is unusual, so do it the slow way
+        return _parse_rule(document, 'start', backend)
+
+    parsed = dict(parsed)
+    parsed['staves'] = staves
+    with _PARSER_LOCK:
+        _cache_put(_PARSE_CACHE, whole_key, parsed)
+
+    return parsed
 
 
 @log.wrap('info', 'check syntax version', 'action')
@@ -211,17 +509,36 @@ def do_score(l_score):
     :rtype: :class:`lxml.etree.Element`
     '''
     check(l_score['ly_type'] == 'score', 'did not receive a score')
+    return _make_section(l_score['staves'], _do_staff_cached)
 
-    m_section = etree.Element(mei.SECTION)
-    m_scoredef = etree.SubElement(m_section, mei.SCORE_DEF)
-    m_staffgrp = etree.SubElement(m_scoredef, mei.STAFF_GRP)
 
-    for staff_n, l_staff in enumerate(l_score['staves']):
-        # we have to add one to staff_n or else the @n attributes would start at zero!
-        m_staffdef = etree.SubElement(m_staffgrp, mei.STAFF_DEF, {'n': str(staff_n + 1), 'lines': '5'})
-        do_staff(l_staff, m_section, m_staffdef)
+def _do_staff_cached(l_staff, m_section, m_staffdef):
+    '''
+    Call :func:`do_staff`, or reuse the result of an earlier call with the same ``l_staff`` object.
 
-    return m_section
+    Arguments are as for :func:`do_staff`. Because :func:`parse` returns the same AST object for the
+    same staff text, this means unchanged staves are not converted again.
+    '''
+    staff_n = m_staffdef.get('n')
+    with _PARSER_LOCK:
+        cached = _cache_get(_STAFF_CACHE, id(l_staff))
+
+    if cached is not None and cached[0] is l_staff and cached[1] == staff_n:
+        for m_staff in cached[2]:
+            m_section.append(copy.deepcopy(m_staff))
+        for name, value in cached[3]:
+            m_staffdef.set(name, value)
+        return
+
+    m_temp = etree.Element(mei.SECTION)
+    do_staff(l_staff, m_temp, m_staffdef)
+    m_staves = list(m_temp)
+    with _PARSER_LOCK:
+        _cache_put(_STAFF_CACHE, id(l_staff), (l_staff, staff_n,
+                                               [copy.deepcopy(x) for x in m_staves],
+                                               m_staffdef.items()))
+    for m_staff in m_staves:
+        m_section.append(m_staff)
 
 
 @log.wrap('debug', 'set clef', 'action')
@@ -306,7 +623,7 @@ def postprocess_staff(m_staff):
         m_staffdef.set('n', staff_number)
 
 
-@log.wrap('info', 'convert staff', 'action')
+@log.wrap('info', 'convert staff', 'action', summarize=True)
 def do_staff(l_staff, m_section, m_staffdef, action):
     '''
     :param dict l_staff: The LilyPond Staff context from Grako.
@@ -360,108 +677,20 @@ def do_staff(l_staff, m_section, m_staffdef, action):
             postprocess_staff(m_each_staff)
 
 
-def note_pitch(m_note):
-    '''
-    Return a tuple uniquely identifying the pitch of an LMEI node.
-    '''
-    return (m_note.get('oct'), m_note.get('pname'), m_note.get('accid.ges', 'n'))
-
-
-@log.wrap('debug', 'remove unterminated tie', 'action')
-def _maybe_remove_unterminated_tie(note, target_pitches, action):
-    '''
-    :param note: The note to inspect.
-    :param target_pitches: A set of pitches that the note could possibly tie to.
-
-    If the given note tries to start a tie, then check to see if the
-    tie is terminated by any of the target pitches or not. If it's
-    unterminated, remove it. If it's terminated, make sure it is set
-    to initial.
-    '''
-    if note.attrib.get('tie', None) in ('i', 'm'):
-        pitch = note_pitch(note)
-        if pitch not in target_pitches:
-            action.failure('unterminated tie')
-            del note.attrib['tie']
-        else:
-            note.attrib['tie'] = 'i'
-
-
-@log.wrap('debug', 'set medial or final tie attribute')
-def _fix_tie_target(note, pitch_map):
-    '''
-    :param note: The note that might begin a tie.
-    :param dict pitch_map: A dict mapping pitches to notes.
-
-    If the note begins or continues a tie, find the note that
-    it is tied to and set its @tie to either 'm' or 't'.
-    '''
-    if note.attrib.get('tie', None) in ('i', 'm'):
-        pitch = note_pitch(note)
-        target_node = pitch_map[pitch]
-        if target_node.attrib.get('tie', None) in ('i', 'm'):
-            target_node.attrib['tie'] = 'm'
-        else:
-            target_node.attrib['tie'] = 't'
-
-
 @log.wrap('debug', 'fix ties', 'action')
 def fix_ties_in_layer(m_layer, action):
     '''
     Fix @tie attribute values in an LMEI <layer> element.
+
+    Unterminated ties are removed, and the others are set to initial, medial, or terminal. Refer
+    to :func:`lychee.converters.layers.resolve_ties`.
     '''
+    removed = layers.resolve_ties(m_layer)
+    if removed:
+        action.failure('removed {count} unterminated ties', count=removed)
+
 
-    # In the first pass, we remove all unterminated ties and set all ties to initial.
-
-    for i in range(len(m_layer)):
-        node = m_layer[i]
-
-        # next_pitches is the set of pitches that can be tied to in the next node.
-        # If the next node is a rest, spacer, etc. then next_pitches is empty,
-        # meaning that all ties from the current node are unterminated. next_pitches
-        # is also empty on the last node in the layer, since it can't tie to anything.
-        next_pitches = frozenset()
-        if i != len(m_layer) - 1:
-            next_node = m_layer[i + 1]
-            if next_node.tag == mei.NOTE:
-                next_pitches = frozenset([note_pitch(next_node)])
-            elif next_node.tag == mei.CHORD:
-                next_pitches = frozenset([note_pitch(note) for note in next_node])
-
-        if node.tag == mei.NOTE:
-            _maybe_remove_unterminated_tie(node, next_pitches)
-        elif node.tag == mei.CHORD:
-            for note in node:
-                _maybe_remove_unterminated_tie(note, next_pitches)
-
-    # In the second pass, we change some initial @ties to medial @ties,
-    # and add some final @ties as necessary.
-
-    for i in range(len(m_layer) - 1):
-        node = m_layer[i]
-        next_node = m_layer[i + 1]
-
-        # In the first pass, we used a set of pitches. But this time, we need to
-        # be able to get the node corresponding to each pitch, so we use a dict
-        # mapping pitches to the next node.
-
-        # This doesn't account for duplicate notes in a chord (e.g. <c c g>).
-        # Whatever, I don't even know if MEI supports that.
-        pitch_map = {}
-        if next_node.tag == mei.NOTE:
-            pitch_map[note_pitch(next_node)] = next_node
-        elif next_node.tag == mei.CHORD:
-            for note in next_node:
-                pitch_map[note_pitch(note)] = note
-
-        if node.tag == mei.NOTE:
-            _fix_tie_target(node, pitch_map)
-        elif node.tag == mei.CHORD:
-            for note in node:
-                _fix_tie_target(note, pitch_map)
-
-
-@log.wrap('debug', 'convert voice/layer', 'action')
+@log.wrap('debug', 'convert voice/layer', 'action', summarize=True)
 def do_layer(l_layer, m_container, layer_n, action):
     '''
     Convert a LilyPond Voice context into an LMEI <layer> element.
@@ -0,0 +1,648 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               lychee/converters/inbound/lilypond_fast_parser.py
+# Purpose:                Hand-written parser for the LilyPond grammar in "lilypond.ebnf".
+#
+# Copyright (C) 2016 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Hand-written parser for the LilyPond grammar in "lilypond.ebnf".
+
+:class:`FastLilyPondParser` is a drop-in replacement for the Grako-generated
+:class:`~lychee.converters.inbound.lilypond_parser.LilyPondParser`. It accepts the same input,
+produces the same dictionaries (with ``ly_type`` keys and so on), and raises the same Grako
+exceptions when the input cannot be parsed. Rather than backtracking through every alternative, it
+matches tokens with precompiled regular expressions and chooses each grammar rule by looking at the
+next character, which is much faster on large scores.
+
+.. note:: If you change "lilypond.ebnf," you must update this module as well. The tests in
+    "test_lilypond_parser.py" run against both parsers.
+
+.. warning::
+    This module is intended for internal *Lychee* use only, so the API may change without notice.
+'''
+
+from __future__ import unicode_literals
+
+import re
+import timeit
+
+from grako import buffering
+from grako import exceptions as grako_exc
+
+
+_RE_FLAGS = re.UNICODE | re.MULTILINE
+
+# whitespace and comments, as Grako skips them before every token and rule
+_SKIP = re.compile(r'(?:\s+|%\{.*?%\})*', _RE_FLAGS)
+_PITCH_NAME = re.compile(r'[a-g]', _RE_FLAGS)
+_ACCIDENTAL_SYMBOL = re.compile(r'[ei]s', _RE_FLAGS)
+_OCTAVE = re.compile(r",,|,|'''''|''''|'''|''|'", _RE_FLAGS)
+_ACCIDENTAL_FORCE = re.compile(r'[?!]', _RE_FLAGS)
+_DURATION_NUMBER = re.compile(r'512|256|128|64|32|16|8|4|2|1', _RE_FLAGS)
+_TIME_NUMERATOR = re.compile(r'[1-9][0-9]?', _RE_FLAGS)
+_VERSION_PART = re.compile(r'[0-9]*', _RE_FLAGS)
+_INSTR_NAME = re.compile(r'[A-Z a-z0-9&]*', _RE_FLAGS)
+_NAME_CHAR = re.compile(r'\w', _RE_FLAGS)
+
+
+class Node(dict):
+    '''
+    A parsed grammar rule. Like Grako's :class:`~grako.ast.AST`, a missing key returns ``None``.
+    '''
+
+    def __missing__(self, key):
+        return None
+
+    def asjson(self):
+        '''
+        Return this node as nested plain dictionaries and lists.
+        '''
+        return _asjson(self)
+
+
+def _asjson(obj):
+    '''
+    Convert nested :class:`Node` objects and lists to plain dictionaries and lists.
+    '''
+    if isinstance(obj, dict):
+        return {key: _asjson(value) for key, value in obj.items()}
+    elif isinstance(obj, list):
+        return [_asjson(each) for each in obj]
+    else:
+        return obj
+
+
+class _Miss(Exception):
+    '''
+    Raised internally when a rule does not match, so the caller may try something else. This is
+    like a Grako :exc:`FailedParse` that hasn't passed a "cut."
+    '''
+
+    def __init__(self, pos, message, etype=grako_exc.FailedParse):
+        super(_Miss, self).__init__(message)
+        self.pos = pos
+        self.message = message
+        self.etype = etype
+
+
+class FastLilyPondParser(object):
+    '''
+    Parse LilyPond with the grammar in "lilypond.ebnf."
+
+    After each call to :meth:`parse`, :attr:`note_count` holds the number of notes parsed (including
+    each note in a chord), :attr:`seconds` holds the time spent parsing, and :attr:`notes_per_second`
+    holds the parser's throughput (or ``None`` if no time was measured).
+    '''
+
+    def __init__(self, **kwargs):
+        '''
+        Keyword arguments are accepted for compatibility with :class:`LilyPondParser`, and ignored.
+        '''
+        self._text = ''
+        self._pos = 0
+        self._filename = None
+        self._rule_name = None
+        self.note_count = 0
+        self.seconds = 0.0
+        self.notes_per_second = None
+
+    def parse(self, text, rule_name='start', filename=None, **kwargs):
+        '''
+        Parse ``text`` starting with the grammar rule called ``rule_name``.
+
+        :param str text: The LilyPond text to parse.
+        :param str rule_name: The name of a rule in "lilypond.ebnf."
+        :param str filename: The filename to use in error messages.
+        :returns: The parsed rule.
+        :rtype: :class:`Node`, list, or str, depending on the rule
+        :raises: :exc:`grako.exceptions.FailedParse` (or a subclass) when ``text`` cannot be parsed.
+        :raises: :exc:`AttributeError` when ``rule_name`` is not a rule in the grammar.
+
+        As with :class:`LilyPondParser`, there is no check that all of ``text`` was consumed.
+        '''
+        rule = getattr(self, '_{0}_'.format(rule_name))
+
+        if isinstance(text, bytes):
+            # comparing unicode tokens with a bytestring decodes the whole string every time
+            text = text.decode('utf-8')
+
+        self._text = text
+        self._pos = 0
+        self._filename = filename
+        self._rule_name = rule_name
+        self.note_count = 0
+
+        start_time = timeit.default_timer()
+        try:
+            return rule()
+        except _Miss as miss:
+            raise self._failure(miss.pos, miss.message, miss.etype)
+        finally:
+            self.seconds = timeit.default_timer() - start_time
+            if self.seconds > 0:
+                self.notes_per_second = self.note_count / self.seconds
+            else:
+                self.notes_per_second = None
+
+    # Helpers
+    ##########
+
+    def _failure(self, pos, message, etype=grako_exc.FailedParse):
+        '''
+        Make a Grako exception for a failure at ``pos``.
+        '''
+        buf = buffering.Buffer(self._text, filename=self._filename or '')
+        buf.goto(pos)
+        return etype(buf, [self._rule_name], message)
+
+    def _miss(self, message, etype=grako_exc.FailedParse):
+        '''
+        Return a :exc:`_Miss` for the current position.
+        '''
+        return _Miss(self._pos, message, etype)
+
+    def _cut(self, miss):
+        '''
+        Return the exception for a :exc:`_Miss` that happened after a Grako "cut." It is not a
+        :exc:`_Miss`, so no alternative is tried and the whole parse fails.
+        '''
+        return self._failure(miss.pos, miss.message, miss.etype)
+
+    def _skip(self):
+        '''
+        Skip whitespace and comments, and return the next character (or an empty string).
+        '''
+        self._pos = _SKIP.match(self._text, self._pos).end()
+        return self._text[self._pos:self._pos + 1]
+
+    def _token(self, token, nameguard=False):
+        '''
+        Skip whitespace, then consume ``token`` if it's next.
+
+        :returns: Whether ``token`` was consumed.
+        :rtype: bool
+
+        With ``nameguard``, the token doesn't match if it's immediately followed by a letter or digit.
+        '''
+        self._skip()
+        if self._text.startswith(token, self._pos):
+            end = self._pos + len(token)
+            if nameguard and _NAME_CHAR.match(self._text, end):
+                return False
+            self._pos = end
+            return True
+        return False
+
+    def _expect(self, token, nameguard=False):
+        '''
+        As :meth:`_token`, but raise :exc:`_Miss` if ``token`` isn't next.
+        '''
+        if not self._token(token, nameguard):
+            raise self._miss("expecting '{0}'".format(token), grako_exc.FailedToken)
+        return token
+
+    def _match(self, regexp, skip=True):
+        '''
+        Match ``regexp`` at the current position, optionally after skipping whitespace.
+
+        :returns: The matched text, or ``None``.
+        '''
+        if skip:
+            self._skip()
+        match = regexp.match(self._text, self._pos)
+        if match is None:
+            return None
+        self._pos = match.end()
+        return match.group()
+
+    def _require(self, regexp, name, skip=True):
+        '''
+        As :meth:`_match`, but raise :exc:`_Miss` if ``regexp`` doesn't match.
+        '''
+        matched = self._match(regexp, skip)
+        if matched is None:
+            raise self._miss('Expecting <{0}>'.format(name))
+        return matched
+
+    def _attempt(self, rule):
+        '''
+        Call ``rule``. If it doesn't match, restore the position and return ``None``.
+        '''
+        pos = self._pos
+        note_count = self.note_count
+        try:
+            return rule()
+        except _Miss:
+            self._pos = pos
+            self.note_count = note_count
+            return None
+
+    # Document
+    ###########
+
+    def _start_(self):
+        for rule in (self._score_, self._staff_, self._staff_content_):
+            node = self._attempt(rule)
+            if node is not None:
+                return node
+        raise self._miss('no available options')
+
+    def _version_stmt_(self):
+        self._expect('\\version')
+        self._expect('"')
+        parts = [self._match(_VERSION_PART, skip=False)]
+        while self._token('.'):
+            parts.append(self._match(_VERSION_PART, skip=False))
+        self._expect('"')
+        return parts
+
+    # Staff Settings
+    #################
+
+    def _instr_name_(self):
+        self._expect('\\set')
+        self._expect('Staff.instrumentName')
+        try:
+            self._expect('=')
+            self._expect('"')
+            name = self._match(_INSTR_NAME, skip=False)
+            self._expect('"')
+        except _Miss as miss:
+            raise self._cut(miss)
+        return Node(ly_type='instr_name', name=name)
+
+    def _clef_(self):
+        self._expect('\\clef')
+        try:
+            self._expect('"')
+            for clef_type in ('bass', 'tenor', 'alto', 'treble'):
+                if self._token(clef_type, nameguard=True):
+                    break
+            else:
+                raise self._miss('expecting one of: alto bass tenor treble')
+            self._expect('"')
+        except _Miss as miss:
+            raise self._cut(miss)
+        return Node(ly_type='clef', type=clef_type)
+
+    def _key_(self):
+        self._expect('\\key')
+        try:
+            keynote = self._require(_PITCH_NAME, 'pitch_name')
+            accid = self._match(_ACCIDENTAL_SYMBOL)
+            self._expect('\\')
+            for mode in ('major', 'minor'):
+                if self._token(mode, nameguard=True):
+                    break
+            else:
+                raise self._miss('expecting one of: major minor')
+        except _Miss as miss:
+            raise self._cut(miss)
+        return Node(ly_type='key', keynote=keynote, accid=accid, mode=mode)
+
+    def _time_numerator_(self):
+        return self._require(_TIME_NUMERATOR, 'time_numerator')
+
+    def _time_(self):
+        self._expect('\\time')
+        try:
+            count = self._require(_TIME_NUMERATOR, 'time_numerator')
+            self._expect('/')
+            unit = self._require(_DURATION_NUMBER, 'duration_number')
+        except _Miss as miss:
+            raise self._cut(miss)
+        return Node(ly_type='time', count=count, unit=unit)
+
+    def _choose(self, rule):
+        '''
+        Call ``rule``, chosen by looking ahead, as one option of a choice. If it doesn't match, raise
+        :exc:`_Miss` like a choice with no matching options.
+        '''
+        pos = self._pos
+        note_count = self.note_count
+        try:
+            return rule()
+        except _Miss:
+            self._pos = pos
+            self.note_count = note_count
+            raise self._miss('no available options')
+
+    def _staff_setting_(self):
+        if self._skip() == '\\':
+            text = self._text
+            pos = self._pos
+            if text.startswith('\\clef', pos):
+                return self._choose(self._clef_)
+            elif text.startswith('\\key', pos):
+                return self._choose(self._key_)
+            elif text.startswith('\\time', pos):
+                return self._choose(self._time_)
+            elif text.startswith('\\set', pos):
+                return self._choose(self._instr_name_)
+        raise self._miss('no available options')
+
+    # Nodes: notes, rests, chords, spacers
+    #######################################
+
+    def _pitch_name_(self):
+        return self._require(_PITCH_NAME, 'pitch_name')
+
+    def _octave_(self):
+        octave = self._match(_OCTAVE)
+        if octave is None:
+            raise self._miss("expecting one of: ' '' ''' '''' ''''' , ,,")
+        return octave
+
+    def _accidental_symbol_(self):
+        return self._require(_ACCIDENTAL_SYMBOL, 'accidental_symbol')
+
+    def _accidental_(self):
+        accid = []
+        while True:
+            symbol = self._match(_ACCIDENTAL_SYMBOL)
+            if symbol is None:
+                return accid
+            accid.append(symbol)
+
+    def _accidental_force_(self):
+        force = self._match(_ACCIDENTAL_FORCE)
+        if force is None:
+            raise self._miss('expecting one of: ! ?')
+        return force
+
+    def _duration_number_(self):
+        number = self._match(_DURATION_NUMBER)
+        if number is None:
+            raise self._miss('expecting one of: 1 128 16 2 256 32 4 512 64 8')
+        return number
+
+    def _duration_dots_(self):
+        dots = []
+        while self._token('.'):
+            dots.append('.')
+        return dots
+
+    def _duration_into(self, node):
+        '''
+        Parse a duration into the "dur" and "dots" keys of ``node``.
+        '''
+        node['dur'] = self._match(_DURATION_NUMBER)
+        node['dots'] = dots = []
+        if node['dur'] is not None:
+            end = self._pos
+            while self._token('.'):
+                dots.append('.')
+                end = self._pos
+            # Grako repeats "{dots:duration_dots}+" once more if whitespace follows the dots, which
+            # adds an empty list; this keeps the output identical
+            if dots and self._pos > end:
+                node['dots'] = [dots, []]
+        return node
+
+    def _duration_(self):
+        return self._duration_into(Node())
+
+    def _tie_(self):
+        return self._expect('~')
+
+    def _notehead_into(self, node):
+        '''
+        Parse a notehead into the "pname," "accid," "oct," and "accid_force" keys of ``node``.
+        '''
+        node['pname'] = self._require(_PITCH_NAME, 'pitch_name')
+        node['accid'] = self._accidental_()
+        node['oct'] = self._match(_OCTAVE)
+        node['accid_force'] = self._match(_ACCIDENTAL_FORCE)
+        return node
+
+    def _notehead_(self):
+        return self._notehead_into(Node())
+
+    def _note_(self):
+        node = self._notehead_into(Node(ly_type='note'))
+        self._duration_into(node)
+        node['tie'] = '~' if self._token('~') else None
+        self.note_count += 1
+        return node
+
+    def _chord_note_(self):
+        node = self._notehead_into(Node())
+        node['tie'] = '~' if self._token('~') else None
+        self.note_count += 1
+        return node
+
+    def _chord_(self):
+        self._expect('<')
+        if self._skip() == '<':
+            raise self._miss('failed lookahead', grako_exc.FailedLookahead)
+        notes = []
+        while _PITCH_NAME.match(self._skip()):
+            notes.append(self._chord_note_())
+        self._expect('>')
+        node = self._duration_into(Node(ly_type='chord', notes=notes))
+        node['tie'] = '~' if self._token('~') else None
+        return node
+
+    def _rest_like(self, letter, ly_type):
+        '''
+        Parse a rest, measure rest, or spacer, which are a ``letter`` and a duration.
+        '''
+        if self._skip() != letter:
+            raise self._miss('Expecting <{0}>'.format(ly_type))
+        self._pos += 1
+        return self._duration_into(Node(ly_type=ly_type))
+
+    def _rest_(self):
+        return self._rest_like('r', 'rest')
+
+    def _measure_rest_(self):
+        return self._rest_like('R', 'measure_rest')
+
+    def _spacer_(self):
+        return self._rest_like('s', 'spacer')
+
+    def _node_(self):
+        char = self._skip()
+        if char == 'R':
+            return self._choose(self._measure_rest_)
+        elif char == '\\':
+            return self._staff_setting_()
+        return self._music_node_()
+
+    def _barcheck_(self):
+        self._expect('|')
+        return Node(ly_type='barcheck')
+
+    def _music_node_(self):
+        char = self._skip()
+        if _PITCH_NAME.match(char):
+            return self._choose(self._note_)
+        elif char == 'r':
+            return self._choose(self._rest_)
+        elif char == '<':
+            return self._choose(self._chord_)
+        elif char == 's':
+            return self._choose(self._spacer_)
+        raise self._miss('no available options')
+
+    def _nodes_(self):
+        nodes = []
+        while True:
+            char = self._skip()
+            if _PITCH_NAME.match(char):
+                nodes.append(self._note_())
+            elif char == 'r':
+                nodes.append(self._rest_())
+            elif char == 's':
+                nodes.append(self._spacer_())
+            elif char == '|':
+                self._pos += 1
+                nodes.append(Node(ly_type='barcheck'))
+            elif char == '<' or char == '\\':
+                rule = self._chord_ if char == '<' else self._staff_setting_
+                node = self._attempt(rule)
+                if node is None:
+                    break
+                nodes.append(node)
+            else:
+                break
+
+        if not nodes:
+            raise self._miss('no available options')
+        return nodes
+
+    # Layers
+    #########
+
+    def _unmarked_layer_(self):
+        return self._nodes_()
+
+    def _marked_layer_(self):
+        self._expect('{')
+        nodes = self._nodes_()
+        self._expect('}')
+        return nodes
+
+    def _monophonic_layers_(self):
+        return Node(layers=[self._unmarked_layer_()])
+
+    def _polyphonic_layers_(self):
+        self._expect('<<')
+        layers = []
+        layer = self._attempt(self._marked_layer_)
+        if layer is not None:
+            layers.append(layer)
+            while self._token('\\\\'):
+                try:
+                    layers.append(self._marked_layer_())
+                except _Miss as miss:
+                    raise self._cut(miss)
+        self._expect('>>')
+        return Node(layers=layers)
+
+    # Staff and Music Block
+    ########################
+
+    def _brace_l_(self):
+        return self._expect('{')
+
+    def _brace_r_(self):
+        return self._expect('}')
+
+    def _staff_content_(self):
+        initial_settings = []
+        while self._skip() == '\\':
+            setting = self._attempt(self._staff_setting_)
+            if setting is None:
+                break
+            initial_settings.append(setting)
+
+        content = []
+        while True:
+            char = self._skip()
+            if char == '<' and self._text.startswith('<<', self._pos):
+                layers = self._attempt(self._polyphonic_layers_)
+            else:
+                layers = self._attempt(self._monophonic_layers_)
+            if layers is None:
+                break
+            content.append(layers)
+
+        if not content:
+            raise self._miss('no available options')
+        return Node(ly_type='staff', initial_settings=initial_settings, content=content)
+
+    def _token_new_(self):
+        return self._expect('\\new')
+
+    def _token_staff_(self):
+        return self._expect('Staff', nameguard=True)
+
+    def _staff_(self):
+        self._expect('\\new')
+        self._expect('Staff', nameguard=True)
+        self._expect('{')
+        node = self._staff_content_()
+        self._expect('}')
+        return node
+
+    # Score and Layout
+    ###################
+
+    def _simul_l_(self):
+        return self._expect('<<')
+
+    def _simul_r_(self):
+        return self._expect('>>')
+
+    def _score_staff_content_(self):
+        self._expect('<<')
+        try:
+            staves = [self._staff_()]
+            while True:
+                staff = self._attempt(self._staff_)
+                if staff is None:
+                    break
+                staves.append(staff)
+            self._expect('>>')
+        except _Miss as miss:
+            raise self._cut(miss)
+        return staves
+
+    def _layout_block_(self):
+        self._expect('\\layout')
+        self._expect('{')
+        self._expect('}')
+        return ['\\layout', '{', '}']
+
+    def _token_score_(self):
+        return self._expect('\\score')
+
+    def _score_(self):
+        version = None
+        if self._skip() == '\\' and self._text.startswith('\\version', self._pos):
+            version = self._attempt(self._version_stmt_)
+        self._expect('\\score')
+        self._expect('{')
+        staves = self._score_staff_content_()
+        layout_block = self._attempt(self._layout_block_)
+        self._expect('}')
+        return Node(ly_type='score', version=version, staves=staves, layout_block=layout_block)
@@ -31,7 +31,14 @@ for the code that translated Grako's parse into Lychee-MEI.
 
 from __future__ import unicode_literals
 
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
 from lxml import etree
+import weakref
+
 import pytest
 
 from lychee.converters.inbound import lilypond
@@ -131,6 +138,179 @@ class TestScore(object):
         assert actual[3].get('n') == '3'
 
 
+class TestParseCache(object):
+    """
+    The caches of parsed documents and converted staves.
+    """
+
+    STAFF = '\\new Staff {{ \\clef "treble" {0}4 d4 }}'
+    SCORE = '\\score {{ << {0} {1} >> }}'
+
+    def setup_method(self, method):
+        """Clear the caches and use a mock parser that calls the real one."""
+        lilypond.clear_caches()
+        self.parser = mock.Mock(wraps=lilypond.lilypond_parser.LilyPondParser(parseinfo=False))
+        self._patcher = mock.patch.dict(lilypond._PARSERS, {'grako': self.parser})
+        self._patcher.start()
+
+    def teardown_method(self, method):
+        """Remove the mock parser."""
+        self._patcher.stop()
+        lilypond.clear_caches()
+
+    def rules_parsed(self):
+        """Return the "rule_name" of every call to the parser."""
+        return [each_call[1]['rule_name'] for each_call in self.parser.parse.call_args_list]
+
+    def test_same_text(self):
+        """The same text is parsed once, and converts to the same result."""
+        score = self.SCORE.format(self.STAFF.format('c'), self.STAFF.format('e'))
+        first = lilypond.convert_no_signals(score)
+        second = lilypond.convert_no_signals(score)
+        assert ['staff', 'staff', 'start'] == sorted(self.rules_parsed())
+        assert etree.tostring(first) == etree.tostring(second)
+        assert first is not second
+
+    def test_one_staff_changed(self):
+        """Only the staff that changed is parsed again."""
+        lilypond.convert_no_signals(self.SCORE.format(self.STAFF.format('c'), self.STAFF.format('e')))
+        self.parser.reset_mock()
+        actual = lilypond.convert_no_signals(self.SCORE.format(self.STAFF.format('c'),
+                                                               self.STAFF.format('f')))
+        assert ['staff'] == self.rules_parsed()
+        assert ['c', 'f'] == [x.get('pname') for x in actual.iter(mei.NOTE)][::2]
+
+    def test_same_as_uncached(self):
+        """The result is the same as parsing the whole document at once."""
+        score = '\\version "2.18.2" %{ \\new Staff { %}\n' + self.SCORE.format(
+            self.STAFF.format('c'), self.STAFF.format('e'))
+        expected = lilypond.do_score(
+            lilypond.lilypond_parser.LilyPondParser(parseinfo=False).parse(score))
+        actual = lilypond.convert_no_signals(score)
+        assert etree.tostring(expected) == etree.tostring(actual)
+
+    def test_staff(self):
+        """A single staff is parsed as a whole."""
+        lilypond.convert_no_signals(self.STAFF.format('c'))
+        lilypond.convert_no_signals(self.STAFF.format('c'))
+        assert ['start'] == self.rules_parsed()
+
+    def test_find_staves(self):
+        """Braces in comments and strings don't count, and unbalanced braces return None."""
+        document = '\\score { << %{ } %} \\new Staff { "}" c4 } \\new  Staff{ d4 } >> }'
+        spans = lilypond._find_staves(document)
+        assert ['\\new Staff { "}" c4 }', '\\new  Staff{ d4 }'] == [document[a:b] for a, b in spans]
+        assert lilypond._find_staves('\\score { << \\new Staff { c4 >> }') is None
+
+    def test_do_score_reuses_staff(self):
+        """do_score() converts a staff only once when it receives the same staff object again."""
+        l_staff = {'ly_type': 'staff', 'initial_settings': [{'ly_type': 'instr_name', 'name': 'Woo'}],
+                   'content': [{'layers': [[]]}]}
+        l_score = {'ly_type': 'score', 'staves': [l_staff]}
+        with mock.patch('lychee.converters.inbound.lilypond.do_staff',
+                        wraps=lilypond.do_staff) as mock_do_staff:
+            first = lilypond.do_score(l_score)
+            second = lilypond.do_score(l_score)
+        assert 1 == mock_do_staff.call_count
+        assert etree.tostring(first) == etree.tostring(second)
+        assert 'Woo' == second[0][0][0].get('label')
+
+
+class TestParserBackend(object):
+    """
+    Choosing the LilyPond parser with the "backend" argument.
+    """
+
+    SCORE = '''\\version "2.18.2" \\score { <<
+        \\new Staff { \\clef "treble" \\key g \\major \\time 3/4 c'4. d''8 <e g>2~ | <e g>2 r4 }
+        \\new Staff { \\set Staff.instrumentName = "Bass" \\clef "bass" << { c,2. } \\\\ { e,2 s4 } >> }
+    >> }'''
+
+    def setup_method(self, method):
+        """Clear the caches."""
+        lilypond.clear_caches()
+
+    def teardown_method(self, method):
+        """Clear the caches."""
+        lilypond.clear_caches()
+
+    def test_same_result(self):
+        """Both backends produce the same MEI."""
+        grako = lilypond.convert_no_signals(self.SCORE, backend='grako')
+        fast = lilypond.convert_no_signals(self.SCORE, backend='fast')
+        assert etree.tostring(grako) == etree.tostring(fast)
+
+    def test_default(self):
+        """Without a backend, the default backend is used."""
+        with mock.patch.dict(lilypond._PARSERS, clear=True):
+            lilypond.convert_no_signals(self.SCORE)
+            assert [lilypond.DEFAULT_BACKEND] == list(lilypond._PARSERS)
+
+    def test_fast_throughput(self):
+        """The fast parser counts the notes it parsed and their rate."""
+        parser = lilypond.BACKENDS['fast']()
+        parser.parse(self.SCORE)
+        assert 8 == parser.note_count
+        assert parser.seconds > 0.0
+        assert parser.notes_per_second > 0.0
+
+    def test_unknown(self):
+        """An unknown backend raises LilyPondError."""
+        with pytest.raises(exceptions.LilyPondError):
+            lilypond.convert_no_signals(self.SCORE, backend='yacc')
+
+
+class TestStreaming(object):
+    """
+    Converting a score one staff at a time.
+    """
+
+    SCORE = TestParserBackend.SCORE
+
+    def setup_method(self, method):
+        """Clear the caches."""
+        lilypond.clear_caches()
+
+    def teardown_method(self, method):
+        """Clear the caches."""
+        lilypond.clear_caches()
+
+    @pytest.mark.parametrize('document', [
+        SCORE,
+        TestParseCache.STAFF.format('c'),
+        '\\score { << \\new Staff { c4 } \\new Staff { d4 } >> }',
+    ])
+    def test_same_result(self, document):
+        """The result is the same as without streaming, and nothing is cached."""
+        expected = lilypond.convert_no_signals(document)
+        lilypond.clear_caches()
+        actual = lilypond.convert_no_signals(document, streaming=True)
+        assert etree.tostring(expected) == etree.tostring(actual)
+        assert 0 == len(lilypond._PARSE_CACHE)
+        assert 0 == len(lilypond._STAFF_CACHE)
+
+    def test_staves_discarded(self):
+        """Each staff is converted and discarded before the next staff is parsed."""
+        converted = []
+        real_do_staff = lilypond.do_staff
+        real_parse = lilypond._parse_uncached
+
+        def do_staff(l_staff, m_section, m_staffdef):
+            converted.append(weakref.ref(l_staff))
+            real_do_staff(l_staff, m_section, m_staffdef)
+
+        def parse(text, rule_name, backend):
+            assert all(ref() is None for ref in converted)
+            return real_parse(text, rule_name, backend)
+
+        with mock.patch('lychee.converters.inbound.lilypond.do_staff', do_staff):
+            with mock.patch('lychee.converters.inbound.lilypond._parse_uncached', parse):
+                actual = lilypond.convert_no_signals(self.SCORE, backend='fast', streaming=True)
+
+        assert 2 == len(converted)
+        assert ['1', '2'] == [x.get('n') for x in actual.iter(mei.STAFF_DEF)]
+
+
 class TestClef(object):
     """
     Setting the clef.
@@ -29,6 +29,9 @@ The tests in this file are only for the parser, not the translator. In other wor
 for the code generated by Grako from the "lilypond.ebnf" file, and not for the code that translates
 the Grako-parsed data into Lychee-MEI. (Yes, of course, what we actually need to test is the grammar,
 not the generated code, but we can't very well do that, can we?)
+
+Every test runs against the hand-written parser in "lilypond_fast_parser" too, since it must accept
+the same grammar and produce the same results.
 """
 
 from __future__ import unicode_literals
@@ -36,10 +39,17 @@ from __future__ import unicode_literals
 from grako.exceptions import FailedLookahead, FailedParse
 import pytest
 
+from lychee.converters.inbound import lilypond_fast_parser
 from lychee.converters.inbound import lilypond_parser
 
 
-parser = lilypond_parser.LilyPondParser()
+@pytest.fixture(params=['grako', 'fast'])
+def parser(request):
+    """The Grako-generated parser or the hand-written parser."""
+    if request.param == 'grako':
+        return lilypond_parser.LilyPondParser()
+    else:
+        return lilypond_fast_parser.FastLilyPondParser()
 
 
 
@@ -48,41 +58,41 @@ class TestNotehead(object):
     For the "notehead" rule and its subrules.
     """
 
-    def test_notehead_1(self):
+    def test_notehead_1(self, parser):
         """With a valid pitch name."""
         content = 'a'
         expected = {'pname': 'a', 'accid': [], 'oct': None, 'accid_force': None}
         actual = parser.parse(content, rule_name='notehead')
         assert expected == actual
 
-    def test_notehead_2(self):
+    def test_notehead_2(self, parser):
         """With an invalid pitch name."""
         content = 'Q'
         with pytest.raises(FailedParse):
             parser.parse(content, rule_name='notehead')
 
-    def test_notehead_3(self):
+    def test_notehead_3(self, parser):
         """One accidental"""
         content = 'bes'
         expected = {'pname': 'b', 'accid': ['es'], 'oct': None, 'accid_force': None}
         actual = parser.parse(content, rule_name='notehead')
         assert expected == actual
 
-    def test_notehead_4(self):
+    def test_notehead_4(self, parser):
         """Double accidental"""
         content = 'fisis'
         expected = {'pname': 'f', 'accid': ['is', 'is'], 'oct': None, 'accid_force': None}
         actual = parser.parse(content, rule_name='notehead')
         assert expected == actual
 
-    def test_notehead_5(self):
+    def test_notehead_5(self, parser):
         """Okay if the accidental doesn't make sense"""
         content = 'cesis'
         expected = {'pname': 'c', 'accid': ['es', 'is'], 'oct': None, 'accid_force': None}
         actual = parser.parse(content, rule_name='notehead')
         assert expected == actual
 
-    def test_notehead_6(self):
+    def test_notehead_6(self, parser):
         """
         But the accidental needs to have the right letters.
         NB: it doesn't fail because this rule by itself needn't consume all the text
@@ -92,42 +102,42 @@ class TestNotehead(object):
         actual = parser.parse(content, rule_name='notehead')
         assert expected == dict(actual)
 
-    def test_notehead_7(self):
+    def test_notehead_7(self, parser):
         """With an octave."""
         content = 'des,'
         expected = {'pname': 'd', 'accid': ['es'], 'oct': ',', 'accid_force': None}
         actual = parser.parse(content, rule_name='notehead')
         assert expected == actual
 
-    def test_notehead_8(self):
+    def test_notehead_8(self, parser):
         """With ? forced accidental."""
         content = "eisis''?"
         expected = {'pname': 'e', 'accid': ['is', 'is'], 'oct': "''", 'accid_force': '?'}
         actual = parser.parse(content, rule_name='notehead')
         assert expected == actual
 
-    def test_notehead_9(self):
+    def test_notehead_9(self, parser):
         """With ! forced accidental."""
         content = 'gis,,!'
         expected = {'pname': 'g', 'accid': ['is'], 'oct': ',,', 'accid_force': '!'}
         actual = parser.parse(content, rule_name='notehead')
         assert expected == actual
 
-    def test_notehead_10(self):
+    def test_notehead_10(self, parser):
         """With an octave but no accidental."""
         content = 'a,'
         expected = {'pname': 'a', 'accid': [], 'oct': ',', 'accid_force': None}
         actual = parser.parse(content, rule_name='notehead')
         assert expected == actual
 
-    def test_notehead_11(self):
+    def test_notehead_11(self, parser):
         """With an octave, forced accidental, but no accidental."""
         content = 'b,?'
         expected = {'pname': 'b', 'accid': [], 'oct': ',', 'accid_force': '?'}
         actual = parser.parse(content, rule_name='notehead')
         assert expected == actual
 
-    def test_notehead_12(self):
+    def test_notehead_12(self, parser):
         """With a forced accidental but no octave or accidental."""
         content = 'c!'
         expected = {'pname': 'c', 'accid': [], 'oct': None, 'accid_force': '!'}
@@ -140,21 +150,21 @@ class TestDuration(object):
     For the "duration" rule.
     """
 
-    def test_duration_1(self):
+    def test_duration_1(self, parser):
         """With a dur and no dots."""
         content = '4'
         expected = {'dur': '4', 'dots': []}
         actual = parser.parse(content, rule_name='duration')
         assert expected == actual
 
-    def test_duration_2(self):
+    def test_duration_2(self, parser):
         """With a dur and two dots."""
         content = '256..'
         expected = {'dur': '256', 'dots': ['.', '.']}
         actual = parser.parse(content, rule_name='duration')
         assert expected == actual
 
-    def test_duration_3(self):
+    def test_duration_3(self, parser):
         """
         With a dot but no dur.
         The rule consumes no input and causes a parse error elsewhere.
@@ -164,7 +174,7 @@ class TestDuration(object):
         actual = parser.parse(content, rule_name='duration')
         assert expected == actual
 
-    def test_duration_4(self):
+    def test_duration_4(self, parser):
         """When it's all missing"""
         content = ''
         expected = {'dur': None, 'dots': []}
@@ -178,7 +188,7 @@ class TestNoteChordRestSpacer(object):
     on any one of those.
     """
 
-    def test_note_1(self):
+    def test_note_1(self, parser):
         """Works as expected."""
         content = 'bes,!256..'
         expected = {'pname': 'b', 'accid': ['es'], 'oct': ',', 'accid_force': '!', 'dur': '256',
@@ -186,7 +196,7 @@ class TestNoteChordRestSpacer(object):
         actual = parser.parse(content, rule_name='note')
         assert expected == actual
 
-    def test_note_2(self):
+    def test_note_2(self, parser):
         """
         Pitch and duration are in the wrong order.
         NB: it doesn't fail; the ! isn't consumed, and will cause a failure later
@@ -197,7 +207,7 @@ class TestNoteChordRestSpacer(object):
         actual = parser.parse(content, rule_name='note')
         assert expected == actual
 
-    def test_note_3(self):
+    def test_note_3(self, parser):
         """Works without duration."""
         content = 'bes,'
         expected = {'pname': 'b', 'accid': ['es'], 'oct': ',', 'accid_force': None, 'dur': None,
@@ -205,7 +215,7 @@ class TestNoteChordRestSpacer(object):
         actual = parser.parse(content, rule_name='note')
         assert expected == actual
 
-    def test_chord_1(self):
+    def test_chord_1(self, parser):
         """Works as expected (two noteheads)."""
         content = '<bes,! ees,?>256..'
         expected = {
@@ -221,7 +231,7 @@ class TestNoteChordRestSpacer(object):
         actual = parser.parse(content, rule_name='chord')
         assert expected == actual
 
-    def test_chord_2(self):
+    def test_chord_2(self, parser):
         """
         Works as expected (one notehead).
         NB: Why? Because it's valid for LilyPond and MEI.
@@ -239,7 +249,7 @@ class TestNoteChordRestSpacer(object):
         actual = parser.parse(content, rule_name='chord')
         assert expected == actual
 
-    def test_chord_3(self):
+    def test_chord_3(self, parser):
         """
         Works as expected (no noteheads).
         NB: Why? Because it's valid for LilyPond and MEI.
@@ -255,7 +265,7 @@ class TestNoteChordRestSpacer(object):
         actual = parser.parse(content, rule_name='chord')
         assert expected == actual
 
-    def test_chord_4(self):
+    def test_chord_4(self, parser):
         """With three noteheads and no duration."""
         content = "<bes,! ees,? g'>"
         expected = {
@@ -273,7 +283,7 @@ class TestNoteChordRestSpacer(object):
         print(str(actual))
         assert expected == actual
 
-    def test_chord_5(self):
+    def test_chord_5(self, parser):
         """
         With a "simultaneous" indicator, make sure it doesn't eat the first <
         """
@@ -281,49 +291,49 @@ class TestNoteChordRestSpacer(object):
         with pytest.raises(FailedLookahead):
             parser.parse(content, rule_name='chord')
 
-    def test_rest_1(self):
+    def test_rest_1(self, parser):
         """Works as expected."""
         content = 'r256..'
         expected = {'dur': '256', 'dots': ['.', '.'], 'ly_type': 'rest'}
         actual = parser.parse(content, rule_name='rest')
         assert expected == actual
 
-    def test_rest_2(self):
+    def test_rest_2(self, parser):
         """Works without duration."""
         content = 'r'
         expected = {'dur': None, 'dots': [], 'ly_type': 'rest'}
         actual = parser.parse(content, rule_name='rest')
         assert expected == actual
 
-    def test_spacer_1(self):
+    def test_spacer_1(self, parser):
         """Works as expected."""
         content = 's256..'
         expected = {'dur': '256', 'dots': ['.', '.'], 'ly_type': 'spacer'}
         actual = parser.parse(content, rule_name='spacer')
         assert expected == actual
 
-    def test_spacer_2(self):
+    def test_spacer_2(self, parser):
         """Works without duration."""
         content = 's'
         expected = {'dur': None, 'dots': [], 'ly_type': 'spacer'}
         actual = parser.parse(content, rule_name='spacer')
         assert expected == actual
 
-    def test_measure_rest_1(self):
+    def test_measure_rest_1(self, parser):
         """Works as expected."""
         content = 'R256..'
         expected = {'dur': '256', 'dots': ['.', '.'], 'ly_type': 'measure_rest'}
         actual = parser.parse(content, rule_name='measure_rest')
         assert expected == actual
 
-    def test_measure_rest_2(self):
+    def test_measure_rest_2(self, parser):
         """Works without duration."""
         content = 'R'
         expected = {'dur': None, 'dots': [], 'ly_type': 'measure_rest'}
         actual = parser.parse(content, rule_name='measure_rest')
         assert expected == actual
 
-    def test_music_node_1(self):
+    def test_music_node_1(self, parser):
         """music_node: note"""
         content = 'bes,!256..'
         expected = {'pname': 'b', 'accid': ['es'], 'oct': ',', 'accid_force': '!', 'dur': '256',
@@ -331,7 +341,7 @@ class TestNoteChordRestSpacer(object):
         actual = parser.parse(content, rule_name='music_node')
         assert expected == actual
 
-    def test_music_node_2(self):
+    def test_music_node_2(self, parser):
         """music_node: chord"""
         content = '<bes,! ees,?>256..'
         expected = {
@@ -347,14 +357,14 @@ class TestNoteChordRestSpacer(object):
         actual = parser.parse(content, rule_name='music_node')
         assert expected == actual
 
-    def test_music_node_3(self):
+    def test_music_node_3(self, parser):
         """music_node: rest"""
         content = 'r256..'
         expected = {'dur': '256', 'dots': ['.', '.'], 'ly_type': 'rest'}
         actual = parser.parse(content, rule_name='music_node')
         assert expected == actual
 
-    def test_music_node_4(self):
+    def test_music_node_4(self, parser):
         """music_node: spacer"""
         content = 's256..'
         expected = {'dur': '256', 'dots': ['.', '.'], 'ly_type': 'spacer'}
@@ -367,14 +377,14 @@ class TestLayers(object):
     For polyphonic and monophonic layers.
     """
 
-    def test_unmarked_layer_1(self):
+    def test_unmarked_layer_1(self, parser):
         """With one music node."""
         content = 's256..'
         expected = [{'dur': '256', 'dots': ['.', '.'], 'ly_type': 'spacer'}]
         actual = parser.parse(content, rule_name='unmarked_layer')
         assert expected == actual
 
-    def test_unmarked_layer_2(self):
+    def test_unmarked_layer_2(self, parser):
         """With two music nodes."""
         content = 's2 s4'
         expected = [
@@ -384,7 +394,7 @@ class TestLayers(object):
         actual = parser.parse(content, rule_name='unmarked_layer')
         assert expected == actual
 
-    def test_unmarked_layer_3(self):
+    def test_unmarked_layer_3(self, parser):
         """With three music nodes, the second without a duration."""
         content = 's2 s s4.'
         expected = [
@@ -395,14 +405,14 @@ class TestLayers(object):
         actual = parser.parse(content, rule_name='unmarked_layer')
         assert expected == actual
 
-    def test_marked_layer_1(self):
+    def test_marked_layer_1(self, parser):
         """With one music node."""
         content = '{s256..}'
         expected = [{'dur': '256', 'dots': ['.', '.'], 'ly_type': 'spacer'}]
         actual = parser.parse(content, rule_name='marked_layer')
         assert expected == actual
 
-    def test_marked_layer_2(self):
+    def test_marked_layer_2(self, parser):
         """With two music nodes."""
         content = '{s2 s4}'
         expected = [
@@ -412,7 +422,7 @@ class TestLayers(object):
         actual = parser.parse(content, rule_name='marked_layer')
         assert expected == actual
 
-    def test_marked_layer_3(self):
+    def test_marked_layer_3(self, parser):
         """With three music nodes, the second without a duration."""
         content = '{s2 s s4.}'
         expected = [
@@ -423,7 +433,7 @@ class TestLayers(object):
         actual = parser.parse(content, rule_name='marked_layer')
         assert expected == actual
 
-    def test_monophonic_layers_1(self):
+    def test_monophonic_layers_1(self, parser):
         """With three music nodes, the second without a duration."""
         content = 's2 s s4.'
         expected = {'layers': [[
@@ -434,7 +444,7 @@ class TestLayers(object):
         actual = parser.parse(content, rule_name='monophonic_layers')
         assert expected == actual
 
-    def test_polyphonic_layers_1(self):
+    def test_polyphonic_layers_1(self, parser):
         """With one Voice context."""
         content = '<< { s2 } >>'
         expected = {'layers': [
@@ -443,7 +453,7 @@ class TestLayers(object):
         actual = parser.parse(content, rule_name='polyphonic_layers')
         assert expected == actual
 
-    def test_polyphonic_layers_2(self):
+    def test_polyphonic_layers_2(self, parser):
         """With two Voice contexts."""
         content = r'<< { s2 } \\ { s4 s } >>'
         expected = {'layers': [
@@ -456,7 +466,7 @@ class TestLayers(object):
         actual = parser.parse(content, rule_name='polyphonic_layers')
         assert expected == actual
 
-    def test_polyphonic_layers_3(self):
+    def test_polyphonic_layers_3(self, parser):
         """With three Voice contexts."""
         content = r'<< { s2 } \\ { s4 } \\ { s16 } >>'
         expected = {'layers': [
@@ -467,7 +477,7 @@ class TestLayers(object):
         actual = parser.parse(content, rule_name='polyphonic_layers')
         assert expected == actual
 
-    def test_polyphonic_layers_4(self):
+    def test_polyphonic_layers_4(self, parser):
         """With no Voice contexts."""
         content = '<< >>'
         expected = {'layers': []}
@@ -480,28 +490,28 @@ class TestVersionStatement(object):
     For the \version statement.
     """
 
-    def test_version_statement_1(self):
+    def test_version_statement_1(self, parser):
         """Given a real version, it does fine."""
         content = r'\version "2.18.0"'
         expected = ['2', '18', '0']
         actual = parser.parse(content, rule_name='version_stmt')
         assert expected == actual
 
-    def test_version_statement_2(self):
+    def test_version_statement_2(self, parser):
         """LilyPond fills in the rest with zeroes."""
         content = r'\version "2"'
         expected = ['2']
         actual = parser.parse(content, rule_name='version_stmt')
         assert expected == actual
 
-    def test_version_statement_3(self):
+    def test_version_statement_3(self, parser):
         """LilyPond doesn't mind this either."""
         content = r'\version ""'
         expected = ['']
         actual = parser.parse(content, rule_name='version_stmt')
         assert expected == actual
 
-    def test_version_statement_4(self):
+    def test_version_statement_4(self, parser):
         """LilyPond doesn't mind this either."""
         content = r'\version "123.234.3.432444.52"'
         expected = ['123', '234', '3', '432444', '52']
@@ -514,83 +524,83 @@ class TestStaffSettings(object):
     For staff objects like instrument name, clef, and so on.
     """
 
-    def test_instr_name_1(self):
+    def test_instr_name_1(self, parser):
         """Instrument name is one word."""
         content = r'\set Staff.instrumentName = "Clarinet"'
         expected = {'ly_type': 'instr_name', 'name': 'Clarinet'}
         actual = parser.parse(content, rule_name='instr_name')
         assert expected == actual
 
-    def test_instr_name_2(self):
+    def test_instr_name_2(self, parser):
         """Instrument name is two words."""
         content = r'\set Staff.instrumentName = "Kazoos 3 & 4"'
         expected = {'ly_type': 'instr_name', 'name': 'Kazoos 3 & 4'}
         actual = parser.parse(content, rule_name='instr_name')
         assert expected == actual
 
-    def test_clef_1(self):
+    def test_clef_1(self, parser):
         """Clef."""
         content = r'\clef "alto"'
         expected = {'ly_type': 'clef', 'type': 'alto'}
         actual = parser.parse(content, rule_name='clef')
         assert expected == actual
 
-    def test_key_1(self):
+    def test_key_1(self, parser):
         """Key, major without accidental."""
         content = r'\key f \major'
         expected = {'ly_type': 'key', 'keynote': 'f', 'accid': None, 'mode': 'major'}
         actual = parser.parse(content, rule_name='key')
         assert expected == actual
 
-    def test_key_2(self):
+    def test_key_2(self, parser):
         """Key, minor with accidental."""
         content = r'\key fis \minor'
         expected = {'ly_type': 'key', 'keynote': 'f', 'accid': 'is', 'mode': 'minor'}
         actual = parser.parse(content, rule_name='key')
         assert expected == actual
 
-    def test_time_1(self):
+    def test_time_1(self, parser):
         """Usual time signature."""
         content = r'\time 3/4'
         expected = {'ly_type': 'time', 'count': '3', 'unit': '4'}
         actual = parser.parse(content, rule_name='time')
         assert expected == actual
 
-    def test_time_2(self):
+    def test_time_2(self, parser):
         """Unusual time signature."""
         content = r'\time 46/128'
         expected = {'ly_type': 'time', 'count': '46', 'unit': '128'}
         actual = parser.parse(content, rule_name='time')
         assert expected == actual
 
-    def test_time_3(self):
+    def test_time_3(self, parser):
         """Invalid time signature."""
         content = r'\time 46/590'
         with pytest.raises(FailedParse):
             print(str(parser.parse(content, rule_name='time')))
 
-    def test_staff_setting_1(self):
+    def test_staff_setting_1(self, parser):
         """Instrument name with the "staff_setting" rule."""
         content = r'\set Staff.instrumentName = "Tuba"'
         expected = {'ly_type': 'instr_name', 'name': 'Tuba'}
         actual = parser.parse(content, rule_name='staff_setting')
         assert expected == actual
 
-    def test_staff_setting_2(self):
+    def test_staff_setting_2(self, parser):
         """Clef with the "staff_setting" rule."""
         content = r'\clef "bass"'
         expected = {'ly_type': 'clef', 'type': 'bass'}
         actual = parser.parse(content, rule_name='staff_setting')
         assert expected == actual
 
-    def test_staff_setting_3(self):
+    def test_staff_setting_3(self, parser):
         """Key with the "staff_setting" rule."""
         content = r'\key fis \minor'
         expected = {'ly_type': 'key', 'keynote': 'f', 'accid': 'is', 'mode': 'minor'}
         actual = parser.parse(content, rule_name='staff_setting')
         assert expected == actual
 
-    def test_staff_setting_4(self):
+    def test_staff_setting_4(self, parser):
         """Time ith the "staff_setting" rule."""
         content = r'\time 3/4'
         expected = {'ly_type': 'time', 'count': '3', 'unit': '4'}
@@ -603,7 +613,7 @@ class TestStaffAndMusicBlock(object):
     Tests for \new Staff { } and the stuff inside.
     """
 
-    def test_staff_content_1(self):
+    def test_staff_content_1(self, parser):
         """With an initial setting and monophonic stuff."""
         content = r'\time 3/4  s2 s4 | s2'
         expected = {
@@ -619,7 +629,7 @@ class TestStaffAndMusicBlock(object):
         actual = parser.parse(content, rule_name='staff_content')
         assert expected == dict(actual.asjson())
 
-    def test_staff_content_2(self):
+    def test_staff_content_2(self, parser):
         """Without an initial setting, one chunk of polyphonic stuff."""
         content = r'<< { s2 s4 } \\ { r2 r4 } >>'
         expected = {
@@ -639,7 +649,7 @@ class TestStaffAndMusicBlock(object):
         actual = parser.parse(content, rule_name='staff_content')
         assert expected == dict(actual.asjson())
 
-    def test_staff_content_3(self):
+    def test_staff_content_3(self, parser):
         """With two initial settings, a chunk of polyphonic stuff, then a monophonic chunk."""
         content = r"""\time 3/4 \clef "bass" << { s2 s4 } \\ { r2 r4 } >> bes,128"""
         expected = {
@@ -667,7 +677,7 @@ class TestStaffAndMusicBlock(object):
         actual = parser.parse(content, rule_name='staff_content')
         assert expected == dict(actual.asjson())
 
-    def test_staff_1(self):
+    def test_staff_1(self, parser):
         """test_staff_content_1() but with a staff"""
         content = r'\new Staff { \time 3/4  s2 s4 | s2 }'
         expected = {
@@ -683,7 +693,7 @@ class TestStaffAndMusicBlock(object):
         actual = parser.parse(content, rule_name='staff')
         assert expected == dict(actual.asjson())
 
-    def test_staff_2(self):
+    def test_staff_2(self, parser):
         """test_staff_content_2() but with a staff"""
         content = r'\new Staff { << { s2 s4 } \\ { r2 r4 } >> }'
         expected = {
@@ -703,7 +713,7 @@ class TestStaffAndMusicBlock(object):
         actual = parser.parse(content, rule_name='staff')
         assert expected == dict(actual.asjson())
 
-    def test_staff_3(self):
+    def test_staff_3(self, parser):
         """test_staff_content_3() but with a staff"""
         content = r"""\new Staff { \time 3/4 \clef "bass" << { s2 s4 } \\ { r2 r4 } >> bes,128 }"""
         expected = {
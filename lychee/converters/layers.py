@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               lychee/converters/layers.py
+# Purpose:                Exact timing of the elements in an LMEI <layer>.
+#
+# Copyright (C) 2017 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Exact timing of the elements in an LMEI <layer>.
+
+.. warning::
+    This module is intended for internal *Lychee* use only, so the API may change without notice.
+
+A :class:`LayerTiming` reads the children of a <layer> once, into parallel lists of the kind,
+duration, and onset of each element. The outbound MEI converter uses it to divide a <layer> into
+measures. Durations and onsets are integer "ticks," where :attr:`LayerTiming.denominator` ticks
+make a whole note, so sums are exact and there is no floating-point drift. Finding the measures is
+one binary search of the onsets for each measure, rather than a loop over the elements.
+
+Durations follow @dur, @dots, and the ratio of every <tupletSpan> that lists the element in @plist.
+Elements other than chords, notes, rests, and spacers have no duration.
+
+The :func:`resolve_ties` function sets the @tie attributes of a <layer> made by any inbound
+converter.
+'''
+
+import bisect
+import collections
+from fractions import Fraction
+import itertools
+try:
+    from math import gcd
+except ImportError:
+    from fractions import gcd
+
+from lychee.namespaces import mei, xml
+
+
+# the kinds of element in a <layer>
+OTHER = 0
+NOTE = 1
+CHORD = 2
+REST = 3
+SPACE = 4
+
+_KINDS = {mei.NOTE: NOTE, mei.CHORD: CHORD, mei.REST: REST, mei.SPACE: SPACE}
+
+_ZERO = Fraction(0)
+
+MeasureSpan = collections.namedtuple('MeasureSpan', ('start', 'stop', 'complete', 'overflow'))
+'''
+The elements of a <layer> in one measure: the indices ``start`` to ``stop`` (not included), whether
+the measure is ``complete``, and the duration of its elements past the end of the measure, as a
+:class:`~fractions.Fraction` of a whole note.
+'''
+
+
+def note_pitch(m_note):
+    '''
+    Return a tuple uniquely identifying the pitch of an LMEI <note>.
+    '''
+    return (m_note.get('oct'), m_note.get('pname'), m_note.get('accid.ges', 'n'))
+
+
+def _tie_notes(m_elem):
+    '''
+    Return the (note, pitch) pairs of the notes in a <note> or <chord>, or an empty list.
+    '''
+    if m_elem.tag == mei.NOTE:
+        return [(m_elem, note_pitch(m_elem))]
+    elif m_elem.tag == mei.CHORD:
+        return [(note, note_pitch(note)) for note in m_elem]
+    return []
+
+
+def resolve_ties(m_layer):
+    '''
+    Fix the @tie attributes in an LMEI <layer>.
+
+    :param m_layer: The <layer> in which notes and chords have @tie="i" (or "m") when they are tied
+        to the next element.
+    :type m_layer: :class:`lxml.etree.Element`
+    :returns: The number of ties removed because the next element has no note with the same pitch.
+    :rtype: int
+
+    A tie from a note to a note with the same pitch in the next element is kept, and @tie is set to
+    "i" or "m" for the first note and "m" or "t" for the second. Other ties are removed. The
+    children are visited once, with a window of three elements, and every pitch is found once.
+    '''
+    removed = 0
+    # (note, pitch) pairs of the two elements before the current one, and "pitch -> note" for the
+    # one just before it
+    before = []
+    previous = None
+    previous_map = None
+
+    for m_elem in itertools.chain(m_layer, (None,)):
+        current = [] if m_elem is None else _tie_notes(m_elem)
+        current_map = dict((pitch, note) for note, pitch in current)
+
+        if previous is not None:
+            # ties from the previous element are kept only if the current element has the pitch
+            for note, pitch in previous:
+                if note.get('tie') in ('i', 'm'):
+                    if pitch in current_map:
+                        note.set('tie', 'i')
+                    else:
+                        del note.attrib['tie']
+                        removed += 1
+
+            # now the ties into the previous element are final, so set them from the one before
+            for note, pitch in before:
+                if note.get('tie') in ('i', 'm'):
+                    target = previous_map[pitch]
+                    target.set('tie', 'm' if target.get('tie') in ('i', 'm') else 't')
+            before = previous
+
+        previous = current
+        previous_map = current_map
+
+    return removed
+
+
+def tuplet_ratios(l_layer):
+    '''
+    Find the tuplet ratio of every element in a <layer>.
+
+    :param l_layer: The LMEI <layer>.
+    :type l_layer: :class:`xml.etree.ElementTree.Element`
+    :returns: A dictionary where keys are the @xml:id of an element in one or more <tupletSpan>
+        (without the leading #) and values are the product of the ratios of those <tupletSpan>.
+    :rtype: dict of :class:`fractions.Fraction`
+    '''
+    ratios = {}
+    for l_span in l_layer.iterfind(mei.TUPLET_SPAN):
+        plist = l_span.get('plist', '').replace('#', '')
+        if plist != '':
+            ratio = Fraction(int(l_span.get('numbase', 0)), int(l_span.get('num', 0)))
+            for each_xmlid in plist.split(' '):
+                ratios[each_xmlid] = ratios.get(each_xmlid, 1) * ratio
+    return ratios
+
+
+class LayerTiming(object):
+    '''
+    The kind, duration, and onset of every child element of a <layer>.
+
+    The lists are indexed like the children of the <layer>:
+
+    - :attr:`elements`: the child elements.
+    - :attr:`kinds`: :const:`NOTE`, :const:`CHORD`, :const:`REST`, :const:`SPACE`, or :const:`OTHER`.
+    - :attr:`durations`: the duration in ticks.
+    - :attr:`onsets`: the onset in ticks. It has one more value than the others: the total duration.
+
+    The :attr:`denominator` is the number of ticks in a whole note. It's the least common multiple of
+    the denominators of all the durations, so every duration is a whole number of ticks.
+    '''
+
+    def __init__(self, l_layer):
+        '''
+        :param l_layer: The LMEI <layer>.
+        :type l_layer: :class:`xml.etree.ElementTree.Element`
+        '''
+        tuplets = tuplet_ratios(l_layer)
+
+        self.elements = []
+        self.kinds = []
+        # whether an element takes the whole measure when it starts one: a whole note not in a tuplet
+        self._whole = []
+        numerators = []
+        denominators = []
+        denominator = 1
+
+        # (@dur, @dots) -> the numerator and denominator of that value, since most are repeated
+        values = {}
+
+        for l_elem in l_layer.iterfind('*'):
+            kind = _KINDS.get(l_elem.tag, OTHER)
+            self.elements.append(l_elem)
+            self.kinds.append(kind)
+
+            if kind == OTHER:
+                num, den = 0, 1
+                self._whole.append(False)
+            else:
+                dur = l_elem.get('dur')
+                key = (dur, l_elem.get('dots'))
+                if key not in values:
+                    # a value with "dots" dots is (2 ** (dots + 1) - 1) / (dur * 2 ** dots)
+                    dots = int(key[1] or 0)
+                    values[key] = (2 ** (dots + 1) - 1, int(dur) * 2 ** dots)
+                num, den = values[key]
+                ratio = tuplets.get(l_elem.get(xml.ID)) if tuplets else None
+                if ratio is not None:
+                    num *= ratio.numerator
+                    den *= ratio.denominator
+                self._whole.append(dur == '1' and ratio is None)
+                if denominator % den:
+                    denominator = denominator * den // gcd(denominator, den)
+
+            numerators.append(num)
+            denominators.append(den)
+
+        self.denominator = denominator
+        self.durations = [num * (denominator // den) for num, den in zip(numerators, denominators)]
+        self.onsets = [0]
+        total = 0
+        for duration in self.durations:
+            total += duration
+            self.onsets.append(total)
+
+        # index of the first element with a duration at or after each index
+        self._next_timed = [len(self.elements)] * (len(self.elements) + 1)
+        for i in range(len(self.elements) - 1, -1, -1):
+            self._next_timed[i] = i if self.durations[i] else self._next_timed[i + 1]
+
+    def __len__(self):
+        return len(self.elements)
+
+    def duration(self, index):
+        '''
+        Return the duration of an element as a :class:`~fractions.Fraction` of a whole note.
+        '''
+        return Fraction(self.durations[index], self.denominator)
+
+    def onset(self, index):
+        '''
+        Return the onset of an element as a :class:`~fractions.Fraction` of a whole note. The index
+        may be ``len(self)``, for the total duration.
+        '''
+        return Fraction(self.onsets[index], self.denominator)
+
+    def measures(self, measure_length):
+        '''
+        Divide the elements into measures.
+
+        :param measure_length: The duration of a complete measure, as a fraction of a whole note.
+        :type measure_length: :class:`fractions.Fraction`
+        :returns: The elements in each measure, in order. The last measure may be incomplete.
+        :rtype: list of :class:`MeasureSpan`
+
+        A measure is complete with the first element that reaches ``measure_length``; anything
+        past that is its overflow, and the next measure starts after that element. When the first
+        element with a duration in a measure is a whole note not in a tuplet, it completes the
+        measure by itself. Elements without duration after a complete measure start the next one.
+        '''
+        measure_length = Fraction(measure_length)
+        # the least whole number of ticks that reaches "measure_length"
+        ticks = -(-measure_length.numerator * self.denominator // measure_length.denominator)
+
+        spans = []
+        start = 0
+        while start < len(self.elements):
+            first_timed = self._next_timed[start]
+            if first_timed < len(self.elements) and self._whole[first_timed]:
+                stop = first_timed + 1
+            else:
+                stop = bisect.bisect_left(self.onsets, self.onsets[start] + ticks, start + 1)
+
+            if stop > len(self.elements):
+                spans.append(MeasureSpan(start, len(self.elements), False, _ZERO))
+                break
+
+            # compare as whole numbers, since most measures have no overflow
+            overflow = ((self.onsets[stop] - self.onsets[start]) * measure_length.denominator -
+                        measure_length.numerator * self.denominator)
+            if overflow > 0:
+                overflow = Fraction(overflow, self.denominator * measure_length.denominator)
+            else:
+                overflow = _ZERO
+            spans.append(MeasureSpan(start, stop, True, overflow))
+            start = stop
+
+        return spans
@@ -198,20 +198,27 @@ def convert(repo_dir, **kwargs):
     Prepare document metadata in a useful format for clients.
 
     :param str repo_dir: The absolute pathname to the repository for which to produce data.
+    :kwarg doc: An optional :class:`~lychee.document.Document` (or snapshot) already loaded from
+        ``repo_dir``. If omitted, the document is loaded from ``repo_dir``.
     :returns: Information from the internal LMEI document in the format described above.
     :rtype: dict
     :raises: :exc:`lychee.exceptions.OutboundConversionError` when there is a forseeable error.
     '''
     try:
-        doc = document.Document(repo_dir)
+        doc = kwargs.get('doc')
+        if doc is None:
+            doc = document.Document(repo_dir, lazy=True)
+        doc.get_head()
     except exceptions.HeaderNotFoundError:
-        raise OutboundConversionError('{} failed initializing a Document object; stopping conversion'.format(__name__))
+        raise exceptions.OutboundConversionError(
+            '{} failed initializing a Document object; stopping conversion'.format(__name__))
     else:
         post = {'headers': prepare_headers(doc)}
         try:
             post['sections'] = prepare_sections(doc, repo_dir)
         except exceptions.SectionNotFoundError:
-            raise OutboundConversionError('{} failed to load a <section>; stopping conversion'.format(__name__))
+            raise exceptions.OutboundConversionError(
+                '{} failed to load a <section>; stopping conversion'.format(__name__))
         else:
             return post
 
@@ -377,7 +384,13 @@ def find_last_changeset(section_id, revlog):
     :rtype: str
 
     If the file is not found in a changeset, an empty string is returned.
+
+    This uses the "last_changeset" index in ``revlog`` if present, and otherwise searches the
+    history from the most recent changeset.
     '''
+    if 'last_changeset' in revlog:
+        return revlog['last_changeset'].get(section_id, '')
+
     for cset in reversed(revlog['history']):
         if section_id in revlog['changesets'][cset]['files']:
             return cset
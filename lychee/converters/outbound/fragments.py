@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               lychee/converters/outbound/fragments.py
+# Purpose:                Cache the output of outbound converters for parts of a score.
+#
+# Copyright (C) 2017 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Cache the output of outbound converters for parts of a score.
+
+.. warning::
+    This module is intended for internal *Lychee* use only, so the API may change without notice.
+
+Most actions change a small part of a score, but the outbound converters are run on a whole
+<section> every time. A :class:`FragmentCache` lets a converter keep the output for each part of a
+<section>---a measure of a staff, for example---and only convert the parts that changed.
+
+Each fragment is stored at a "place" in the score: a tuple like ``(section @xml:id, staff @n,
+measure @n)``. The fragment is only used again if the LMEI at that place has the same content hash,
+so that each place holds one version of its output and the cache does not grow with the number of
+edits. Converters decide what a place is, and which elements are hashed for it.
+'''
+
+import collections
+import hashlib
+import threading
+
+from lxml import etree
+
+
+# Maximum number of places held in a cache. This allows a large score (like 40 staves of 250
+# measures) to be converted without discarding fragments from the same <section>.
+DEFAULT_SIZE = 10000
+
+
+def content_hash(*elements):
+    '''
+    Compute the hash of the content of some LMEI elements.
+
+    :param elements: The elements to hash. Their tail text is not included.
+    :type elements: :class:`lxml.etree.Element`
+    :returns: The SHA-1 digest of the serialized elements.
+    :rtype: bytes
+    '''
+    digest = hashlib.sha1()
+    for elem in elements:
+        digest.update(etree.tostring(elem, with_tail=False))
+    return digest.digest()
+
+
+class FragmentCache(object):
+    '''
+    The output fragments of an outbound converter, by place in the score.
+
+    :param int size: The maximum number of places to hold. The least-recently used places are
+        discarded first.
+
+    It is safe to use a :class:`FragmentCache` from more than one thread. Fragments must not be
+    modified after they are returned or stored, since they may be shared by many conversions.
+    '''
+
+    def __init__(self, size=DEFAULT_SIZE):
+        self._size = size
+        # place -> (content hash, fragment)
+        self._fragments = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._fragments)
+
+    def get(self, place, digest):
+        '''
+        Find the fragment for a place, if the content there has not changed.
+
+        :param tuple place: Where the fragment is in the score.
+        :param digest: The hash of the content at ``place``, usually from :func:`content_hash`. Any
+            value that compares equal only for the same content may be used.
+        :returns: The fragment, or ``None`` if there is no fragment with the same hash.
+        '''
+        with self._lock:
+            entry = self._fragments.pop(place, None)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._fragments[place] = entry
+            if entry[0] != digest:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return entry[1]
+
+    def put(self, place, digest, fragment):
+        '''
+        Store the fragment for a place, replacing the fragment for any previous content.
+
+        :param tuple place: Where the fragment is in the score.
+        :param digest: The hash of the content at ``place``, as for :meth:`get`.
+        :param fragment: The converter's output for ``place``.
+        '''
+        with self._lock:
+            self._fragments.pop(place, None)
+            self._fragments[place] = (digest, fragment)
+            while len(self._fragments) > self._size:
+                self._fragments.popitem(last=False)
+
+    def fragment(self, place, elem, convert):
+        '''
+        Return the cached fragment for an element, or convert it and cache the result.
+
+        :param tuple place: Where ``elem`` is in the score.
+        :param elem: The LMEI element to convert. Its content hash is checked against the cache.
+        :type elem: :class:`lxml.etree.Element`
+        :param convert: A function that takes ``elem`` and returns the fragment.
+        :returns: The fragment.
+        '''
+        digest = content_hash(elem)
+        post = self.get(place, digest)
+        if post is None:
+            post = convert(elem)
+            self.put(place, digest, post)
+        return post
+
+    def clear(self):
+        '''
+        Discard every fragment, and reset the hit and miss counts.
+        '''
+        with self._lock:
+            self._fragments.clear()
+            self.hits = 0
+            self.misses = 0
@@ -35,8 +35,15 @@ Converts an MEI document to a LilyPond document.
 '''
 
 from lychee import exceptions
+from lychee.converters.outbound import fragments
 from lychee.logs import OUTBOUND_LOG as log
-from lychee.namespaces import mei
+from lychee.namespaces import mei, xml
+
+
+# (section @xml:id, staff @n, measure @n) -> the LilyPond for that measure, for the same MEI content.
+# For a <staff> without <measure> elements, the measure @n is None and the LilyPond is for all its
+# layers.
+_FRAGMENTS = fragments.FragmentCache()
 
 
 def check_tag(m_thing, tag_name):
@@ -329,16 +336,34 @@ def staffdef(m_staffdef):
     return ' '.join(post)
 
 
+def clear_caches():
+    '''
+    Empty the cache of converted measures and staves.
+    '''
+    _FRAGMENTS.clear()
+
+
+def _staff_layers(m_staff):
+    '''
+    Convert the layers of a <staff> without <measure> elements.
+    '''
+    return ' '.join(layers(m_staff)) + '\n'
+
+
 @log.wrap('info', 'convert staff')
-def staff(m_staff, m_staffdef):
+def staff(m_staff, m_staffdef, section_id=None):
     '''
+    The LilyPond for each measure, or for the layers of a <staff> without measures, is cached by
+    ``section_id``, the staff and measure @n, and the MEI content. Only the measures that changed
+    since the last conversion are converted again.
     '''
     check_tag(m_staff, mei.STAFF)
     check_tag(m_staffdef, mei.STAFF_DEF)
+    staff_n = m_staff.get('n')
 
     post = [
         '\\new Staff {\n',
-        '%{{ staff {0} %}}\n'.format(m_staff.get('n')),
+        '%{{ staff {0} %}}\n'.format(staff_n),
         '\\set Staff.instrumentName = "{0}"\n'.format(m_staffdef.get('label', '')),
         clef(m_staffdef) + '\n',
         key(m_staffdef) + '\n',
@@ -347,11 +372,11 @@ def staff(m_staff, m_staffdef):
 
     there_are_no_measures = True
     for elem in m_staff.iterchildren(tag=mei.MEASURE):
-        post.append(measure(elem))
+        post.append(_FRAGMENTS.fragment((section_id, staff_n, elem.get('n')), elem, measure))
         there_are_no_measures = False
 
     if there_are_no_measures:
-        post.append(' '.join(layers(m_staff)) + '\n')
+        post.append(_FRAGMENTS.fragment((section_id, staff_n, None), m_staff, _staff_layers))
 
     post.append('}\n')
 
@@ -372,7 +397,7 @@ def section(m_section):
 
     for m_staffdef in m_section.iterfind('./{}//{}'.format(mei.SCORE_DEF, mei.STAFF_DEF)):
         query = './/{tag}[@n="{n}"]'.format(tag=mei.STAFF, n=m_staffdef.get('n'))
-        post.append(staff(m_section.find(query), m_staffdef))
+        post.append(staff(m_section.find(query), m_staffdef, m_section.get(xml.ID)))
 
     post.append('>>\n')
     post.append('\\layout { }\n')
@@ -39,16 +39,23 @@ Convert a Lychee-MEI document to a standard MEI document.
     :mod:`lychee.signals.outbound` module for more information.
 '''
 
+import copy
 from fractions import Fraction
 
 from lxml import etree
 
 from lychee import exceptions
+from lychee.converters import layers
+from lychee.converters.outbound import fragments
 from lychee.namespaces import mei, xml
 
 _ERR_INPUT_NOT_SECTION = 'LMEI-to-MEI did not receive a <section>'
 
-_DURATION_HAVING_ELEMENTS = (mei.CHORD, mei.NOTE, mei.REST, mei.SPACE)
+# (section @xml:id, staff @n, index among <staff> with that @n, layer @n) -> the MEI <layer> made
+# from that LMEI <layer> for each measure, and how many of those measures are complete, for the
+# same <layer> content and metre. These are shared by the "mei" and "verovio" outbound formats, and
+# copied into every output.
+_LAYERS = fragments.FragmentCache()
 
 
 def convert(document, **kwargs):
@@ -91,13 +98,18 @@ def wrap_section_element(section):
     return post
 
 
-def create_measures(lmei_section):
+def create_measures(lmei_section, contents=None):
     '''
     Convert a Lychee-MEI <section> without <measure> elements into an MEI section by adding
     <measure> elements at the expected place in the standard MEI hierarchy.
 
     :param lmei_section: The <section> to convert.
     :type lmei_section: :class:`xml.etree.ElementTree.Element`
+    :param dict contents: If given, the key of every <layer> put in each <measure> is added to the
+        list at that measure's @n (as an int) in this dictionary. A key is the place in
+        :const:`_LAYERS`, the content hash, and which of its measures it is, so two <measure> with
+        the same list of keys are the same. The :mod:`verovio` converter uses them to reuse the
+        serialized measures.
     :returns: A converted <section>.
     :rtype: :class:`xml.etree.ElementTree.Element`
 
@@ -105,131 +117,134 @@ def create_measures(lmei_section):
 
     **Known Limitations**
 
-    - Does not process tuplets.
     - Uses one meter signature for all staves.
     - Uses one meter signature for the whole <section> (cannot change).
     - Assumes 4/4 meter unless indicated otherwise with @meter.count and @meter.unit
       on the *first* <staffDef>.
     '''
 
-    # 0.) The poor man's deep copy.
-    #     This allows us to reuse LMEI elements in the MEI output, rather than deep copying later.
-    l_section = etree.fromstring(etree.tostring(lmei_section))
-
     # 1.) Assume or find a time signature.
     #     Limitation: one time signature for all <staff>.
     #     Limitation: one time signature for the whole <section>.
     #     Limitation: metre must be indicated with @meter.count and @meter.unit on <staffDef>.
-    first_staff_def = l_section.find('.//{tag}'.format(tag=mei.STAFF_DEF))
-    meter_count = float(first_staff_def.get('meter.count', 4))
-    meter_unit = float(first_staff_def.get('meter.unit', 4))
+    first_staff_def = lmei_section.find('.//{tag}'.format(tag=mei.STAFF_DEF))
+    meter_count = Fraction(first_staff_def.get('meter.count', '4'))
+    meter_unit = Fraction(first_staff_def.get('meter.unit', '4'))
     # NB: the "meter count factor" is the beat count we actually need in every measure
     meter_count_factor = meter_count / meter_unit
 
-    # 1.a.) Make sure all the first <staffDef> knows the metre (in case we assumed it).
-    first_staff_def.set('meter.count', str(int(meter_count)))
-    first_staff_def.set('meter.unit', str(int(meter_unit)))
-
     # 2.) Set up the <section> and copy the <scoreDef> from LMEI to MEI.
+    #     Only the <scoreDef> and the MEI <layer> elements are copied, as they are added to the
+    #     output, so the LMEI <section> is never copied as a whole.
     m_section = etree.Element(mei.SECTION)
-    m_section.append(l_section.find(mei.SCORE_DEF))
+    m_section.append(copy.deepcopy(lmei_section.find(mei.SCORE_DEF)))
+
+    # 2.a.) Make sure the first <staffDef> knows the metre (in case we assumed it).
+    m_first_staff_def = m_section.find('.//{tag}'.format(tag=mei.STAFF_DEF))
+    if m_first_staff_def is not None:
+        m_first_staff_def.set('meter.count', str(int(meter_count)))
+        m_first_staff_def.set('meter.unit', str(int(meter_unit)))
 
     # 3.) For each LMEI <staff>
+    section_id = lmei_section.get(xml.ID)
     m_measures = {}  # NB: in this dict, keys are measure number as int
+    m_staves = {}  # NB: in this dict, keys are (measure number, staff[@n]) and values the <staff>
     meas_nums = {}  # NB: in this dict, keys are staff[@n] and values are the measure number most
                     #     recently processed for that <staff>
-    for l_staff in l_section.iterfind(mei.STAFF):
+    staff_counts = {}  # NB: in this dict, keys are staff[@n] and values are the number of <staff>
+                       #     with that @n already processed
+    for l_staff in lmei_section.iterfind(mei.STAFF):
+        staff_n = l_staff.get('n')
+        staff_index = staff_counts.get(staff_n, 0)
+        staff_counts[staff_n] = staff_index + 1
         # in case we already had a <staff> with this @n, measure numbers don't start at 1
-        previous_measures = meas_nums.get(l_staff.get('n'), 0)
+        previous_measures = meas_nums.get(staff_n, 0)
         highest_meas_num_in_this_staff = previous_measures
 
         # 4.) For each LMEI <layer>
         for l_layer in l_staff.iterfind(mei.LAYER):
-            # 5.) Find enough stuff for an MEI <measure> and stick it in.
-            #     Limitation: does not handle tuplets.
-            meas_num = previous_measures + 1
-            beat_count = 0.0
-            # We can't use beat_count to tell us when we're at the start of a <measure> (and should
-            # therefore make new <measure> and <layer> elements) because there may be elements
-            # without duration at the start of a <measure>.
-            things_in_this_measure = 0
-
-            # Hold information about tuplets.
-            # Keys are @xml:id of affected chord/note/rest/spacer (without leading #).
-            # Value is a list of tuplet ratios as Fraction instances. When you multiply the @dur
-            # of a note in a tuplet by these Fraction instances, you get the note's "beat count."
-            # To save memory, remove values from the dictionary once the note is converted.
-            tuplets = {}
-
-            for l_elem in l_layer.iterfind('*'):
-                if things_in_this_measure == 0:
-                    # create a new measure, or find it from a previous <staff>
-                    if meas_num in m_measures:
-                        m_meas = m_measures[meas_num]
-                    else:
-                        m_meas = etree.SubElement(m_section, mei.MEASURE, n=str(meas_num))
-                        m_measures[meas_num] = m_meas
-
-                    # try to find this <staff> from a previous <layer>
-                    m_staff = m_meas.find('{tag}[@n="{n}"]'.format(tag=mei.STAFF, n=l_staff.get('n')))
-                    if m_staff is None:
-                        m_staff = etree.SubElement(m_meas, mei.STAFF, n=l_staff.get('n'))
-                    m_layer = etree.SubElement(m_staff, mei.LAYER, n=l_layer.get('n'))
-
-                # count the duration of this element (if relevant)
-                if l_elem.tag not in _DURATION_HAVING_ELEMENTS:
-                    pass
-                elif (beat_count == 0.0 and
-                      l_elem.get('dur') == '1' and
-                      l_elem.get(xml.ID) not in tuplets):
-                    # whole note as first thing in measure will always take the whole measure
-                    beat_count = meter_count_factor
-                else:
-                    # It's "scaled" according to the meter-count factor.
-                    # Use float() so the division works properly.
-                    scaled_dur = 1.0 / float(l_elem.get('dur'))
-
-                    if l_elem.get('dots'):
-                        last_value_added = scaled_dur
-                        for _ in range(int(l_elem.get('dots'))):
-                            last_value_added /= 2.0
-                            scaled_dur += last_value_added
-
-                    if l_elem.get(xml.ID) in tuplets:
-                        for each_tuplet in tuplets[l_elem.get(xml.ID)]:
-                            scaled_dur = scaled_dur * each_tuplet
-
-                        del tuplets[l_elem.get(xml.ID)]
-
-                    beat_count += scaled_dur
-
-                # set up a <tupletSpan>
-                if l_elem.tag == mei.TUPLET_SPAN:
-                    plist = l_elem.get('plist', '')
-                    plist = plist.replace('#', '')
-                    if plist != '':
-                        plist = plist.split(' ')
-                        tuplet_ratio = Fraction(
-                            int(l_elem.get('numbase', 0)),
-                            int(l_elem.get('num', 0))
-                        )
-                        for each_xmlid in plist:
-                            if each_xmlid in tuplets:
-                                tuplets[each_xmlid].append(tuplet_ratio)
-                            else:
-                                tuplets[each_xmlid] = [tuplet_ratio]
-
-                m_layer.append(l_elem)
-                things_in_this_measure += 1
-
-                if beat_count >= meter_count_factor:
-                    highest_meas_num_in_this_staff = max(highest_meas_num_in_this_staff, meas_num)
-                    beat_count = 0.0
-                    meas_num += 1
-                    things_in_this_measure = 0
+            # 5.) Divide the elements into an MEI <layer> for each <measure>, unless this <layer>
+            #     and the metre are the same as last time.
+            place = (section_id, staff_n, staff_index, l_layer.get('n'))
+            digest = (fragments.content_hash(l_layer), meter_count_factor)
+            built = _LAYERS.get(place, digest)
+            if built is None:
+                built = _build_layers(l_layer, meter_count_factor)
+                _LAYERS.put(place, digest, built)
+            m_layers, closed_measures = built
+
+            # 6.) Stick them in.
+            meas_num = previous_measures
+            for index, m_layer in enumerate(m_layers):
+                meas_num += 1
+                # create a new measure, or find it from a previous <staff>
+                m_meas = m_measures.get(meas_num)
+                if m_meas is None:
+                    m_meas = etree.SubElement(m_section, mei.MEASURE, n=str(meas_num))
+                    m_measures[meas_num] = m_meas
+
+                # try to find this <staff> from a previous <layer>
+                m_staff = m_staves.get((meas_num, staff_n))
+                if m_staff is None:
+                    m_staff = etree.SubElement(m_meas, mei.STAFF, n=staff_n)
+                    m_staves[(meas_num, staff_n)] = m_staff
+                m_staff.append(copy.deepcopy(m_layer))
+
+                if contents is not None:
+                    contents.setdefault(meas_num, []).append((place, digest, index))
+
+            highest_meas_num_in_this_staff = max(highest_meas_num_in_this_staff,
+                                                 previous_measures + closed_measures)
 
         # update "meas_nums" for next time we hit a <staff> with this @n
-        meas_nums[l_staff.get('n')] = highest_meas_num_in_this_staff
-
+        meas_nums[staff_n] = highest_meas_num_in_this_staff
 
     return m_section
+
+
+def clear_caches():
+    '''
+    Empty the cache of the MEI <layer> elements made from each LMEI <layer>.
+    '''
+    _LAYERS.clear()
+
+
+def _build_layers(l_layer, meter_count_factor):
+    '''
+    Divide the elements of a <layer> into an MEI <layer> for each measure.
+
+    :param l_layer: The LMEI <layer>.
+    :type l_layer: :class:`xml.etree.ElementTree.Element`
+    :param meter_count_factor: The beat count of a complete measure, as a fraction of a whole note.
+    :type meter_count_factor: :class:`fractions.Fraction`
+    :returns: The MEI <layer> for each measure, with copies of the LMEI elements, and the number of
+        those measures that are complete.
+    :rtype: 2-tuple of tuple of :class:`xml.etree.ElementTree.Element` and int
+    '''
+    sizes, closed_measures = _measure_layout(l_layer, meter_count_factor)
+    m_layers = []
+    l_elems = l_layer.iterfind('*')
+    for size in sizes:
+        m_layer = etree.Element(mei.LAYER, n=l_layer.get('n'))
+        for _ in range(size):
+            m_layer.append(copy.deepcopy(next(l_elems)))
+        m_layers.append(m_layer)
+    return tuple(m_layers), closed_measures
+
+
+def _measure_layout(l_layer, meter_count_factor):
+    '''
+    Find how the elements of a <layer> are divided into measures.
+
+    :param l_layer: The LMEI <layer>.
+    :type l_layer: :class:`xml.etree.ElementTree.Element`
+    :param meter_count_factor: The beat count of a complete measure, as a fraction of a whole note.
+    :type meter_count_factor: :class:`fractions.Fraction`
+    :returns: The number of child elements in each measure, in order, and the number of those
+        measures that are complete. The last measure may be incomplete.
+    :rtype: 2-tuple of list of int and int
+    '''
+    spans = layers.LayerTiming(l_layer).measures(meter_count_factor)
+    sizes = [span.stop - span.start for span in spans]
+    closed_measures = sum(1 for span in spans if span.complete)
+    return sizes, closed_measures
@@ -227,3 +227,32 @@ class TestFormatTitleStmt(object):
         with pytest.raises(exceptions.LycheeMEIWarning) as exc:
             docout.format_title_stmt(title)
         assert docout._MISSING_TITLE_DATA == exc.value[0]
+
+
+class TestFindLastChangeset(object):
+    '''
+    Tests for document_outbound.find_last_changeset().
+    '''
+
+    def test_index(self):
+        '''
+        The "last_changeset" index is used when present.
+        '''
+        revlog = {'history': [], 'changesets': {}, 'last_changeset': {'Sme-s-m-l-e1111111': 'abc'}}
+        assert 'abc' == docout.find_last_changeset('Sme-s-m-l-e1111111', revlog)
+        assert '' == docout.find_last_changeset('Sme-s-m-l-e2222222', revlog)
+
+    def test_scan(self):
+        '''
+        Without the index, the most recent changeset with the file is found.
+        '''
+        revlog = {
+            'history': ['abc', 'def', 'ghi'],
+            'changesets': {
+                'abc': {'files': ['Sme-s-m-l-e1111111']},
+                'def': {'files': ['Sme-s-m-l-e1111111', 'score']},
+                'ghi': {'files': ['score']},
+            },
+        }
+        assert 'def' == docout.find_last_changeset('Sme-s-m-l-e1111111', revlog)
+        assert '' == docout.find_last_changeset('Sme-s-m-l-e2222222', revlog)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               lychee/converters/outbound/tests/test_fragments.py
+# Purpose:                Tests for the "fragments" module.
+#
+# Copyright (C) 2017 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Tests for the "fragments" module.
+'''
+
+from lxml import etree
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from lychee.converters.outbound import fragments
+from lychee.namespaces import mei
+
+
+class TestContentHash(object):
+    '''
+    Tests for content_hash().
+    '''
+
+    def test_same_content(self):
+        '''
+        Equal elements have the same hash, and the tail text does not count.
+        '''
+        first = etree.fromstring('<a><b n="1"/>tail one</a>')[0]
+        second = etree.fromstring('<a><b n="1"/>tail two</a>')[0]
+        assert fragments.content_hash(first) == fragments.content_hash(second)
+
+    def test_different_content(self):
+        '''
+        Elements with different attributes or descendants have different hashes.
+        '''
+        one = etree.fromstring('<b n="1"><c/></b>')
+        two = etree.fromstring('<b n="2"><c/></b>')
+        three = etree.fromstring('<b n="1"><d/></b>')
+        assert len(set(fragments.content_hash(x) for x in (one, two, three))) == 3
+        assert fragments.content_hash(one, two) != fragments.content_hash(two, one)
+
+
+class TestFragmentCache(object):
+    '''
+    Tests for FragmentCache.
+    '''
+
+    def test_get_put(self):
+        '''
+        A fragment is only returned for the same place and hash.
+        '''
+        cache = fragments.FragmentCache()
+        cache.put(('s', '1', '1'), b'abc', 'frag')
+        assert 'frag' == cache.get(('s', '1', '1'), b'abc')
+        assert cache.get(('s', '1', '1'), b'xyz') is None
+        assert cache.get(('s', '1', '2'), b'abc') is None
+        assert (1, 2) == (cache.hits, cache.misses)
+
+    def test_replace(self):
+        '''
+        Storing new content at a place replaces the old fragment.
+        '''
+        cache = fragments.FragmentCache()
+        cache.put('place', b'abc', 'old')
+        cache.put('place', b'xyz', 'new')
+        assert 1 == len(cache)
+        assert cache.get('place', b'abc') is None
+        assert 'new' == cache.get('place', b'xyz')
+
+    def test_size(self):
+        '''
+        The least-recently used places are discarded first.
+        '''
+        cache = fragments.FragmentCache(size=2)
+        cache.put('one', b'1', 'one')
+        cache.put('two', b'2', 'two')
+        cache.get('one', b'1')
+        cache.put('three', b'3', 'three')
+        assert 2 == len(cache)
+        assert cache.get('two', b'2') is None
+        assert 'one' == cache.get('one', b'1')
+
+    def test_fragment(self):
+        '''
+        The "convert" function is only called when the element's content changed.
+        '''
+        cache = fragments.FragmentCache()
+        convert = mock.Mock(side_effect=lambda elem: elem.get('n'))
+        elem = etree.Element(mei.MEASURE, n='1')
+
+        assert '1' == cache.fragment('m', elem, convert)
+        assert '1' == cache.fragment('m', etree.Element(mei.MEASURE, n='1'), convert)
+        assert 1 == convert.call_count
+        assert '2' == cache.fragment('m', etree.Element(mei.MEASURE, n='2'), convert)
+        assert 2 == convert.call_count
+
+    def test_clear(self):
+        '''
+        clear() discards the fragments and the counts.
+        '''
+        cache = fragments.FragmentCache()
+        cache.put('place', b'abc', 'frag')
+        cache.get('place', b'abc')
+        cache.clear()
+        assert 0 == len(cache)
+        assert (0, 0) == (cache.hits, cache.misses)
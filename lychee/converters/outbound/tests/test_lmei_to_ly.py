@@ -30,6 +30,11 @@ from lxml import etree
 
 import pytest
 
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
 from lychee.converters.outbound import lilypond
 from lychee import exceptions
 from lychee.namespaces import mei
@@ -516,3 +521,66 @@ class TestSection(object):
             "}\n",
         ])
         assert lilypond.section(m_section) == expected
+
+
+class TestFragmentCache(object):
+    '''
+    Converted measures and staves are cached.
+    '''
+
+    SECTION = '''
+        <mei:section xmlns:mei="http://www.music-encoding.org/ns/mei" xml:id="Sme-s-m-l-e1">
+            <mei:scoreDef>
+                <mei:staffGrp>
+                    <mei:staffDef n="1" clef.line="2" clef.shape="G"/>
+                    <mei:staffDef n="2" clef.line="4" clef.shape="F"/>
+                </mei:staffGrp>
+            </mei:scoreDef>
+            <mei:staff n="1">
+                <mei:measure n="1">
+                    <mei:layer n="1"><mei:note dur="2" oct="5" pname="a"/></mei:layer>
+                </mei:measure>
+                <mei:measure n="2">
+                    <mei:layer n="1"><mei:note dur="2" oct="5" pname="{0}"/></mei:layer>
+                </mei:measure>
+            </mei:staff>
+            <mei:staff n="2">
+                <mei:layer n="1"><mei:note dur="1" oct="2" pname="d"/></mei:layer>
+            </mei:staff>
+        </mei:section>
+        '''
+
+    def setup_method(self, method):
+        '''Clear the cache.'''
+        lilypond.clear_caches()
+
+    def teardown_method(self, method):
+        '''Clear the cache.'''
+        lilypond.clear_caches()
+
+    def test_unchanged(self):
+        '''
+        Nothing is converted again when nothing changed.
+        '''
+        expected = lilypond.section(etree.fromstring(self.SECTION.format('b')))
+        with mock.patch('lychee.converters.outbound.lilypond.measure') as mock_measure:
+            with mock.patch('lychee.converters.outbound.lilypond.layers') as mock_layers:
+                actual = lilypond.section(etree.fromstring(self.SECTION.format('b')))
+        assert expected == actual
+        assert 0 == mock_measure.call_count
+        assert 0 == mock_layers.call_count
+
+    def test_one_measure_changed(self):
+        '''
+        Only the measure that changed is converted again, and the result is the same as without the
+        cache.
+        '''
+        lilypond.section(etree.fromstring(self.SECTION.format('b')))
+        changed = etree.fromstring(self.SECTION.format('c'))
+        with mock.patch('lychee.converters.outbound.lilypond.measure', wraps=lilypond.measure) as mock_measure:
+            actual = lilypond.section(changed)
+        assert 1 == mock_measure.call_count
+        assert '2' == mock_measure.call_args[0][0].get('n')
+        lilypond.clear_caches()
+        assert lilypond.section(changed) == actual
+        assert "%{ m.2 %} %{ l.1 %} c''2 |\n" in actual
@@ -26,6 +26,8 @@
 Tests for "lmei_to_mei.py" and "verovio.py"
 '''
 
+import io
+
 from lxml import etree
 import pytest
 
@@ -1132,6 +1134,214 @@ class TestMeasureCreation(object):
 
         assert_elements_equal(expected, actual)
 
+    def test_tuplets_4(self):
+        """
+        septuplet that fills a 1/4 measure exactly
+
+        With floating-point durations the seven notes add up to slightly less than a quarter note,
+        so the next note would be put in the same measure.
+        """
+        initial = etree.fromstring('''
+            <mei:section xmlns:mei="http://www.music-encoding.org/ns/mei">
+                <mei:scoreDef>
+                    <mei:staffGrp>
+                        <mei:staffDef lines="5" n="1" meter.count="1" meter.unit="4"/>
+                    </mei:staffGrp>
+                </mei:scoreDef>
+                <mei:staff n="1">
+                    <mei:layer n="1">
+                        <mei:tupletSpan num="7" numbase="4" plist="#sept-1 #sept-2 #sept-3 #sept-4 #sept-5 #sept-6 #sept-7"/>
+                        <mei:rest dur="16" xml:id="sept-1"/>
+                        <mei:rest dur="16" xml:id="sept-2"/>
+                        <mei:rest dur="16" xml:id="sept-3"/>
+                        <mei:rest dur="16" xml:id="sept-4"/>
+                        <mei:rest dur="16" xml:id="sept-5"/>
+                        <mei:rest dur="16" xml:id="sept-6"/>
+                        <mei:rest dur="16" xml:id="sept-7"/>
+                        <mei:rest dur="4"/>
+                    </mei:layer>
+                </mei:staff>
+            </mei:section>
+            ''')
+
+        actual = lmei_to_mei.create_measures(initial)
+
+        measures = actual.findall(mei.MEASURE)
+        assert len(measures) == 2
+        assert len(measures[0].findall('.//{0}'.format(mei.REST))) == 7
+        assert len(measures[1].findall('.//{0}'.format(mei.REST))) == 1
+
+    def test_input_not_modified(self):
+        """the LMEI <section> is the same after conversion, and shares no elements with the output"""
+        initial = etree.fromstring('''
+            <mei:section xmlns:mei="http://www.music-encoding.org/ns/mei">
+                <mei:scoreDef>
+                    <mei:staffGrp>
+                        <mei:staffDef lines="5" n="1"/>
+                    </mei:staffGrp>
+                </mei:scoreDef>
+                <mei:staff n="1">
+                    <mei:layer n="1">
+                        <mei:note pname="c" oct="4" dur="2"/>
+                        <mei:note pname="d" oct="4" dur="2"/>
+                        <mei:note pname="e" oct="4" dur="1"/>
+                    </mei:layer>
+                </mei:staff>
+            </mei:section>
+            ''')
+        before = etree.tostring(initial)
+
+        actual = lmei_to_mei.create_measures(initial)
+
+        assert etree.tostring(initial) == before
+        assert len(actual.findall(mei.MEASURE)) == 2
+        # the assumed metre is only set in the output
+        assert actual.find('.//{0}'.format(mei.STAFF_DEF)).get('meter.count') == '4'
+        for elem in actual.iter():
+            assert elem.getroottree().getroot() is actual
+
+
+class TestMeasureLayoutCache(object):
+    '''
+    The MEI <layer> elements made from each LMEI <layer>, for each measure, are cached.
+    '''
+
+    SECTION = '''
+        <mei:section xmlns:mei="http://www.music-encoding.org/ns/mei" xml:id="Sme-s-m-l-e1">
+            <mei:scoreDef>
+                <mei:staffGrp>
+                    <mei:staffDef n="1" meter.count="{0}" meter.unit="4"/>
+                </mei:staffGrp>
+            </mei:scoreDef>
+            <mei:staff n="1">
+                <mei:layer n="1">
+                    <mei:note dur="2" oct="4" pname="c"/>
+                    <mei:note dur="2" oct="4" pname="d"/>
+                    <mei:note dur="2" oct="4" pname="e"/>
+                </mei:layer>
+                <mei:layer n="2">
+                    <mei:rest dur="1"/>
+                    <mei:rest dur="{1}"/>
+                </mei:layer>
+            </mei:staff>
+            <mei:staff n="1">
+                <mei:layer n="1">
+                    <mei:note dur="1" oct="4" pname="f"/>
+                </mei:layer>
+            </mei:staff>
+        </mei:section>
+        '''
+
+    def setup_method(self, method):
+        '''Clear the cache.'''
+        lmei_to_mei.clear_caches()
+
+    def teardown_method(self, method):
+        '''Clear the cache.'''
+        lmei_to_mei.clear_caches()
+
+    def convert(self, count, dur):
+        '''Run create_measures(), and return the result and the layers whose layout was found.'''
+        with mock.patch('lychee.converters.outbound.mei._measure_layout',
+                        wraps=lmei_to_mei._measure_layout) as mock_layout:
+            actual = lmei_to_mei.create_measures(etree.fromstring(self.SECTION.format(count, dur)))
+        return actual, [each_call[0][0].get('n') for each_call in mock_layout.call_args_list]
+
+    def test_unchanged(self):
+        '''The layout of every <layer> is reused, and the result is the same.'''
+        expected, first_layers = self.convert(4, 2)
+        actual, second_layers = self.convert(4, 2)
+        assert ['1', '2', '1'] == first_layers
+        assert [] == second_layers
+        assert_elements_equal(expected, actual)
+
+    def test_layer_changed(self):
+        '''Only the <layer> that changed is laid out again.'''
+        self.convert(4, 2)
+        actual, layers = self.convert(4, 1)
+        assert ['2'] == layers
+        lmei_to_mei.clear_caches()
+        expected, _ = self.convert(4, 1)
+        assert_elements_equal(expected, actual)
+        # the whole rests make two complete measures, so the second <staff> starts in m.3
+        assert 3 == len(actual.findall(mei.MEASURE))
+
+    def test_meter_changed(self):
+        '''Every <layer> is laid out again when the metre changes.'''
+        self.convert(4, 2)
+        actual, layers = self.convert(2, 2)
+        assert ['1', '2', '1'] == layers
+        assert 4 == len(actual.findall(mei.MEASURE))
+
+    def test_output_copied(self):
+        '''Modifying the output doesn't modify the cached <layer> elements.'''
+        expected, _ = self.convert(4, 2)
+        first, _ = self.convert(4, 2)
+        first.find('.//{0}'.format(mei.NOTE)).set('pname', 'b')
+        actual, _ = self.convert(4, 2)
+        assert_elements_equal(expected, actual)
+
+
+class TestVerovioMeasureCache(object):
+    '''
+    The serialized <measure> elements of the Verovio converter are cached.
+    '''
+
+    SECTION = '''
+        <mei:section xmlns:mei="http://www.music-encoding.org/ns/mei" xml:id="Sme-s-m-l-e2">
+            <mei:scoreDef>
+                <mei:staffGrp>
+                    <mei:staffDef n="1" meter.count="4" meter.unit="4"/>
+                </mei:staffGrp>
+            </mei:scoreDef>
+            <mei:staff n="1">
+                <mei:layer n="1">{0}</mei:layer>
+            </mei:staff>
+            <mei:staff n="1">
+                <mei:layer n="1">
+                    <mei:note dur="1" oct="4" pname="f"/>
+                    <mei:note dur="1" oct="4" pname="g"/>
+                </mei:layer>
+            </mei:staff>
+        </mei:section>
+        '''
+
+    def setup_method(self, method):
+        '''Clear the caches.'''
+        lmei_to_mei.clear_caches()
+        verovio.clear_caches()
+
+    def teardown_method(self, method):
+        '''Clear the caches.'''
+        lmei_to_mei.clear_caches()
+        verovio.clear_caches()
+
+    def convert(self, rests):
+        '''Run export_for_verovio() with a number of whole rests in the first <staff>.'''
+        return verovio.export_for_verovio(
+            etree.fromstring(self.SECTION.format('<mei:rest dur="1"/>' * rests)))
+
+    def test_unchanged(self):
+        '''Every <measure> is reused, and the result is the same.'''
+        expected = self.convert(1)
+        assert 3 == verovio._MEASURES.misses
+        actual = self.convert(1)
+        assert 3 == verovio._MEASURES.hits
+        assert 3 == verovio._MEASURES.misses
+        assert expected == actual
+
+    def test_measures_moved(self):
+        '''
+        When the second <staff> starts one measure later, its measures aren't reused at their old
+        @n, even though its <layer> didn't change.
+        '''
+        self.convert(1)
+        actual = self.convert(2)
+        self.setup_method(None)
+        expected = self.convert(2)
+        assert expected == actual
+        assert '<measure n="4"><staff n="1"><layer n="1"><note dur="1" oct="4" pname="g"/>' in actual
+
 
 class TestToVerovio(object):
 
@@ -1141,17 +1351,80 @@ class TestToVerovio(object):
         '''
         Make sure it works.
         '''
-        document = 'hello'
+        document = etree.Element(mei.SECTION)
         wrap_return = etree.fromstring('<mei:section xmlns:mei="http://www.music-encoding.org/ns/mei"></mei:section>')
         mock_wrap.return_value = wrap_return
-        expected = '<?xml version="1.0" encoding="UTF-8"?><section xmlns:mei="http://www.music-encoding.org/ns/mei"/>'
+        expected = '<?xml version="1.0" encoding="UTF-8"?><section></section>'
 
         actual = verovio.export_for_verovio(document)
 
-        mock_create.assert_called_once_with(document)
+        mock_create.assert_called_once_with(document, {})
         assert expected == actual
         assert isinstance(actual, unicode)
 
+    def test_iter_for_verovio(self):
+        '''
+        There is one chunk for each child of the <section>, plus the end of the document, and they
+        make the same document as export_for_verovio().
+        '''
+        def make_section():
+            return etree.fromstring('''
+                <mei:section xmlns:mei="http://www.music-encoding.org/ns/mei">
+                    <mei:scoreDef>
+                        <mei:staffGrp>
+                            <mei:staffDef lines="5" n="1" meter.count="2" meter.unit="4"/>
+                        </mei:staffGrp>
+                    </mei:scoreDef>
+                    <mei:staff n="1">
+                        <mei:layer n="1">
+                            <mei:note pname="c" oct="4" dur="2" xml:id="n-1"/>
+                            <mei:note pname="d" oct="4" dur="2" mei:label="mei:d"/>
+                        </mei:layer>
+                    </mei:staff>
+                </mei:section>
+                ''')
+
+        actual = list(verovio.iter_for_verovio(make_section()))
+
+        assert 4 == len(actual)  # <scoreDef>, two <measure>, and the end
+        assert all(isinstance(chunk, bytes) for chunk in actual)
+        assert actual[0].startswith(b'<?xml version="1.0" encoding="UTF-8"?><mei><music>')
+        assert b'</section></score></mdiv></body></music></mei>' == actual[-1]
+        document = b''.join(actual)
+        assert document.decode('utf-8') == verovio.export_for_verovio(make_section())
+        assert b'xmlns' not in document
+        # only names lose the namespace, not values
+        assert b'<note pname="d" oct="4" dur="2" label="mei:d"/>' in document
+        assert b'xml:id="n-1"' in document
+
+    def test_write_for_verovio_1(self):
+        '''
+        Write to a file-like object.
+        '''
+        section = etree.Element(mei.SECTION)
+        etree.SubElement(etree.SubElement(section, mei.SCORE_DEF), mei.STAFF_DEF, n='1')
+        output = io.BytesIO()
+
+        verovio.write_for_verovio(section, output)
+
+        assert output.getvalue() == (
+            b'<?xml version="1.0" encoding="UTF-8"?><mei><music><body><mdiv><score><section>'
+            b'<scoreDef><staffDef n="1" meter.count="4" meter.unit="4"/></scoreDef>'
+            b'</section></score></mdiv></body></music></mei>')
+
+    def test_write_for_verovio_2(self, tmpdir):
+        '''
+        Write to a pathname.
+        '''
+        section = etree.Element(mei.SECTION)
+        etree.SubElement(etree.SubElement(section, mei.SCORE_DEF), mei.STAFF_DEF, n='1')
+        pathname = str(tmpdir.join('verovio_input'))
+
+        verovio.write_for_verovio(section, pathname)
+
+        with open(pathname, 'rb') as the_file:
+            assert the_file.read() == verovio.export_for_verovio(section).encode('utf-8')
+
 
 class TestIntegration(object):
     '''
@@ -1371,6 +1644,16 @@ class TestIntegration(object):
             verovio.convert(document)
         assert verovio._ERR_INPUT_NOT_SECTION == exc.value.args[0]
 
+    def test_integration_to_verovio_stream(self):
+        '''
+        For the LMEI to Verovio converter that produces chunks. Input is an _Element with the
+        wrong tag.
+        '''
+        document = etree.Element('dddddddddddddd')
+        with pytest.raises(exceptions.OutboundConversionError) as exc:
+            verovio.convert_to_stream(document)
+        assert verovio._ERR_INPUT_NOT_SECTION == exc.value.args[0]
+
     def test_integration_to_verovio_3(self):
         '''
         For the LMEI to Verovio converer. Input is an _Element with the wrong tag.
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               lychee/converters/outbound/tests/test_vcs_outbound.py
+# Purpose:                Tests for the outbound "vcs" converter.
+#
+# Copyright (C) 2017 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Tests for the outbound "vcs" converter.
+'''
+
+import os
+import shutil
+import tempfile
+
+import hug
+from mercurial import commands, hg, ui
+
+from lychee.converters.outbound import vcs
+
+
+class TestHistoryIndex(object):
+    '''
+    Tests for HistoryIndex and convert_helper().
+    '''
+
+    def setup_method(self):
+        '''
+        Make a repository with one changeset.
+        '''
+        vcs.clear_caches()
+        self.repo_dir = tempfile.mkdtemp()
+        self.hug = hug.Hug(self.repo_dir)
+        self.hug.username = 'Danceathon Smith <danceathon@example.com>'
+        self.commit('Sme-s-m-l-e1111111')
+
+    def teardown_method(self):
+        '''
+        Remove the repository.
+        '''
+        vcs.clear_caches()
+        shutil.rmtree(self.repo_dir)
+
+    def commit(self, xmlid):
+        '''
+        Commit a change to the file for a <section>.
+        '''
+        pathname = os.path.join(self.repo_dir, '{0}.mei'.format(xmlid))
+        with open(pathname, 'a') as the_file:
+            the_file.write('<section/>\n')
+        self.hug.add([pathname])
+        self.hug.commit('change {0}'.format(xmlid))
+
+    def test_incremental(self):
+        '''
+        Only the changesets committed since the last update are read.
+        '''
+        first = vcs.convert_helper(self.repo_dir)
+        assert 1 == len(first['history'])
+
+        self.commit('Sme-s-m-l-e2222222')
+        self.commit('Sme-s-m-l-e1111111')
+        index = vcs.history_index(self.repo_dir)
+        real_extend = index._extend
+        added = []
+        index._extend = lambda csets: added.extend(x.rev() for x in csets) or real_extend(csets)
+        actual = vcs.convert_helper(self.repo_dir)
+
+        assert [1, 2] == added
+        assert 3 == len(actual['history'])
+        assert first['history'][0] == actual['history'][0]
+        assert 1 == len(first['history'])  # earlier output is not modified
+        assert actual['history'] == actual['users']['Danceathon Smith <danceathon@example.com>']
+        assert ['Sme-s-m-l-e1111111'] == actual['changesets'][actual['history'][2]]['files']
+        assert 2 == actual['changesets'][actual['history'][2]]['number']
+
+    def test_rollback(self):
+        '''
+        After a rollback, the history is read again.
+        '''
+        self.commit('Sme-s-m-l-e2222222')
+        before = vcs.convert_helper(self.repo_dir)
+        myui = ui.ui()
+        myui.setconfig('ui', 'quiet', True)
+        commands.rollback(myui, hg.repository(myui, self.repo_dir))
+        self.hug = hug.Hug(self.repo_dir)
+        self.hug.username = 'Fortitude Johnson <strong_john@example.com>'
+        self.commit('Sme-s-m-l-e3333333')
+
+        actual = vcs.convert_helper(self.repo_dir)
+        assert before['history'][0] == actual['history'][0]
+        assert 2 == len(actual['history'])
+        assert before['history'][1] not in actual['changesets']
+        assert 'Fortitude Johnson <strong_john@example.com>' in actual['users']
+        assert 'Sme-s-m-l-e3333333' in actual['changesets'][actual['history'][1]]['files']
+
+    def test_sections(self):
+        '''
+        The "sections" and "last_changeset" indices are updated with each new changeset.
+        '''
+        first = vcs.convert_helper(self.repo_dir)
+        self.commit('Sme-s-m-l-e2222222')
+        self.commit('Sme-s-m-l-e1111111')
+        actual = vcs.convert_helper(self.repo_dir)
+
+        history = actual['history']
+        assert {'Sme-s-m-l-e1111111': [history[0], history[2]],
+                'Sme-s-m-l-e2222222': [history[1]]} == actual['sections']
+        assert {'Sme-s-m-l-e1111111': history[2],
+                'Sme-s-m-l-e2222222': history[1]} == actual['last_changeset']
+        assert {'Sme-s-m-l-e1111111': history[0]} == first['last_changeset']
+
+    def test_unchanged(self):
+        '''
+        Without new changesets, the same data is returned; with them, the unchanged parts are
+        shared with the earlier data.
+        '''
+        self.commit('Sme-s-m-l-e2222222')
+        first = vcs.convert_helper(self.repo_dir)
+        assert first is vcs.convert_helper(self.repo_dir)
+
+        self.commit('Sme-s-m-l-e1111111')
+        actual = vcs.convert_helper(self.repo_dir)
+        assert actual is not first
+        assert actual['sections']['Sme-s-m-l-e2222222'] is first['sections']['Sme-s-m-l-e2222222']
+        assert 1 == len(first['sections']['Sme-s-m-l-e1111111'])
+        assert 2 == len(actual['sections']['Sme-s-m-l-e1111111'])
+
+    def test_convert_copies(self):
+        '''
+        convert() returns a copy, so modifying it doesn't modify the shared data.
+        '''
+        actual = vcs.convert(self.repo_dir)
+        shared = vcs.convert_helper(self.repo_dir)
+        assert shared == actual
+        cset_id = actual['history'][0]
+
+        actual['history'].append('x')
+        actual['users']['Danceathon Smith <danceathon@example.com>'].append('x')
+        actual['changesets'][cset_id]['files'].append('x')
+        actual['sections']['Sme-s-m-l-e1111111'].append('x')
+        actual['last_changeset']['x'] = 'x'
+
+        assert shared is vcs.convert_helper(self.repo_dir)
+        assert [cset_id] == shared['history']
+        assert [cset_id] == shared['users']['Danceathon Smith <danceathon@example.com>']
+        assert ['Sme-s-m-l-e1111111'] == shared['changesets'][cset_id]['files']
+        assert [cset_id] == shared['sections']['Sme-s-m-l-e1111111']
+        assert 'x' not in shared['last_changeset']
@@ -70,12 +70,31 @@ Here is a sample of the data outputted from this module.
                 'description': 'Add section C1',
                 'number': '1',
             },
-        }
+        },
+        # "sections" is a dict where keys are "score" and the @xml:id of <section> elements, and
+        #    values are the changesets that modified them, in order
+        'sections': {
+            'score': ['529003fcbb3d8394f324bbd6ccb5586101864cbb'],
+            '270842928': ['41962ee9069382d1fbbba5251ee0b5de99b18df6'],
+        },
+        # "last_changeset" is a dict with the same keys as "sections," and values are the most
+        #    recent changeset that modified each
+        'last_changeset': {
+            'score': '529003fcbb3d8394f324bbd6ccb5586101864cbb',
+            '270842928': '41962ee9069382d1fbbba5251ee0b5de99b18df6',
+        },
     }
 
+The history is kept in a :class:`HistoryIndex` for each repository, so that later conversions only
+read the changesets committed since the previous one. The index shares its data between conversions,
+so :func:`convert` returns a copy, which the slots of
+:const:`~lychee.signals.outbound.CONVERSION_FINISHED` may modify.
+
 '''
 
 import datetime
+import os.path
+import threading
 
 from mercurial import ui, hg
 
@@ -106,49 +125,178 @@ def convert(repo_dir, **kwargs):
     :param str repo_dir: The absolute pathname to the repository for which to produce data.
     :raises: :exc:`lychee.exceptions.OutboundConversionError` when there is a forseeable error.
     '''
-    return convert_helper(repo_dir)
+    return _copy_data(convert_helper(repo_dir))
 
 
-def convert_helper(repo_dir):
-    # TODO: migrate this functionality to the "mercurial-hug" library
+def _copy_data(data):
     '''
-    Do the actual work for :func:`convert`. This helper function exists so that the
-    :mod:`document_outbound` converter can call this converter without having to emit the
-    :const:`CONVERSION_FINISH` signal.
+    Copy the VCS data returned by :meth:`HistoryIndex.update`, so the copy can be modified.
+    '''
+    return {
+        'history': list(data['history']),
+        'users': {user: list(cset_ids) for user, cset_ids in data['users'].items()},
+        'changesets': {cset_id: dict(cset, files=list(cset['files']))
+                       for cset_id, cset in data['changesets'].items()},
+        'sections': {each_file: list(cset_ids) for each_file, cset_ids in data['sections'].items()},
+        'last_changeset': dict(data['last_changeset']),
+    }
 
-    :param str repo_dir: Absolute pathname to the Mercurial repository's directory.
-    :returns: Information from the Version Control System in the format described above.
-    :rtype: dict
+
+class HistoryIndex(object):
     '''
-    myui = ui.ui()
-    repo = hg.repository(myui, repo_dir)
+    The VCS data for a repository, updated incrementally.
 
-    post = {'history': [], 'users': {}, 'changesets': {}}
+    The index remembers the last changeset it read. Each call to :meth:`update` reads only the
+    changesets after that one, using a Mercurial repository object that is kept between calls. If
+    the last changeset read is no longer in the repository (after a "rollback" or "strip," for
+    example) the whole history is read again.
 
-    for i in repo:
-        # get this changeset
-        cset = repo[i]
+    The data returned by :meth:`update` is shared: when there are no new changesets, the same
+    dictionary is returned again, and when there are, only the lists and dictionaries that change
+    are copied. Callers must not modify it; :func:`convert` returns a copy for that reason.
 
-        # get its ID as hexadecimal string
-        cset_id = cset.hex()
+    It is safe to use a :class:`HistoryIndex` from more than one thread.
+    '''
 
-        # append the ID to the list of changeset order
-        post['history'].append(cset_id)
+    def __init__(self, repo_dir):
+        '''
+        :param str repo_dir: Absolute pathname to the Mercurial repository's directory.
+        '''
+        self._repo_dir = repo_dir
+        self._repo = None
+        self._lock = threading.Lock()
+        self.reset()
 
-        # add the ID to the author's list of changesets
-        if cset.user() in post['users']:
-            post['users'][cset.user()].append(cset_id)
+    def reset(self):
+        '''
+        Forget the history read so far, so the next :meth:`update` reads all of it.
+        '''
+        # (revision number, node) of the last changeset read
+        self._last = None
+        # the data returned by update()
+        self._data = None
+
+    def _get_repo(self):
+        '''
+        Return the repository object, reloading the parts that changed since it was last used.
+        '''
+        if self._repo is None:
+            self._repo = hg.repository(ui.ui(), self._repo_dir)
         else:
-            post['users'][cset.user()] = [cset_id]
-
-        # add changeset details
-        post['changesets'][cset_id] = {
-            'hash': cset.hex(),
-            'user': cset.user(),
-            'date': cset.date()[0],
-            'files': prep_files(cset.files()),
-            'description': cset.description(),
-            'number': cset.rev(),
+            self._repo.invalidate()
+        return self._repo
+
+    def _extend(self, csets):
+        '''
+        Return new data with "csets" added to the end of the history. The lists and dictionaries
+        that don't change are shared with the previous data.
+        '''
+        old = self._data
+        if old is None:
+            old = {'history': [], 'users': {}, 'changesets': {}, 'sections': {},
+                   'last_changeset': {}}
+
+        history = []
+        changesets = {}
+        users = {}
+        sections = {}
+        last_changeset = {}
+        for cset in csets:
+            cset_id = cset.hex()
+            history.append(cset_id)
+            users.setdefault(cset.user(), []).append(cset_id)
+            files = prep_files(cset.files())
+            changesets[cset_id] = {
+                'hash': cset_id,
+                'user': cset.user(),
+                'date': cset.date()[0],
+                'files': files,
+                'description': cset.description(),
+                'number': cset.rev(),
+            }
+            for each_file in files:
+                sections.setdefault(each_file, []).append(cset_id)
+                last_changeset[each_file] = cset_id
+
+        post = {
+            'history': old['history'] + history,
+            'users': dict(old['users']),
+            'changesets': dict(old['changesets']),
+            'sections': dict(old['sections']),
+            'last_changeset': dict(old['last_changeset']),
         }
+        for user, cset_ids in users.items():
+            post['users'][user] = post['users'].get(user, []) + cset_ids
+        for each_file, cset_ids in sections.items():
+            post['sections'][each_file] = post['sections'].get(each_file, []) + cset_ids
+        post['changesets'].update(changesets)
+        post['last_changeset'].update(last_changeset)
+        return post
 
-    return post
+    def update(self):
+        '''
+        Read the changesets committed since the last update.
+
+        :returns: Information from the Version Control System in the format described above. It's
+            the same object as the previous update's when there are no new changesets, and is not
+            modified by later updates.
+        :rtype: dict
+        '''
+        with self._lock:
+            repo = self._get_repo()
+
+            if self._last is not None:
+                changelog = repo.unfiltered().changelog
+                rev, node = self._last
+                if rev >= len(changelog) or changelog.node(rev) != node:
+                    self.reset()
+
+            start = 0 if self._last is None else self._last[0] + 1
+            csets = [repo[i] for i in repo.changelog.revs(start)]
+            if csets or self._data is None:
+                self._data = self._extend(csets)
+                if csets:
+                    self._last = (csets[-1].rev(), csets[-1].node())
+
+            return self._data
+
+
+# absolute repository pathname -> HistoryIndex
+_INDICES = {}
+_INDICES_LOCK = threading.Lock()
+
+
+def history_index(repo_dir):
+    '''
+    Return the :class:`HistoryIndex` for a repository, making it if required.
+
+    :param str repo_dir: Absolute pathname to the Mercurial repository's directory.
+    :rtype: :class:`HistoryIndex`
+    '''
+    repo_dir = os.path.abspath(repo_dir)
+    with _INDICES_LOCK:
+        if repo_dir not in _INDICES:
+            _INDICES[repo_dir] = HistoryIndex(repo_dir)
+        return _INDICES[repo_dir]
+
+
+def clear_caches():
+    '''
+    Discard the history index of every repository.
+    '''
+    with _INDICES_LOCK:
+        _INDICES.clear()
+
+
+def convert_helper(repo_dir):
+    # TODO: migrate this functionality to the "mercurial-hug" library
+    '''
+    Do the actual work for :func:`convert`. This helper function exists so that the
+    :mod:`document_outbound` converter can call this converter without having to emit the
+    :const:`CONVERSION_FINISH` signal.
+
+    :param str repo_dir: Absolute pathname to the Mercurial repository's directory.
+    :returns: Information from the Version Control System in the format described above.
+    :rtype: dict
+    '''
+    return history_index(repo_dir).update()
@@ -37,9 +37,9 @@ Convert a Lychee-MEI document to a standard MEI document that Verovio will accep
 
 This module runs the same conversions as :mod:`lmei_to_mei`, and makes the following two changes:
 
-#. Convert the document to a string with an XML declaration that uses double quotes. Note that,
-   although the XML declaration is not strictly required, and although it may use single quote
-   marks around the attribute values, Verovio will not accept such a document.
+#. Write the document with an XML declaration that uses double quotes. Note that, although the XML
+   declaration is not strictly required, and although it may use single quote marks around the
+   attribute values, Verovio will not accept such a document.
 #. Remove the "mei:" namespace from all tag names. In proper XML, such tag namespaces *may* be
    omitted in some situations, but Verovio again will not attempt to parse an MEI document where
    this is not the situation.
@@ -47,24 +47,45 @@ This module runs the same conversions as :mod:`lmei_to_mei`, and makes the follo
 These limitations in Verovio likely arise from the "pugixml" library. They are trivial enough, and
 do not require breaking conformance with XML, so we'll just work with what we have.
 
+The document is written incrementally with :class:`lxml.etree.xmlfile`, one child of the <section>
+at a time, so that the whole serialized document never has to be held in memory at once. Use
+:func:`write_for_verovio` to write to a file, or :func:`iter_for_verovio` (the ``'verovio-stream'``
+outbound format) to receive the document in chunks. Either way, the conversion to MEI is finished
+before anything is written, so its errors are raised by the converter.
+
+The serialized form of every <measure> is kept in a
+:class:`~lychee.converters.outbound.fragments.FragmentCache`, and written again without serializing
+the <measure> as long as it's made from the same LMEI <layer> elements. Use :func:`clear_caches` to
+empty it.
+
 .. note:: This is an outbound converter that does not emit signals directly. Refer to the
     :mod:`lychee.signals.outbound` module for more information.
 '''
 
 # NOTE: tests for this module are held in "test_lmei_to_mei.py"
 
+import collections
+
 from lxml import etree
 
 import lychee
+from lychee.converters.outbound import fragments
 from lychee.converters.outbound import mei as lmei_to_mei
 from lychee import exceptions
-from lychee.namespaces import mei
+from lychee.namespaces import mei, xml
 from lychee.signals import outbound
 
 
 _ERR_INPUT_NOT_SECTION = 'LMEI-to-Verovio did not receive a <section>'
 _XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>'
 
+# (section @xml:id, measure @n) -> the serialized <measure>, for the same keys from the "contents"
+# of lmei_to_mei.create_measures()
+_MEASURES = fragments.FragmentCache()
+
+# The MEI document to write, and the place and digest in _MEASURES of each <measure>, by @n.
+_Converted = collections.namedtuple('_Converted', ('document', 'measures'))
+
 
 def convert(document, **kwargs):
     '''
@@ -82,6 +103,23 @@ def convert(document, **kwargs):
         raise exceptions.OutboundConversionError(_ERR_INPUT_NOT_SECTION)
 
 
+def convert_to_stream(document, **kwargs):
+    '''
+    Convert a Lychee-MEI document into a Verovio-compliant MEI document, in chunks.
+
+    :param document: The Lychee-MEI document.
+    :type document: :class:`xml.etree.ElementTree.Element` or :class:`xml.etree.ElementTree.ElementTree`
+    :returns: An iterator of UTF-8 encoded chunks of the Verovio-compliant MEI document. The
+        document is serialized as the iterator is consumed.
+    :rtype: iterator of bytes
+    :raises: :exc:`lychee.exceptions.OutboundConversionError` when there is a forseeable error.
+    '''
+    if isinstance(document, etree._Element) and mei.SECTION == document.tag:
+        return iter_for_verovio(document)
+    else:
+        raise exceptions.OutboundConversionError(_ERR_INPUT_NOT_SECTION)
+
+
 def export_for_verovio(document):
     '''
     Run the LMEI-to-MEI conversion, then export to a string with XML declaration, and remove the
@@ -92,8 +130,178 @@ def export_for_verovio(document):
     :returns: A string for Verovio.
     :rtype: unicode
     '''
-    document = lmei_to_mei.wrap_section_element(lmei_to_mei.create_measures(document))
-    document = etree.tostring(document, encoding=unicode)
-    document = document.replace('mei:', '')
-    document = _XML_DECLARATION + document
-    return document
+    return b''.join(iter_for_verovio(document)).decode('utf-8')
+
+
+def iter_for_verovio(document):
+    '''
+    Run the LMEI-to-MEI conversion, then export in chunks with an XML declaration and without the
+    "mei:" namespacing in the tags.
+
+    :param document: The LMEI document to convert to a Verovio-compliant XML document.
+    :type document: :class:`xml.etree.ElementTree.Element`
+    :returns: A generator of UTF-8 encoded chunks: one for every child of the <section> (the first
+        also holds the start of the document), and one for the end of the document.
+    :rtype: generator of bytes
+
+    The LMEI-to-MEI conversion runs before this function returns; only the serialization runs as
+    the generator is consumed.
+    '''
+    return _iter_chunks(_convert_to_mei(document))
+
+
+def _iter_chunks(converted):
+    '''
+    Generator for :func:`iter_for_verovio`, with a document already converted to MEI.
+    '''
+    chunks = _ChunkList()
+    for _ in _write(converted, chunks):
+        if chunks:
+            yield b''.join(chunks)
+            del chunks[:]
+    if chunks:
+        yield b''.join(chunks)
+
+
+def write_for_verovio(document, output):
+    '''
+    Run the LMEI-to-MEI conversion, then write to a file with an XML declaration and without the
+    "mei:" namespacing in the tags.
+
+    :param document: The LMEI document to convert to a Verovio-compliant XML document.
+    :type document: :class:`xml.etree.ElementTree.Element`
+    :param output: The pathname of the file to write, or a file-like object opened in binary mode.
+    :type output: str or file
+    '''
+    converted = _convert_to_mei(document)
+    if isinstance(output, basestring):
+        with open(output, 'wb') as the_file:
+            for _ in _write(converted, the_file):
+                pass
+    else:
+        for _ in _write(converted, output):
+            pass
+
+
+def clear_caches():
+    '''
+    Empty the cache of serialized measures.
+    '''
+    _MEASURES.clear()
+
+
+class _ChunkList(list):
+    '''
+    A list that :class:`lxml.etree.xmlfile` can write to like a file.
+    '''
+    write = list.append
+
+
+def _convert_to_mei(document):
+    '''
+    Run the LMEI-to-MEI conversion on a <section>.
+
+    :returns: The <mei> element to write, and the place and digest of each <measure>.
+    :rtype: :class:`_Converted`
+    '''
+    contents = {}
+    converted = lmei_to_mei.create_measures(document, contents)
+    section_id = document.get(xml.ID)
+    measures = {str(meas_num): ((section_id, meas_num), tuple(keys))
+                for meas_num, keys in contents.items()}
+    return _Converted(lmei_to_mei.wrap_section_element(converted), measures)
+
+
+def _write(converted, output):
+    '''
+    Write a Verovio-compliant MEI document.
+
+    :param converted: The MEI document from :func:`_convert_to_mei`.
+    :type converted: :class:`_Converted`
+    :param output: A file-like object opened in binary mode.
+    :returns: A generator that writes the next part of the document each time it is advanced, and
+        yields after the part has been flushed to ``output``.
+
+    The elements written are removed from the converted document, so that each part of the document
+    may be freed as soon as it is written.
+    '''
+    output.write(_XML_DECLARATION.encode('utf-8'))
+    with etree.xmlfile(output, encoding='UTF-8') as xf:
+        for _ in _write_element(xf, converted.document, converted.measures, output):
+            yield
+
+
+def _write_element(xf, elem, measures, output):
+    '''
+    Write one element, without namespaces, with :class:`lxml.etree.xmlfile`.
+
+    :param xf: The incremental writer.
+    :param elem: The element to write. It is modified.
+    :type elem: :class:`xml.etree.ElementTree.Element`
+    :param dict measures: The place and digest in :const:`_MEASURES` of each <measure>, by @n.
+    :param output: The file-like object ``xf`` writes to.
+    :returns: A generator that yields after every child of the <section> is written.
+
+    The <section> and the elements that wrap it are opened as incremental elements, and their
+    children written one at a time. Every other element is written with its descendants, except
+    that a <measure> already in :const:`_MEASURES` is written to ``output`` as it was serialized.
+    '''
+    if elem.tag in _WRAPPERS:
+        with xf.element(_local_name(elem.tag), attrib=_local_attrib(elem)):
+            if elem.text:
+                xf.write(elem.text)
+            for child in list(elem):
+                for _ in _write_element(xf, child, measures, output):
+                    yield
+
+    else:
+        parent = elem.getparent()
+        if parent is not None:
+            parent.remove(elem)
+        key = measures.get(elem.get('n')) if elem.tag == mei.MEASURE else None
+        if key is None:
+            _remove_namespaces(elem)
+            xf.write(elem)
+            xf.flush()
+        else:
+            serialized = _MEASURES.get(*key)
+            if serialized is None:
+                _remove_namespaces(elem)
+                serialized = etree.tostring(elem, encoding='UTF-8')
+                _MEASURES.put(key[0], key[1], serialized)
+            xf.flush()
+            output.write(serialized)
+        yield
+
+
+def _remove_namespaces(elem):
+    '''
+    Remove the MEI namespace from the names of an element, its descendants, and their attributes.
+    '''
+    for each_elem in elem.iter(tag=etree.Element):
+        each_elem.tag = _local_name(each_elem.tag)
+        for name in each_elem.attrib.keys():
+            if name.startswith(mei.MEINS):
+                each_elem.set(_local_name(name), each_elem.attrib.pop(name))
+    # the "mei" prefix is declared on the ancestors we just left, but is no longer used
+    etree.cleanup_namespaces(elem)
+
+
+def _local_name(name):
+    '''
+    Remove the MEI namespace from a tag or attribute name.
+    '''
+    if name.startswith(mei.MEINS):
+        return name[len(mei.MEINS):]
+    return name
+
+
+def _local_attrib(elem):
+    '''
+    Copy the attributes of an element, with the MEI namespace removed from their names.
+    '''
+    return {_local_name(name): value for name, value in elem.attrib.items()}
+
+
+# the <section> and the elements from :func:`lmei_to_mei.wrap_section_element`
+_WRAPPERS = (mei.MEI, mei.MUSIC, mei.BODY, mei.MDIV, mei.SCORE, mei.SECTION)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               lychee/converters/tests/test_layers.py
+# Purpose:                Tests for the "layers" module.
+#
+# Copyright (C) 2017 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Tests for the "layers" module.
+'''
+
+from fractions import Fraction
+import random
+
+from lxml import etree
+
+from lychee.converters import layers
+from lychee.namespaces import mei, xml
+
+
+def make_layer(*things):
+    '''
+    Make a <layer> from (tag, dur, dots) tuples.
+    '''
+    layer = etree.Element(mei.LAYER, n='1')
+    for i, (tag, dur, dots) in enumerate(things):
+        elem = etree.SubElement(layer, tag, {xml.ID: 'e{}'.format(i)})
+        if dur is not None:
+            elem.set('dur', dur)
+        if dots:
+            elem.set('dots', str(dots))
+    return layer
+
+
+def reference_layout(l_layer, measure_length):
+    '''
+    Divide a <layer> into measures by adding up Fraction durations one element at a time.
+    '''
+    tuplets = layers.tuplet_ratios(l_layer)
+    sizes = []
+    closed = 0
+    beats = Fraction(0)
+    count = 0
+    for l_elem in l_layer.iterfind('*'):
+        if count == 0:
+            sizes.append(0)
+        if l_elem.get('dur') is not None:
+            ratio = tuplets.get(l_elem.get(xml.ID))
+            if beats == 0 and l_elem.get('dur') == '1' and ratio is None:
+                beats = measure_length
+            else:
+                value = Fraction(1, int(l_elem.get('dur')))
+                for dot in range(int(l_elem.get('dots', 0))):
+                    value += Fraction(1, int(l_elem.get('dur')) * 2 ** (dot + 1))
+                beats += value * (1 if ratio is None else ratio)
+        sizes[-1] += 1
+        count += 1
+        if beats >= measure_length:
+            closed += 1
+            beats = Fraction(0)
+            count = 0
+    return sizes, closed
+
+
+class TestLayerTiming(object):
+    '''
+    Tests for LayerTiming.
+    '''
+
+    def test_durations(self):
+        '''
+        Durations and onsets are exact, with dots and tuplets, and other elements take no time.
+        '''
+        layer = make_layer((mei.NOTE, '4', 1), (mei.REST, '8', 0), (mei.NOTE, '8', 0),
+                           (mei.NOTE, '8', 0), (mei.NOTE, '8', 0), (mei.SPACE, '2', 2))
+        etree.SubElement(layer, mei.TUPLET_SPAN, num='3', numbase='2', plist='#e2 #e3 #e4')
+
+        timing = layers.LayerTiming(layer)
+        assert 7 == len(timing)
+        expected = [Fraction(3, 8), Fraction(1, 8), Fraction(1, 12), Fraction(1, 12),
+                    Fraction(1, 12), Fraction(7, 8), Fraction(0)]
+        assert expected == [timing.duration(i) for i in range(len(timing))]
+        assert Fraction(13, 8) == timing.onset(len(timing))
+        assert Fraction(3, 4) == timing.onset(5)
+        assert all(isinstance(x, int) for x in timing.onsets)
+        assert 24 == timing.denominator
+
+    def test_kinds(self):
+        '''
+        Every element has a kind.
+        '''
+        layer = etree.Element(mei.LAYER)
+        etree.SubElement(layer, mei.NOTE, dur='4', pname='c', oct='4')
+        chord = etree.SubElement(layer, mei.CHORD, dur='4')
+        etree.SubElement(chord, mei.NOTE, pname='e', oct='4', **{'accid.ges': 'f'})
+        etree.SubElement(chord, mei.NOTE, pname='g', oct='4')
+        etree.SubElement(layer, mei.REST, dur='4')
+        etree.SubElement(layer, mei.TUPLET_SPAN)
+
+        timing = layers.LayerTiming(layer)
+        assert [layers.NOTE, layers.CHORD, layers.REST, layers.OTHER] == timing.kinds
+
+    def test_measures(self):
+        '''
+        Measures end with the element that fills them, and record how far it goes past the end.
+        '''
+        layer = make_layer((mei.NOTE, '2', 0), (mei.NOTE, '2', 1), (mei.NOTE, '4', 0),
+                           (mei.NOTE, '1', 0), (mei.NOTE, '4', 0))
+        spans = layers.LayerTiming(layer).measures(Fraction(1))
+        assert [(0, 2, True), (2, 4, True), (4, 5, False)] == [x[:3] for x in spans]
+        assert [Fraction(1, 4), Fraction(1, 4), Fraction(0)] == [x.overflow for x in spans]
+
+    def test_whole_note_fills_measure(self):
+        '''
+        A whole note at the start of a measure fills it, even after elements without duration.
+        '''
+        layer = make_layer((mei.TUPLET_SPAN, None, 0), (mei.NOTE, '1', 0), (mei.NOTE, '4', 0))
+        spans = layers.LayerTiming(layer).measures(Fraction(3, 4))
+        assert [(0, 2, True), (2, 3, False)] == [x[:3] for x in spans]
+
+    def test_same_as_reference(self):
+        '''
+        The measures are the same as adding up each duration as a Fraction.
+        '''
+        rng = random.Random(4)
+        for _ in range(30):
+            things = []
+            for _ in range(rng.randint(0, 60)):
+                if rng.random() < 0.1:
+                    things.append((mei.TUPLET_SPAN, None, 0))
+                else:
+                    things.append((rng.choice((mei.NOTE, mei.REST, mei.CHORD, mei.SPACE)),
+                                   rng.choice(('1', '2', '4', '8', '16')), rng.randint(0, 2)))
+            layer = make_layer(*things)
+            if len(things) > 3:
+                plist = ' '.join('#e{}'.format(i) for i in range(1, 4))
+                etree.SubElement(layer, mei.TUPLET_SPAN, num='3', numbase='2', plist=plist)
+            for length in (Fraction(1), Fraction(3, 4), Fraction(6, 8), Fraction(5, 16)):
+                spans = layers.LayerTiming(layer).measures(length)
+                actual = ([x.stop - x.start for x in spans], sum(1 for x in spans if x.complete))
+                assert reference_layout(layer, length) == actual
+
+    def test_empty(self):
+        '''
+        An empty <layer> has no measures.
+        '''
+        timing = layers.LayerTiming(etree.Element(mei.LAYER))
+        assert [] == timing.measures(Fraction(1))
+        assert [0] == timing.onsets
+
+
+class TestResolveTies(object):
+    '''
+    Tests for resolve_ties().
+    '''
+
+    @staticmethod
+    def make(*things):
+        '''
+        Make a <layer> from strings like "c~" for a tied note, "ce~" for a chord with a tied "e,"
+        and "r" for a rest.
+        '''
+        layer = etree.Element(mei.LAYER)
+        for thing in things:
+            if thing == 'r':
+                etree.SubElement(layer, mei.REST, dur='4')
+                continue
+            notes = []
+            for char in thing:
+                if char == '~':
+                    notes[-1].set('tie', 'i')
+                else:
+                    notes.append(etree.Element(mei.NOTE, pname=char, oct='4'))
+            if len(notes) == 1:
+                layer.append(notes[0])
+            else:
+                etree.SubElement(layer, mei.CHORD).extend(notes)
+        return layer
+
+    @staticmethod
+    def ties(layer):
+        return [note.get('tie') for note in layer.iter(mei.NOTE)]
+
+    def test_notes(self):
+        '''
+        Ties between notes are initial, medial, or terminal.
+        '''
+        layer = self.make('c', 'c~', 'c~', 'c', 'c')
+        assert 0 == layers.resolve_ties(layer)
+        assert [None, 'i', 'm', 't', None] == self.ties(layer)
+
+    def test_unterminated(self):
+        '''
+        Ties to a different pitch, a rest, or the end of the layer are removed.
+        '''
+        layer = self.make('c~', 'd', 'd~', 'r', 'e~')
+        assert 3 == layers.resolve_ties(layer)
+        assert [None] * 4 == self.ties(layer)
+
+    def test_chords(self):
+        '''
+        Notes in chords are tied to the note with the same pitch in the next element.
+        '''
+        layer = self.make('ce~', 'eg~', 'g', 'c~g~', 'c')
+        assert 1 == layers.resolve_ties(layer)
+        assert [None, 'i', 't', 'i', 't', 'i', None, 't'] == self.ties(layer)
@@ -25,4 +25,4 @@
 
 # NOTE: the __init__ module is not built in the API
 
-from lychee.document.document import Document
+from lychee.document.document import Document, DocumentSnapshot, SavedPathnames
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               lychee/document/cache.py
+# Purpose:                Process-wide cache of parsed <section> files.
+#
+# Copyright (C) 2016 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Process-wide cache of parsed ``<section>`` files.
+
+Every :class:`~lychee.document.Document` loads ``<section>`` elements through :const:`SECTION_CACHE`
+so that a file is parsed once, no matter how many :class:`Document` instances ask for it. Each
+entry is keyed on the file's pathname and how it was parsed, along with its modification time, size,
+and inode, so an entry is never used after the file is replaced or changed.
+
+The cache holds a private copy of each element. Every call to :meth:`SectionCache.get` returns a
+new copy, so callers may modify the element without affecting the cache.
+
+A :class:`SidecarCache` keeps a compact copy of each file in a ``.lychee-cache`` directory beside
+the ``.mei`` files, so a new process can load a repository without parsing the pretty-printed
+files. The ``.mei`` files remain the canonical copy: a sidecar file is only used if it was made from
+the current version of its ``.mei`` file, and may be deleted at any time. In a Mercurial
+repository, the directory is listed in ``.hgignore`` by :func:`lychee.vcs.hg.init_repo`.
+'''
+
+import collections
+import copy
+import hashlib
+import os
+import threading
+
+from lxml import etree
+
+
+# default maximum for SectionCache.max_bytes: 64 MiB of section files
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# translatable strings
+_ERR_VALIDATE = 'SidecarCache "validate" must be "mtime" or "hash", not "{0}"'
+
+
+class SectionCache(object):
+    '''
+    A thread-safe, bounded, least-recently-used cache of parsed XML files.
+
+    The size of each entry is the size of its file on disk, which is proportional to (but smaller
+    than) the memory used by the parsed element. When the total is greater than :attr:`max_bytes`,
+    the least-recently used entries are discarded.
+
+    The :attr:`hits` and :attr:`misses` attributes count calls to :meth:`get` that did and did not
+    find an entry; :attr:`evictions` counts the entries discarded to stay under :attr:`max_bytes`.
+    '''
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        '''
+        :param int max_bytes: The maximum total size of files held in the cache. Use ``0`` to
+            disable the cache.
+        '''
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        # (pathname, mode) -> (key, element, size), least-recently used first
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        '''
+        The total size, in bytes, of the files held in the cache.
+        '''
+        return self._size
+
+    def get(self, pathname, load, mode=None):
+        '''
+        Return a copy of the parsed element for ``pathname``, calling ``load`` if it isn't cached.
+
+        :param str pathname: The pathname of the file to load.
+        :param load: A function that takes ``pathname`` and returns an :class:`ElementTree`.
+        :param str mode: Identifies how ``load`` parses the file. Elements parsed differently from
+            the same file, like with and without whitespace, are cached separately.
+        :returns: The root element of the file.
+        :rtype: :class:`lxml.etree._Element`
+        :raises: Any exception raised by ``load``.
+
+        If ``pathname`` cannot be stat'ed, ``load`` is called and nothing is cached, so that ``load``
+        can raise an appropriate exception.
+        '''
+        try:
+            stat = os.stat(pathname)
+        except OSError:
+            return load(pathname).getroot()
+
+        key = (stat.st_mtime, stat.st_size, stat.st_ino)
+        name = (pathname, mode)
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                # move to the most-recently used end
+                del self._entries[name]
+                self._entries[name] = entry
+                return copy.deepcopy(entry[1])
+            self.misses += 1
+
+        elem = load(pathname).getroot()
+        self._put(name, key, copy.deepcopy(elem), stat.st_size)
+        return elem
+
+    def _put(self, name, key, elem, size):
+        '''
+        Add an entry to the cache, replacing any entry for the same pathname and mode, and evicting
+        least-recently used entries as required.
+        '''
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if name in self._entries:
+                self._size -= self._entries.pop(name)[2]
+            self._entries[name] = (key, elem, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted[2]
+                self.evictions += 1
+
+    def clear(self):
+        '''
+        Remove all the entries and reset the counters.
+        '''
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        '''
+        Return the cache statistics.
+
+        :returns: A dictionary with the ``'hits'``, ``'misses'``, ``'evictions'``, ``'entries'``,
+            ``'bytes'``, and ``'max_bytes'`` of the cache.
+        :rtype: dict
+        '''
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+            }
+
+
+SECTION_CACHE = SectionCache()
+
+
+# name of the directory, in a repository, that holds SidecarCache files
+SIDECAR_DIR = '.lychee-cache'
+
+
+class SidecarCache(object):
+    '''
+    A cache of XML files, kept in compact form in a directory on the filesystem.
+
+    Each sidecar file holds a one-line header, with the key of the source file it was made from,
+    followed by the source file's root element serialized without indentation. With
+    ``validate='mtime'`` the key is the source file's modification time, size, and inode, as for
+    :class:`SectionCache`. With ``validate='hash'`` the key is the SHA-1 hash of the source file,
+    which survives a checkout that changes modification times but costs reading the file.
+
+    The :attr:`hits` and :attr:`misses` attributes count calls to :meth:`load` that did and did not
+    use a sidecar file. Errors reading or writing sidecar files are ignored, so a read-only
+    repository works without the cache.
+    '''
+
+    def __init__(self, repo_path, validate='mtime'):
+        '''
+        :param str repo_path: The directory with the ``.mei`` files. The sidecar files are stored
+            in its :const:`SIDECAR_DIR` subdirectory.
+        :param str validate: Either ``'mtime'`` or ``'hash'``, as described above.
+        :raises: :exc:`ValueError` if ``validate`` is not valid.
+        '''
+        if validate not in ('mtime', 'hash'):
+            raise ValueError(_ERR_VALIDATE.format(validate))
+        self.directory = os.path.join(repo_path, SIDECAR_DIR)
+        self.validate = validate
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, pathname):
+        '''
+        Return the key of a source file, as bytes for the sidecar header.
+
+        :raises: :exc:`OSError` or :exc:`IOError` if the file cannot be read.
+        '''
+        if self.validate == 'hash':
+            with open(pathname, 'rb') as source:
+                return hashlib.sha1(source.read()).hexdigest().encode('ascii')
+        stat = os.stat(pathname)
+        return '{0!r} {1} {2}'.format(stat.st_mtime, stat.st_size, stat.st_ino).encode('ascii')
+
+    def _sidecar_path(self, pathname):
+        '''
+        Return the pathname of the sidecar file for a source file.
+        '''
+        return os.path.join(self.directory, os.path.basename(pathname) + '.xml')
+
+    def load(self, pathname, parse):
+        '''
+        Return the parsed file at ``pathname``, from its sidecar file if that is up to date.
+
+        :param str pathname: The pathname of the source file.
+        :param parse: A function that takes ``pathname`` and returns an :class:`ElementTree`. It is
+            called if there is no up-to-date sidecar file, and the result is saved as the new
+            sidecar file.
+        :returns: The parsed file.
+        :rtype: :class:`lxml.etree._ElementTree`
+        :raises: Any exception raised by ``parse``.
+        '''
+        try:
+            key = self._key(pathname)
+        except (IOError, OSError):
+            # let "parse" raise the appropriate exception
+            return parse(pathname)
+
+        sidecar_path = self._sidecar_path(pathname)
+        try:
+            with open(sidecar_path, 'rb') as sidecar:
+                header = sidecar.readline()
+                if header.rstrip(b'\n') == key:
+                    tree = etree.ElementTree(etree.fromstring(sidecar.read()))
+                    self.hits += 1
+                    return tree
+        except (IOError, OSError, etree.XMLSyntaxError):
+            pass
+
+        self.misses += 1
+        tree = parse(pathname)
+        self._write(sidecar_path, key, tree)
+        return tree
+
+    def _write(self, sidecar_path, key, tree):
+        '''
+        Write a sidecar file, to a temporary file first so a reader never sees a partial file.
+        '''
+        temp_path = '{0}.{1}.tmp'.format(sidecar_path, threading.current_thread().ident)
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            with open(temp_path, 'wb') as sidecar:
+                sidecar.write(key + b'\n')
+                sidecar.write(etree.tostring(tree.getroot(), encoding='UTF-8'))
+            if os.name == 'nt' and os.path.exists(sidecar_path):
+                os.remove(sidecar_path)
+            os.rename(temp_path, sidecar_path)
+        except (IOError, OSError):
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
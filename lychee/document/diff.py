@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               lychee/document/diff.py
+# Purpose:                Compute and apply the differences between two versions of a <section>.
+#
+# Copyright (C) 2017 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Compute and apply the differences between two versions of a ``<section>``.
+
+An inbound conversion produces a whole new ``<section>``, usually without any @xml:id attributes.
+Rather than replacing the stored ``<section>`` with it, :func:`merge` changes the stored element in
+place so it has the same content as the new one. The stored ``<section>``, ``<staff>``,
+``<measure>``, and ``<layer>`` elements keep their @xml:id, so the section is saved to the same
+file, and only the parts of the file that changed are different in the VCS.
+
+:func:`diff` aligns the children of each pair of elements in this order:
+
+#. equal elements at the start and end of both lists, in order;
+#. elements with the same @xml:id;
+#. elements with the same structural hash (see :func:`structural_hash`), which are equal except
+   for @xml:id attributes and blank text;
+#. elements with the same tag and @n attribute, like ``<staff n="1">``;
+#. elements with the same tag, in document order.
+
+Then it makes an "edit script" of :class:`Edit` tuples that :func:`patch` applies to the old element.
+Children are only moved within their parent; an element that moves to another parent is deleted and
+inserted.
+
+An @xml:id in the new element that isn't anywhere in the old element is treated as if it were
+absent. The inbound views step gives every converted element a new random @xml:id, and those must
+not stop the converted elements from being aligned with the stored ones.
+
+Since an aligned element keeps its old @xml:id, the attributes that refer to an @xml:id (@plist,
+@startid, and @endid) are changed to refer to the old one, like a ``<tupletSpan>`` that lists the
+notes of a tuplet. Elements that are inserted keep their new @xml:id, except that the seven-digit
+parts that name an aligned ancestor, in the hierarchical @xml:id values made by the views step, are
+changed to that ancestor's digits. For the structural hash, references are compared by the position
+of the element they refer to, so they don't make equal content look different.
+'''
+
+import collections
+import copy
+import hashlib
+import re
+
+from lychee.namespaces import xml
+
+
+# the kinds of Edit
+INSERT = 'insert'
+DELETE = 'delete'
+MOVE = 'move'
+ATTRIB = 'attrib'
+TEXT = 'text'
+
+# attributes that hold one or more @xml:id references, each optionally starting with "#"
+_REFERENCES = ('plist', 'startid', 'endid')
+# a part of a hierarchical @xml:id that names one element
+_DIGITS = re.compile(r'\d{7}')
+# key in the "memo" dictionary for the roots given to diff()
+_ROOTS = object()
+
+Edit = collections.namedtuple('Edit', ('kind', 'element', 'parent', 'index', 'value'))
+'''
+One change in an edit script.
+
+- ``INSERT``: insert ``element`` (from the new tree) into ``parent`` at ``index``. The ``value`` is
+  a dictionary of the @xml:id values to change in the copy that's inserted, and in its references.
+- ``DELETE``: remove ``element`` from its parent.
+- ``MOVE``: move ``element`` to ``index`` in its ``parent``.
+- ``ATTRIB``: replace the attributes of ``element`` with the dictionary in ``value``.
+- ``TEXT``: set the text of ``element`` to ``value``.
+
+The ``index`` of ``INSERT`` and ``MOVE`` is the position after the whole script is applied.
+'''
+
+
+def _text(text):
+    '''
+    Return "text" or ``None`` if it is blank, since blank text is only indentation.
+    '''
+    if text is None or not text.strip():
+        return None
+    return text
+
+
+def _index_paths(root):
+    '''
+    Return a dictionary from every @xml:id in "root" to the path of child indices to its element.
+    '''
+    post = {}
+    stack = [(root, '')]
+    while stack:
+        elem, path = stack.pop()
+        xmlid = elem.get(xml.ID)
+        if xmlid is not None:
+            post[xmlid] = path
+        for i, child in enumerate(elem):
+            stack.append((child, '{0}/{1}'.format(path, i)))
+    return post
+
+
+def _resolve(elem, value, memo):
+    '''
+    Replace the @xml:id values in a reference attribute of "elem" with the path to their elements,
+    from the root given to :func:`diff`. Values that aren't found, and elements that aren't in a tree
+    given to :func:`diff`, are unchanged.
+    '''
+    node = elem
+    roots = memo.get(_ROOTS, ())
+    while node is not None and not any(node is root for root in roots):
+        node = node.getparent()
+    if node is None:
+        return value
+
+    key = (_ROOTS, node)
+    if key not in memo:
+        memo[key] = _index_paths(node)
+    paths = memo[key]
+    return ' '.join(paths.get(token.lstrip('#'), token) for token in value.split())
+
+
+def _rename(attrib, idmap):
+    '''
+    Return a copy of the "attrib" dictionary with its @xml:id and references changed by "idmap."
+    '''
+    post = dict(attrib)
+    if post.get(xml.ID) in idmap:
+        post[xml.ID] = idmap[post[xml.ID]]
+    for name in _REFERENCES:
+        if name in post:
+            tokens = []
+            for token in post[name].split():
+                prefix = '#' if token.startswith('#') else ''
+                tokens.append(prefix + idmap.get(token[len(prefix):], token[len(prefix):]))
+            post[name] = ' '.join(tokens)
+    return post
+
+
+def structural_hash(elem, _memo=None):
+    '''
+    Compute the hash of an element, without its @xml:id attributes or blank text.
+
+    :param elem: The element to hash, including its descendants.
+    :type elem: :class:`lxml.etree.Element`
+    :returns: The SHA-1 digest.
+    :rtype: bytes
+
+    Two elements with the same structural hash differ at most in their @xml:id attributes, and in
+    whitespace that is only indentation.
+    '''
+    if _memo is not None and elem in _memo:
+        return _memo[elem]
+
+    digest = hashlib.sha1()
+    digest.update(repr(elem.tag).encode('utf-8'))
+    for name, value in sorted(elem.attrib.items()):
+        if name != xml.ID:
+            if name in _REFERENCES and _memo is not None:
+                value = _resolve(elem, value, _memo)
+            digest.update(repr((name, value)).encode('utf-8'))
+    digest.update(repr(_text(elem.text)).encode('utf-8'))
+    for child in elem:
+        digest.update(structural_hash(child, _memo))
+        digest.update(repr(_text(child.tail)).encode('utf-8'))
+
+    post = digest.digest()
+    if _memo is not None:
+        # holding the element also keeps its lxml proxy alive, so it stays a valid key
+        _memo[elem] = post
+    return post
+
+
+def _known_id(elem, known):
+    '''
+    Return the @xml:id of "elem" if it's in the set "known," or ``None``.
+    '''
+    xmlid = elem.get(xml.ID)
+    return xmlid if xmlid in known else None
+
+
+def _has_ids(elem, known):
+    '''
+    Whether "elem" or any of its descendants has an @xml:id in the set "known."
+    '''
+    for each in elem.iter():
+        if each.get(xml.ID) in known:
+            return True
+    return False
+
+
+def _can_pair(old, new, known):
+    '''
+    Whether "old" and "new" may be aligned: the same tag, and not two different @xml:id values.
+    '''
+    if old.tag != new.tag:
+        return False
+    old_id = old.get(xml.ID)
+    new_id = _known_id(new, known)
+    return old_id is None or new_id is None or old_id == new_id
+
+
+def _align(old_children, new_children, memo, known):
+    '''
+    Align two lists of children.
+
+    :returns: A list as long as ``new_children``, holding the index in ``old_children`` aligned
+        with each new child, or ``None`` for new children to insert.
+    '''
+    aligned = [None] * len(new_children)
+    unused = set(range(len(old_children)))
+
+    def same(i, j):
+        '''Whether the children are equal, so they may be aligned before the rest.'''
+        old, new = old_children[i], new_children[j]
+        if old.get(xml.ID) is not None and old.get(xml.ID) == _known_id(new, known):
+            return True
+        return _can_pair(old, new, known) and structural_hash(old, memo) == structural_hash(new, memo)
+
+    # align the equal children at the start and the end in order, so that repeated content (like
+    # identical measures) in the middle can't be aligned across a change
+    start = 0
+    while start < min(len(old_children), len(new_children)) and same(start, start):
+        aligned[start] = start
+        unused.discard(start)
+        start += 1
+    end = 1
+    while (end <= min(len(old_children), len(new_children)) - start and
+           same(len(old_children) - end, len(new_children) - end)):
+        aligned[len(new_children) - end] = len(old_children) - end
+        unused.discard(len(old_children) - end)
+        end += 1
+
+    def pair_by(key, new_key=None):
+        '''Pair the unaligned children that have the same non-None "key."'''
+        new_key = key if new_key is None else new_key
+        available = collections.defaultdict(list)
+        for i in sorted(unused):
+            k = key(old_children[i])
+            if k is not None:
+                available[k].append(i)
+        for j, new in enumerate(new_children):
+            if aligned[j] is not None:
+                continue
+            k = new_key(new)
+            if k is None:
+                continue
+            for i in available.get(k, ()):
+                if i in unused and _can_pair(old_children[i], new, known):
+                    aligned[j] = i
+                    unused.discard(i)
+                    break
+
+    pair_by(lambda elem: elem.get(xml.ID), lambda elem: _known_id(elem, known))
+    pair_by(lambda elem: structural_hash(elem, memo))
+    pair_by(lambda elem: None if elem.get('n') is None else (elem.tag, elem.get('n')))
+    pair_by(lambda elem: elem.tag)
+    return aligned
+
+
+def _stable(indices):
+    '''
+    Return the set of positions in "indices" that form its longest increasing subsequence. The
+    aligned children at these positions don't need to move.
+    '''
+    # patience sorting: tails[k] is the position ending the best subsequence of length k + 1
+    tails = []
+    previous = [None] * len(indices)
+    for pos, value in enumerate(indices):
+        low, high = 0, len(tails)
+        while low < high:
+            mid = (low + high) // 2
+            if indices[tails[mid]] < value:
+                low = mid + 1
+            else:
+                high = mid
+        if low > 0:
+            previous[pos] = tails[low - 1]
+        if low == len(tails):
+            tails.append(pos)
+        else:
+            tails[low] = pos
+
+    post = set()
+    pos = tails[-1] if tails else None
+    while pos is not None:
+        post.add(pos)
+        pos = previous[pos]
+    return post
+
+
+def _map_id(old, new, known, idmap):
+    '''
+    Record in "idmap" that the @xml:id of "new" becomes the @xml:id of "old," if they're different.
+    '''
+    new_id = new.get(xml.ID)
+    old_id = old.get(xml.ID)
+    if new_id is not None and old_id is not None and new_id not in known:
+        idmap[new_id] = old_id
+
+
+def _diff(old, new, memo, known, idmap, edits):
+    '''
+    Append to "edits" the changes that make "old" like "new," which are already aligned. The set
+    "known" holds every @xml:id in the old tree, and "idmap" gets the new @xml:id values that become
+    old ones.
+    '''
+    if structural_hash(old, memo) == structural_hash(new, memo) and not _has_ids(new, known):
+        # the same structure, so the descendants are aligned in document order
+        for old_each, new_each in zip(old.iter(), new.iter()):
+            _map_id(old_each, new_each, known, idmap)
+        return
+
+    _map_id(old, new, known, idmap)
+
+    attrib = dict(new.attrib)
+    if _known_id(new, known) is None and old.get(xml.ID) is not None:
+        attrib[xml.ID] = old.get(xml.ID)
+    if attrib != dict(old.attrib):
+        edits.append(Edit(ATTRIB, old, None, None, attrib))
+    if _text(old.text) != _text(new.text):
+        edits.append(Edit(TEXT, old, None, None, new.text))
+
+    old_children = list(old)
+    new_children = list(new)
+    aligned = _align(old_children, new_children, memo, known)
+    used = set(i for i in aligned if i is not None)
+
+    for i, child in enumerate(old_children):
+        if i not in used:
+            edits.append(Edit(DELETE, child, old, None, None))
+
+    kept = [(j, i) for j, i in enumerate(aligned) if i is not None]
+    stable = _stable([i for j, i in kept])
+    moved = set(j for pos, (j, i) in enumerate(kept) if pos not in stable)
+
+    for j, new_child in enumerate(new_children):
+        i = aligned[j]
+        if i is None:
+            edits.append(Edit(INSERT, new_child, old, j, None))
+        else:
+            if j in moved:
+                edits.append(Edit(MOVE, old_children[i], old, j, None))
+            _diff(old_children[i], new_child, memo, known, idmap, edits)
+
+
+def diff(old, new):
+    '''
+    Compute the changes that make one element like another.
+
+    :param old: The element to change, usually the stored ``<section>``.
+    :type old: :class:`lxml.etree.Element`
+    :param new: The element with the content to use, usually from an inbound conversion.
+    :type new: :class:`lxml.etree.Element`
+    :returns: The edit script. It's empty if ``old`` and ``new`` have the same content.
+    :rtype: list of :class:`Edit`
+
+    The root elements are always aligned with each other. An element in ``old`` keeps its @xml:id
+    when the element aligned with it in ``new`` has none, or has one that isn't in ``old``.
+    '''
+    known = set(each.get(xml.ID) for each in old.iter())
+    known.discard(None)
+    idmap = {}
+    edits = []
+    _diff(old, new, {_ROOTS: (old, new)}, known, idmap, edits)
+
+    # inserted elements are renamed with the digits of their aligned ancestors
+    digits = {}
+    for new_id, old_id in idmap.items():
+        if _DIGITS.search(new_id[-7:]) and _DIGITS.search(old_id[-7:]):
+            digits[new_id[-7:]] = old_id[-7:]
+    for edit in edits:
+        if edit.kind == INSERT:
+            for each in edit.element.iter():
+                xmlid = each.get(xml.ID)
+                if xmlid is not None and xmlid not in idmap and xmlid not in known:
+                    renamed = _DIGITS.sub(lambda match: digits.get(match.group(), match.group()),
+                                          xmlid)
+                    if renamed != xmlid:
+                        idmap[xmlid] = renamed
+
+    # now that every @xml:id is mapped, change the references, and drop the attribute edits that
+    # only differed in references to the new @xml:id values
+    post = []
+    for edit in edits:
+        if edit.kind == ATTRIB:
+            attrib = _rename(edit.value, idmap)
+            if attrib == dict(edit.element.attrib):
+                continue
+            edit = edit._replace(value=attrib)
+        elif edit.kind == INSERT:
+            edit = edit._replace(value=idmap)
+        post.append(edit)
+    return post
+
+
+def patch(edits):
+    '''
+    Apply an edit script in place.
+
+    :param edits: The edit script from :func:`diff`.
+    :type edits: list of :class:`Edit`
+    :returns: ``None``
+
+    The elements inserted are copies, so the "new" tree given to :func:`diff` is not modified.
+    '''
+    for edit in edits:
+        if edit.kind == ATTRIB:
+            edit.element.attrib.clear()
+            for name, value in edit.value.items():
+                edit.element.set(name, value)
+        elif edit.kind == TEXT:
+            edit.element.text = edit.value
+
+    # remove the deleted and moved elements first, so the elements that stay in place are already
+    # in their final order, then put each inserted or moved element at its final index
+    for edit in edits:
+        if edit.kind in (DELETE, MOVE):
+            edit.element.getparent().remove(edit.element)
+    for edit in edits:
+        if edit.kind == INSERT:
+            inserted = copy.deepcopy(edit.element)
+            if edit.value:
+                for each in inserted.iter():
+                    attrib = _rename(each.attrib, edit.value)
+                    if attrib != dict(each.attrib):
+                        each.attrib.update(attrib)
+            edit.parent.insert(edit.index, inserted)
+        elif edit.kind == MOVE:
+            edit.parent.insert(edit.index, edit.element)
+
+
+def merge(old, new):
+    '''
+    Change an element in place so it has the same content as another.
+
+    :param old: The element to change, usually the stored ``<section>``.
+    :type old: :class:`lxml.etree.Element`
+    :param new: The element with the content to use.
+    :type new: :class:`lxml.etree.Element`
+    :returns: The edit script that was applied.
+    :rtype: list of :class:`Edit`
+
+    When elements are inserted, moved, or deleted, the blank text in ``old`` is removed so it's
+    indented like a new element when saved with the "pretty" serialization profile.
+    '''
+    edits = diff(old, new)
+    patch(edits)
+
+    if any(edit.kind in (INSERT, DELETE, MOVE) for edit in edits):
+        for each in old.iter():
+            if _text(each.text) is None:
+                each.text = None
+            if _text(each.tail) is None:
+                each.tail = None
+
+    return edits
@@ -31,6 +31,9 @@ The Lychee-MEI specification is described in :ref:`lychee_mei`. You can find inf
 supported Lychee-MEI metadata headers in :ref:`mei_headers`.
 '''
 
+import functools
+import io
+from multiprocessing.pool import ThreadPool
 import os.path
 import random
 
@@ -41,6 +44,8 @@ from lxml import etree
 
 import lychee
 from lychee import exceptions
+from lychee.document import cache
+from lychee.document.store import SectionStore
 from lychee.logs import DOCUMENT_LOG as log
 from lychee.namespaces import mei, xlink, xml, lychee as lyns
 
@@ -60,6 +65,15 @@ _SAVE_OUT_ERROR = 'Could not save an XML file (IOError).'
 _LY_VERSION_MISSING = 'Lychee-MEI file file is missing @ly:version'
 _LY_VERSION_MISMATCH = 'Lychee-MEI file has different version than us'
 _LY_VERSION_INVALID = 'Lychee-MEI file has invalid @ly:version'
+_ERR_READ_ONLY = 'This DocumentSnapshot is read-only.'
+_ERR_SERIALIZATION = 'Unknown serialization profile: {0}'
+
+# keyword arguments for ElementTree.write() in each serialization profile
+SERIALIZATION_PROFILES = {
+    'pretty': {'encoding': 'UTF-8', 'pretty_print': True, 'xml_declaration': True},
+    'compact': {'encoding': 'UTF-8', 'xml_declaration': True},
+    'c14n': {'method': 'c14n'},
+}
 
 
 def _check_xmlid_chars(xmlid):
@@ -93,13 +107,14 @@ def _set_default(here, this, that):
         return that
 
 
-def _make_empty_all_files(pathname):
+def _make_empty_all_files(pathname, profile='pretty'):
     '''
     Produce and return an empty ``all_files.mei`` file that will be used to cross-reference all
     other files in this repository.
 
     :param str pathname: The pathname to use for the file---must include the "all_files.mei" part.
         If ``pathname`` is ``None``, the file will not be saved.
+    :param str profile: The serialization profile, as for :func:`_save_out`.
     :returns: The XML document produced.
     :rtype: :class:`lxml.etree.ElementTree`
     '''
@@ -108,7 +123,7 @@ def _make_empty_all_files(pathname):
     root.append(etree.Element(mei.MEI))
     tree = etree.ElementTree(root)
     if pathname is not None:
-        _save_out(tree, pathname)
+        _save_out(tree, pathname, profile)
     return tree
 
 
@@ -156,14 +171,18 @@ def _ensure_score_order(score, order):
     return True
 
 
-def _save_out(this, to_here):
+def _save_out(this, to_here, profile='pretty'):
     '''
     Take ``this`` :class:`Element` or :class:`ElementTree` and save ``to_here``.
 
     :param this: An element (tree) to save to a file.
     :type this: :class:`lxml.etree.Element` or :class:`lxml.etree.ElementTree`
     :param str to_here: The pathname in which to save the file.
-    :returns: ``None``
+    :param str profile: The serialization profile: ``'pretty'`` (indented, with an XML declaration),
+        ``'compact'`` (not indented, with an XML declaration), or ``'c14n'`` (Canonical XML).
+    :returns: Whether the file was written. If ``to_here`` already holds the same serialized bytes,
+        it is not written, so its modification time does not change.
+    :rtype: bool
     :raises: :exc:`lychee.exceptions.CannotSaveError` if something messes up
     '''
     # get an ElementTree in "this" and the root Element in "root"
@@ -174,14 +193,56 @@ def _save_out(this, to_here):
         root = this.getroot()
     # make sure the root element has a proper @ly:version attribute
     root.set(lyns.VERSION, lychee.__version__)
-    # finally, save it out
+
+    output = io.BytesIO()
     try:
-        this.write(to_here, encoding='UTF-8', pretty_print=True, xml_declaration=True)
-    except IOError:
+        this.write(output, **SERIALIZATION_PROFILES[profile])
+    except (IOError, OSError):
         raise exceptions.CannotSaveError(_SAVE_OUT_ERROR)
+    output = output.getvalue()
 
+    # skip the write if the file is the same already
+    try:
+        if os.path.getsize(to_here) == len(output):
+            with open(to_here, 'rb') as existing:
+                if existing.read() == output:
+                    return False
+    except (IOError, OSError):
+        pass
+
+    # finally, save it out---into a temporary file first, so that a failed write never leaves a
+    # truncated file in the repository
+    temp_path = '{0}.tmp'.format(to_here)
+    try:
+        with open(temp_path, 'wb') as temp_file:
+            temp_file.write(output)
+        _replace_file(temp_path, to_here)
+    except (IOError, OSError):
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise exceptions.CannotSaveError(_SAVE_OUT_ERROR)
+
+    return True
+
+
+def _replace_file(from_here, to_here):
+    '''
+    Rename ``from_here`` to ``to_here``, replacing ``to_here`` if it exists.
+
+    :param str from_here: The pathname of the file to rename.
+    :param str to_here: The pathname the file should have afterward.
+    :returns: ``None``
+    :raises: :exc:`OSError` if the file cannot be renamed.
 
-def _load_in(from_here, recover=None):
+    On POSIX systems the replacement is atomic, so a reader sees either the old or the new file.
+    '''
+    if six.PY2 and os.name == 'nt' and os.path.exists(to_here):
+        # Python 2 on Windows won't rename over an existing file
+        os.remove(to_here)
+    getattr(os, 'replace', os.rename)(from_here, to_here)
+
+
+def _load_in(from_here, recover=None, sidecar=None):
     '''
     Try to load an MEI/XML file at the path ``from_here``.
 
@@ -190,6 +251,10 @@ def _load_in(from_here, recover=None):
         "recover," which tries "hard to parse through broken XML." Default is ``False``. Generally,
         this should be avoided---callers should make their users aware that they're entering some
         parallel universe when their XML is broken.
+    :param sidecar: A cache of compact copies of the file. If given (and ``recover`` is not), the
+        file is only parsed if its copy in the cache is missing or out of date, and the whitespace
+        that indents the elements is not kept.
+    :type sidecar: :class:`lychee.document.cache.SidecarCache`
     :returns: The MEI/XML document stored at ``from_here``.
     :rtype: :class:`lxml.etree.ElementTree`
     :raises: :exc:`exceptions.FileNotFoundError` if the file does not exist, is not readable, is a
@@ -202,6 +267,8 @@ def _load_in(from_here, recover=None):
         recover = False
 
     try:
+        if sidecar is not None and not recover:
+            return _check_version_attr(sidecar.load(from_here, _parse_compact))
         return _check_version_attr(etree.parse(from_here, etree.XMLParser(recover=recover)))
     except (IOError, OSError):
         raise exceptions.FileNotFoundError(_ERR_MISSING_FILE)
@@ -209,6 +276,14 @@ def _load_in(from_here, recover=None):
         raise exceptions.InvalidFileError(xse.args[0])
 
 
+def _parse_compact(from_here):
+    '''
+    Parse an XML file without the whitespace used to indent the elements, as for a
+    :class:`~lychee.document.cache.SidecarCache`.
+    '''
+    return etree.parse(from_here, etree.XMLParser(remove_blank_text=True))
+
+
 @log.wrap('info', 'check LMEI version attribute', 'action')
 def _check_version_attr(lmei, action):
     '''
@@ -417,6 +492,60 @@ def _init_sections_dict(all_files):
 
     return post
 
+
+def _all_files_key(all_files):
+    '''
+    Summarize the contents of an "all_files" document, for deciding whether it must be rewritten.
+
+    :param all_files: The "all_files" ``<meiCorpus>`` element to summarize.
+    :type all_files: :class:`lxml.etree._Element`
+    :returns: A 3-tuple: whether there is a "head" ``<ptr>``, whether there is a "score" ``<ptr>``,
+        and a sorted tuple of the @xml:id of every ``<section>``.
+    :rtype: tuple
+
+    :meth:`Document.save_everything` compares this to the same summary of the in-memory document.
+    '''
+    has_head = all_files.find('./{}/{}[@targettype="head"]'.format(mei.MEI_HEAD, mei.PTR)) is not None
+    has_score = all_files.find('./{}/{}[@targettype="score"]'.format(mei.MEI, mei.PTR)) is not None
+    return (has_head, has_score, tuple(sorted(_init_sections_dict(all_files))))
+
+
+class SavedPathnames(list):
+    '''
+    The list of pathnames returned by :meth:`Document.save_everything`.
+
+    As a list, this holds the absolute pathname of every file in the Lychee-MEI document. The
+    :attr:`changed` attribute holds the pathnames of the files written by that call, and the
+    :attr:`unchanged` attribute holds the pathnames of files that did not need to be written.
+    '''
+
+    def __init__(self, changed=None, unchanged=None):
+        '''
+        :param changed: Pathnames of files written to the filesystem.
+        :type changed: list of str
+        :param unchanged: Pathnames of files that were already up to date.
+        :type unchanged: list of str
+        '''
+        super(SavedPathnames, self).__init__()
+        self.changed = [] if changed is None else list(changed)
+        self.unchanged = [] if unchanged is None else list(unchanged)
+        self.extend(self.changed)
+        self.extend(self.unchanged)
+
+    def add(self, pathname, changed):
+        '''
+        Append ``pathname`` to this list, and to :attr:`changed` or :attr:`unchanged`.
+
+        :param str pathname: The pathname to append.
+        :param bool changed: Whether the file was written.
+        '''
+        self.append(pathname)
+        if changed:
+            self.changed.append(pathname)
+        else:
+            self.unchanged.append(pathname)
+
+
 def _move_section_to(xmlid, position):  # TODO: this function is untested
     '''
     Slot for the "document.MOVE_SECTION_TO" signal.
@@ -454,6 +583,67 @@ def _move_section_to(xmlid, position):  # TODO: this function is untested
 
 
 
+class _LazyAttribute(object):
+    '''
+    A :class:`Document` attribute that is loaded by calling a function the first time it is read,
+    unless it was assigned first.
+    '''
+
+    def __init__(self, name, load):
+        '''
+        :param str name: The name of the attribute.
+        :param load: A function that takes the :class:`Document` and returns the attribute's value.
+        '''
+        self._name = name
+        self._load = load
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        try:
+            return instance.__dict__[self._name]
+        except KeyError:
+            value = self._load(instance)
+            instance.__dict__[self._name] = value
+            return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self._name] = value
+
+
+def _lazy_all_files(doc):
+    '''
+    Load "all_files.mei" for a :class:`Document`, or make an empty one if it doesn't exist.
+    '''
+    if doc._repo_path is None:
+        return _make_empty_all_files(None)
+    elif os.path.exists(doc._all_files_path):
+        all_files = etree.parse(doc._all_files_path)
+        doc._saved_all_files_key = _all_files_key(all_files)
+        return all_files
+    else:
+        return _make_empty_all_files(doc._all_files_path, doc._serialization)
+
+
+def _lazy_score_order(doc):
+    '''
+    Load the score order for a :class:`Document`, and remember it as the order saved in "score.mei".
+    '''
+    score_order = _load_score_order(doc._repo_path, doc._all_files)
+    if '_saved_score_order' not in doc.__dict__:
+        doc._saved_score_order = list(score_order) if score_order else None
+    return score_order
+
+
+def _lazy_saved_score_order(doc):
+    '''
+    Load the score order in "score.mei" for a :class:`Document` whose score order was replaced
+    before it was loaded.
+    '''
+    score_order = _load_score_order(doc._repo_path, doc._all_files)
+    return list(score_order) if score_order else None
+
+
 class Document(object):
     '''
     Object representing an MEI document. Use methods prefixed with ``get`` to obtain portions of
@@ -470,40 +660,114 @@ class Document(object):
 
     The recommended way to use a :class:`Document` with file output is as a context manager (using
     a :obj:`with` statement). This way, you cannot forget to save your changes to the filesystem.
+
+    **Lazy Loading**
+
+    With ``lazy=True``, constructing a :class:`Document` does not read any files. Each part of the
+    document ("all_files.mei," the score order in "score.mei," and the ``<meiHead>``) is loaded the
+    first time it's needed, so a :class:`Document` used to fetch one ``<section>`` never parses the
+    header. The exceptions that would have been raised by the initialization method are raised by
+    the first method that needs the missing or invalid file instead. Use :meth:`load_everything` to
+    load every part at once.
+
+    **Section Memory Budget**
+
+    Every ``<section>`` loaded or given to :meth:`put_section` is kept in memory. For very large
+    documents, use ``section_budget`` to limit the total size of the ``<section>`` elements held;
+    the least-recently used are evicted as described in :mod:`lychee.document.store`. Sections
+    already saved are loaded from their file again when next requested. Use
+    :meth:`section_store_stats` to see how much is held.
+
+    **Sidecar Cache**
+
+    With ``sidecar='mtime'`` or ``sidecar='hash'``, the ``<section>`` and ``<meiHead>`` files are
+    loaded through a :class:`~lychee.document.cache.SidecarCache` in the ``.lychee-cache``
+    subdirectory of the repository, validated by modification time or by hash. This makes loading a
+    large repository in a new process faster, since the compact copies parse faster than the
+    pretty-printed ``.mei`` files, which remain the canonical form of the document.
+
+    **Serialization**
+
+    Files are written in the ``serialization`` profile given to the initialization method; refer to
+    :func:`_save_out`. The default ``'pretty'`` profile is easiest to read, while ``'compact'``
+    makes smaller files that are faster to write and load. Whatever the profile, a file that would
+    be written with the same bytes it already holds is not written again.
     '''
 
     _APPROVED_HEAD_ELEMENTS = ('fileDesc', 'titleStmt', 'title', 'respStmt', 'arranger', 'author',
         'composer', 'editor', 'funder', 'librettist', 'lyricist', 'sponsor', 'pubStmt')
 
-    def __init__(self, repository_path=None):
+    # the "all_files.mei" document
+    _all_files = _LazyAttribute('_all_files', _lazy_all_files)
+    # @xml:id to the <section> with that id
+    _sections = _LazyAttribute(
+        '_sections',
+        lambda doc: SectionStore(
+            _init_sections_dict(doc._all_files), doc._section_budget, doc._section_is_saved))
+    # the order of <section> elements in the <score>, indicated with @xml:id
+    _score_order = _LazyAttribute('_score_order', _lazy_score_order)
+    # For incremental saving: the score order as it is in "score.mei"; and whether "head.mei" holds
+    # the current <meiHead>.
+    _saved_score_order = _LazyAttribute('_saved_score_order', _lazy_saved_score_order)
+    _head_clean = _LazyAttribute(
+        '_head_clean',
+        lambda doc: doc._all_files.find(
+            './{}/{}[@targettype="head"]'.format(mei.MEI_HEAD, mei.PTR)) is not None)
+
+    def __init__(self, repository_path=None, lazy=False, section_budget=None, sidecar=None,
+                 serialization='pretty'):
         '''
         :param str repository_path: Path to a directory in which the files for this :class:`Document`
             are or will be stored. The default of ``None`` will not save any files.
+        :param bool lazy: Whether to load each part of the document only when it's first needed,
+            rather than now. Refer to "Lazy Loading" above.
+        :param int section_budget: The maximum total size, in bytes of serialized XML, of the
+            ``<section>`` elements held in memory. The default of ``None`` has no limit. Refer to
+            "Section Memory Budget" above.
+        :param str sidecar: How to validate the sidecar cache: ``'mtime'``, ``'hash'``, or the
+            default of ``None`` for no sidecar cache. Refer to "Sidecar Cache" above.
+        :param str serialization: The profile for writing files: ``'pretty'``, ``'compact'``, or
+            ``'c14n'``. Refer to "Serialization" above.
+        :raises: :exc:`ValueError` if ``sidecar`` or ``serialization`` is not valid.
         '''
+        if serialization not in SERIALIZATION_PROFILES:
+            raise ValueError(_ERR_SERIALIZATION.format(serialization))
 
         # path to the Mercurial repository directory
         self._repo_path = repository_path
+        # whether parts of the document are loaded when first needed
+        self._lazy = lazy
+        # maximum size of the <section> elements in memory
+        self._section_budget = section_budget
+        # how files are written
+        self._serialization = serialization
 
         # file that indicates the other files in this repository
         self._all_files_path = None
-        if self._repo_path is None:
-            self._all_files = _make_empty_all_files(None)
-        else:
+        # summary of "all_files.mei" as it is on the filesystem, or None if it must be written
+        self._saved_all_files_key = None
+        if self._repo_path is not None:
             self._all_files_path = os.path.join(self._repo_path, 'all_files.mei')
-            if os.path.exists(self._all_files_path):
-                self._all_files = etree.parse(self._all_files_path)
-            else:
-                self._all_files = _make_empty_all_files(self._all_files_path)
 
-        # @xml:id to the <section> with that id
-        self._sections = _init_sections_dict(self._all_files)
+        # compact copies of the files, for faster loading
+        self._sidecar = None
+        if sidecar is not None and self._repo_path is not None:
+            self._sidecar = cache.SidecarCache(self._repo_path, sidecar)
+
         # the <score> element
         self._score = None
-        # the order of <section> elements in the <score>, indicated with @xml:id
-        self._score_order = _load_score_order(self._repo_path, self._all_files)
         # the <meiHead> element
         self._head = None
-        self._head = self.get_head()
+        # For incremental saving: the @xml:id of <section> elements whose file is up to date.
+        # Sections never loaded (value None in self._sections) are never written anyway.
+        self._clean_sections = set()
+
+        if not lazy:
+            # NB: these load from files as required, in this order
+            self._sections
+            self._score_order
+            self._head = self.get_head()
+            self._head_clean
 
     def __enter__(self):
         '''
@@ -524,6 +788,22 @@ class Document(object):
         else:
             return False
 
+    def _section_is_saved(self, xmlid):
+        '''
+        Whether the file for a ``<section>`` holds the element in memory, so the element may be
+        evicted to its file.
+        '''
+        return self._repo_path is not None and xmlid in self._clean_sections
+
+    def section_store_stats(self):
+        '''
+        Report the memory held by the ``<section>`` elements of this document.
+
+        :returns: The statistics described in :meth:`lychee.document.store.SectionStore.stats`.
+        :rtype: dict
+        '''
+        return self._sections.stats()
+
     def get_section_ids(self, all_sections=False):
         '''
         By default, return the ordered @xml:id attributes of active ``<section>`` elements in this
@@ -541,22 +821,52 @@ class Document(object):
         else:
             return self._score_order
 
-    # def load_everything(self):
-    #     '''
-    #     Load all portions of the MEI document from files. This method effectively caches the
-    #     document in memory for faster access later.
-    #
-    #     .. caution:: This method is not yet implemented.
-    #     '''
-    #     # NB: when you write this, it should just call the other methods
-    #     raise NotImplementedError()
+    def load_everything(self, threads=None):
+        '''
+        Load all portions of the MEI document from files. This method effectively caches the
+        document in memory for faster access later.
+
+        :param int threads: The number of threads that load files at once. The default is one for
+            each CPU. With ``1``, the files are loaded in this thread.
+        :raises: :exc:`lychee.exceptions.SectionNotFoundError` or
+            :exc:`~lychee.exceptions.InvalidFileError` from :meth:`get_section`, and
+            :exc:`~lychee.exceptions.HeaderNotFoundError` from :meth:`get_head`.
+
+        After "all_files.mei" is loaded, the header, the score order, and every ``<section>`` are
+        loaded in a pool of threads. (*lxml* releases the interpreter lock while it parses a file).
+        The ``<section>`` elements are kept, so later calls to :meth:`get_section` return the same
+        element, and they are not written by :meth:`save_everything` unless replaced with
+        :meth:`put_section`. Sections already given to :meth:`put_section` are not replaced.
+        '''
+        self._all_files
+
+        # NB: clean sections are not fetched, since they may have been evicted from memory
+        to_load = [xmlid for xmlid in self._sections
+                   if xmlid not in self._clean_sections and self._sections[xmlid] is None]
+        jobs = [self.get_head, lambda: self._score_order]
+        jobs.extend(functools.partial(self.get_section, xmlid) for xmlid in to_load)
+
+        if threads == 1:
+            results = [job() for job in jobs]
+        else:
+            pool = ThreadPool(threads)
+            try:
+                results = pool.map(lambda job: job(), jobs)
+            finally:
+                pool.close()
+                pool.join()
+
+        for xmlid, section in zip(to_load, results[2:]):
+            if self._sections.get(xmlid) is None:
+                self._sections[xmlid] = section
+                self._clean_sections.add(xmlid)
 
     def save_everything(self):
         '''
         Write the MEI document(s) into files.
 
         :returns: A list of the absolute pathnames that are part of this Lychee-MEI document.
-        :rtype: list of str
+        :rtype: :class:`SavedPathnames`
         :raises: :exc:`lychee.exceptions.CannotSaveError` if the document cannot be written to the
             filesystem (this happens when ``repository_path`` was not supplied on initialization).
 
@@ -564,16 +874,23 @@ class Document(object):
         documents stored in memory to be saved into files in the proper arrangement as specified
         by the order.
 
+        Only the files that changed since they were loaded or last saved are written: the sections
+        given to :meth:`put_section` (or :meth:`put_score`), the ``<meiHead>`` if given to
+        :meth:`put_head`, the ``<score>`` if its order changed, and "all_files.mei" if the set of
+        files changed. Every file is written to a temporary file, then renamed into place, unless the
+        file already holds the same bytes.
+
         Note that the return value includes any file in the document. The files may not have been
         modified, and in fact may not even have been saved at all---they are simply part of this
-        document.
+        document. The :attr:`~SavedPathnames.changed` attribute of the return value holds only the
+        pathnames of files written during this call, and :attr:`~SavedPathnames.unchanged` the rest.
         '''
 
         if self._repo_path is None:
             raise exceptions.CannotSaveError(_ERR_MISSING_REPO_PATH)
 
-        # hold the absolute paths of all modified files
-        saved_files = []
+        # hold the absolute paths of all files in the document
+        saved_files = SavedPathnames()
 
         # hold the "all_files.mei" document
         all_files = etree.Element(mei.MEI_CORPUS)
@@ -585,35 +902,50 @@ class Document(object):
         mei_head = etree.Element(mei.MEI_HEAD)
 
         # 1.) save the <meiHead> element
-        if self._head is not None:
+        if self._lazy and self._head is None and not self._head_clean:
+            # the <meiHead> was never loaded, but "head.mei" doesn't hold it yet
+            self.get_head()
+        if self._head is not None or (self._lazy and self._head_clean):
             head_path = os.path.join(self._repo_path, 'head.mei')
-            _save_out(self._head, head_path)
-            saved_files.append(head_path)
+            if not self._head_clean:
+                written = _save_out(self._head, head_path, self._serialization)
+                self._head_clean = True
+                saved_files.add(head_path, written)
+            else:
+                saved_files.add(head_path, False)
             mei_head.append(_make_ptr('head', 'head.mei'))
 
         # 2.) build the <score> element and save it
         if len(self._score_order) > 0:
-            # make the <score> proper
-            score = etree.Element(mei.SCORE)
-            for xmlid in self._score_order:
-                section_path = '{}.mei'.format(xmlid)  # path relative to "all_files.mei"
-                score.append(_make_ptr('section', section_path))
             score_path = os.path.join(self._repo_path, 'score.mei')
-            _save_out(score, score_path)
-            saved_files.append(score_path)
+            if self._score_order != self._saved_score_order:
+                # make the <score> proper
+                score = etree.Element(mei.SCORE)
+                for xmlid in self._score_order:
+                    section_path = '{}.mei'.format(xmlid)  # path relative to "all_files.mei"
+                    score.append(_make_ptr('section', section_path))
+                written = _save_out(score, score_path, self._serialization)
+                self._saved_score_order = list(self._score_order)
+                saved_files.add(score_path, written)
+            else:
+                saved_files.add(score_path, False)
             # put a <ptr> in "all_files"
             mei_elem.insert(0, _make_ptr('score', 'score.mei'))
 
         # 3.) save contained <section> elements
         section_paths = []
-        for xmlid, section in self._sections.items():
+        for xmlid in self._sections:
             section_path = '{}.mei'.format(xmlid)  # path relative to "all_files.mei"
             section_paths.append(section_path)
             abs_section_path = os.path.join(self._repo_path, section_path)  # build absolute path
-            saved_files.append(abs_section_path)
+            # a None <section> was never loaded to begin with, so its file is up to date
+            section = None if xmlid in self._clean_sections else self._sections[xmlid]
             if section is not None:
-                # assume this <section> was never loaded to begin with
-                _save_out(section, abs_section_path)
+                written = _save_out(section, abs_section_path, self._serialization)
+                self._clean_sections.add(xmlid)
+                saved_files.add(abs_section_path, written)
+            else:
+                saved_files.add(abs_section_path, False)
         section_paths = sorted(section_paths)
         for each_path in section_paths:
             mei_elem.append(_make_ptr('section', each_path))
@@ -621,9 +953,14 @@ class Document(object):
         # 5.) save "all_files.mei"
         all_files.append(mei_head)
         all_files.append(mei_elem)
-        self._all_files = all_files
-        _save_out(self._all_files, self._all_files_path)
-        saved_files.append(self._all_files_path)
+        all_files_key = _all_files_key(all_files)
+        if all_files_key != self._saved_all_files_key:
+            self._all_files = all_files
+            written = _save_out(self._all_files, self._all_files_path, self._serialization)
+            self._saved_all_files_key = all_files_key
+            saved_files.add(self._all_files_path, written)
+        else:
+            saved_files.add(self._all_files_path, False)
 
         return saved_files
 
@@ -653,7 +990,8 @@ class Document(object):
             else:
                 # otherwise we can load the file specified in the <ptr>
                 try:
-                    self._head = _load_in(os.path.join(self._repo_path, ptr.get('target'))).getroot()
+                    self._head = _load_in(os.path.join(self._repo_path, ptr.get('target')),
+                                          sidecar=self._sidecar).getroot()
                 except exceptions.FileNotFoundError:
                     raise exceptions.HeaderNotFoundError(_ERR_MISSING_MEIHEAD)
                 except exceptions.InvalidFileError:
@@ -681,6 +1019,7 @@ class Document(object):
                                                   xlink.ACTUATE: 'onRequest',
                                                   xlink.SHOW: 'embed'}))
         self._head = new_head
+        self._head_clean = False
 
     def get_from_head(self, what):
         '''
@@ -813,7 +1152,9 @@ class Document(object):
         **Side Effects**
 
         If the section is not already loaded, :meth:`get_section` will try to fetch it from the
-        filesystem, if a repository is configured.
+        filesystem, if a repository is configured. Sections fetched from the filesystem go through
+        the process-wide :const:`~lychee.document.cache.SECTION_CACHE`, so an unchanged file is only
+        parsed once; every call returns a new copy of the element.
         '''
 
         if section_id.startswith('#'):
@@ -824,8 +1165,18 @@ class Document(object):
         elif self._repo_path is None:
             raise exceptions.SectionNotFoundError(_SECTION_NOT_FOUND.format(xmlid=section_id))
         else:
+            # the sidecar cache's elements have no whitespace between them
+            if self._sidecar is None:
+                load = _load_in
+                mode = 'plain'
+            else:
+                load = functools.partial(_load_in, sidecar=self._sidecar)
+                mode = 'compact'
             try:
-                return _load_in(os.path.join(self._repo_path, section_id + '.mei')).getroot()
+                return cache.SECTION_CACHE.get(
+                    os.path.join(self._repo_path, section_id + '.mei'),
+                    load,
+                    mode)
             except exceptions.FileNotFoundError:
                 raise exceptions.SectionNotFoundError(_SECTION_NOT_FOUND.format(xmlid=section_id))
             except exceptions.InvalidFileError:
@@ -852,6 +1203,7 @@ class Document(object):
             new_section.set(xml.ID, xmlid)
 
         self._sections[xmlid] = new_section
+        self._clean_sections.discard(xmlid)
         return xmlid
 
     def move_section_to(self, xmlid, position):
@@ -889,3 +1241,82 @@ class Document(object):
         score_order.insert(position, xmlid)
 
         self._score_order = score_order
+
+
+class DocumentSnapshot(Document):
+    '''
+    A read-only :class:`Document` shared by the outbound steps of a single action.
+
+    Every ``<section>`` is parsed only once: the first time it's requested with :meth:`get_section`,
+    the element is kept for later calls. This lets all the outbound formats in an action use the
+    same in-memory document instead of re-parsing the repository for each format.
+
+    The ``put_`` methods, :meth:`move_section_to`, and :meth:`save_everything` raise
+    :exc:`~lychee.exceptions.CannotSaveError`. Note that the elements returned by the ``get_``
+    methods are shared between all users of the snapshot, so they must not be modified.
+    '''
+
+    def __init__(self, repository_path=None, key=None, lazy=False, section_budget=None,
+                 sidecar=None, serialization='pretty'):
+        '''
+        :param str repository_path: As for :class:`Document`.
+        :param key: An arbitrary, comparable value that identifies the state of the repository when
+            this snapshot was made. The session uses it to decide when the snapshot is out of date.
+        :param bool lazy: As for :class:`Document`.
+        :param int section_budget: As for :class:`Document`.
+        :param str sidecar: As for :class:`Document`.
+        :param str serialization: As for :class:`Document`. This only affects "all_files.mei" if
+            the repository doesn't have one yet.
+        '''
+        super(DocumentSnapshot, self).__init__(repository_path, lazy=lazy,
+                                               section_budget=section_budget, sidecar=sidecar,
+                                               serialization=serialization)
+        self.key = key
+
+    def _section_is_saved(self, xmlid):
+        '''
+        Every ``<section>`` in a snapshot was loaded from its file.
+        '''
+        return self._repo_path is not None
+
+    def get_section(self, section_id):
+        '''
+        As :meth:`Document.get_section`, but the loaded ``<section>`` is kept for later calls.
+        '''
+        if section_id.startswith('#'):
+            section_id = section_id[1:]
+
+        section = super(DocumentSnapshot, self).get_section(section_id)
+        if section_id in self._sections:
+            self._sections[section_id] = section
+        return section
+
+    def save_everything(self):
+        '''
+        :raises: :exc:`lychee.exceptions.CannotSaveError` always.
+        '''
+        raise exceptions.CannotSaveError(_ERR_READ_ONLY)
+
+    def put_head(self, new_head):
+        '''
+        :raises: :exc:`lychee.exceptions.CannotSaveError` always.
+        '''
+        raise exceptions.CannotSaveError(_ERR_READ_ONLY)
+
+    def put_score(self, new_music):
+        '''
+        :raises: :exc:`lychee.exceptions.CannotSaveError` always.
+        '''
+        raise exceptions.CannotSaveError(_ERR_READ_ONLY)
+
+    def put_section(self, new_section):
+        '''
+        :raises: :exc:`lychee.exceptions.CannotSaveError` always.
+        '''
+        raise exceptions.CannotSaveError(_ERR_READ_ONLY)
+
+    def move_section_to(self, xmlid, position):
+        '''
+        :raises: :exc:`lychee.exceptions.CannotSaveError` always.
+        '''
+        raise exceptions.CannotSaveError(_ERR_READ_ONLY)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               lychee/document/store.py
+# Purpose:                Hold the <section> elements of a Document within a memory budget.
+#
+# Copyright (C) 2017 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Hold the ``<section>`` elements of a :class:`~lychee.document.Document` within a memory budget.
+
+A :class:`SectionStore` is a mapping from the @xml:id of a ``<section>`` to the element, or to
+``None`` if the element is not in memory. Without a budget it behaves like a :obj:`dict`. With a
+budget, when the total size of the elements in memory is greater than :attr:`SectionStore.max_bytes`,
+the least-recently used elements are evicted:
+
+- An element that is already saved in its file is discarded, and the store holds ``None`` for it,
+  so that :meth:`~lychee.document.Document.get_section` loads it from the file again.
+- Any other element (one given to :meth:`~lychee.document.Document.put_section` but not yet saved)
+  is serialized and compressed, and parsed again the next time it's requested.
+
+The size of an element is the length of its serialized form. This is proportional to (but smaller
+than) the memory used by the element, like the file sizes used by
+:class:`~lychee.document.cache.SectionCache`. Use :meth:`SectionStore.stats` to see how much is held.
+
+.. note:: An element that was modified in place, without being given to
+    :meth:`~lychee.document.Document.put_section`, loses its changes when it is evicted to its file.
+'''
+
+import collections
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+import zlib
+
+from lxml import etree
+
+
+# zlib compression level for evicted elements that aren't saved: fast, since they're usually
+# parsed again soon
+_COMPRESS_LEVEL = 1
+
+
+class _Compressed(bytes):
+    '''
+    An element that was evicted to compressed bytes.
+    '''
+
+
+class SectionStore(MutableMapping):
+    '''
+    A mapping of @xml:id to ``<section>`` elements, within a memory budget.
+
+    Getting a ``<section>`` makes it the most-recently used. Iterating the store does not, so the
+    @xml:id of evicted elements may be listed without loading them.
+
+    The :attr:`evictions` attribute counts the elements evicted, and :attr:`reloads` counts the
+    compressed elements parsed again.
+    '''
+
+    def __init__(self, sections=None, max_bytes=None, is_saved=None):
+        '''
+        :param dict sections: The initial mapping of @xml:id to element or ``None``.
+        :param int max_bytes: The maximum total size of elements in memory, or ``None`` for no limit.
+        :param is_saved: A function that takes an @xml:id and returns whether that element's file
+            holds the same ``<section>`` as the element in memory. The default says no element is
+            saved, so every evicted element is compressed.
+        '''
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self.reloads = 0
+        self._is_saved = is_saved if is_saved is not None else lambda xmlid: False
+        # @xml:id -> element, _Compressed, or None; least-recently used first
+        self._entries = collections.OrderedDict()
+        # @xml:id -> size of a resident element, computed once for each element, and their total
+        self._sizes = {}
+        self._resident_bytes = 0
+        if sections:
+            for xmlid, section in sections.items():
+                self._entries[xmlid] = section
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(list(self._entries))
+
+    def __contains__(self, xmlid):
+        return xmlid in self._entries
+
+    def __getitem__(self, xmlid):
+        value = self._entries[xmlid]
+        if value is None:
+            return None
+
+        if isinstance(value, _Compressed):
+            serialized = zlib.decompress(value)
+            value = etree.fromstring(serialized)
+            self.reloads += 1
+            self._put(xmlid, value, len(serialized))
+        else:
+            # only the order changes, so the total size is the same and nothing is evicted
+            del self._entries[xmlid]
+            self._entries[xmlid] = value
+        return value
+
+    def __setitem__(self, xmlid, section):
+        self._put(xmlid, section)
+
+    def __delitem__(self, xmlid):
+        del self._entries[xmlid]
+        self._resident_bytes -= self._sizes.pop(xmlid, 0)
+
+    def is_resident(self, xmlid):
+        '''
+        Whether the element for an @xml:id is in memory as an element, and not compressed or
+        discarded.
+        '''
+        value = self._entries.get(xmlid)
+        return value is not None and not isinstance(value, _Compressed)
+
+    def _put(self, xmlid, section, size=None):
+        '''
+        Hold "section" as the most-recently used element, then evict elements over the budget. The
+        "size" of the element is given when it's already known.
+        '''
+        self._entries.pop(xmlid, None)
+        self._resident_bytes -= self._sizes.pop(xmlid, 0)
+        self._entries[xmlid] = section
+        if size is not None:
+            self._sizes[xmlid] = size
+            self._resident_bytes += size
+        if section is not None and self.max_bytes is not None:
+            self._size(xmlid)
+            self._evict(keep=xmlid)
+
+    def _size(self, xmlid):
+        '''
+        Return the size of the resident element for "xmlid," and add it to the total the first time.
+        '''
+        if xmlid not in self._sizes:
+            size = len(etree.tostring(self._entries[xmlid]))
+            self._sizes[xmlid] = size
+            self._resident_bytes += size
+        return self._sizes[xmlid]
+
+    def _evict(self, keep):
+        '''
+        Evict the least-recently used elements, except "keep," until the budget is met.
+        '''
+        if self._resident_bytes <= self.max_bytes:
+            return
+
+        for xmlid in list(self._entries):
+            if self._resident_bytes <= self.max_bytes:
+                break
+            if xmlid == keep or not self.is_resident(xmlid):
+                continue
+
+            self._size(xmlid)
+            self._resident_bytes -= self._sizes.pop(xmlid)
+            if self._is_saved(xmlid):
+                self._entries[xmlid] = None
+            else:
+                self._entries[xmlid] = _Compressed(
+                    zlib.compress(etree.tostring(self._entries[xmlid]), _COMPRESS_LEVEL))
+            self.evictions += 1
+
+    def stats(self):
+        '''
+        Return the sizes of the elements held.
+
+        :returns: A dictionary with the number of ``'sections'``; the number of ``'resident'``
+            elements and their ``'resident_bytes'``; the number of ``'compressed'`` elements and
+            their ``'compressed_bytes'``; the number of elements ``'on_disk'`` only (including those
+            never loaded); the ``'max_bytes'``; and the counts of ``'evictions'`` and ``'reloads'``.
+        :rtype: dict
+        '''
+        post = {
+            'sections': len(self._entries),
+            'resident': 0,
+            'resident_bytes': 0,
+            'compressed': 0,
+            'compressed_bytes': 0,
+            'on_disk': 0,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+            'reloads': self.reloads,
+        }
+        for xmlid, value in self._entries.items():
+            if value is None:
+                post['on_disk'] += 1
+            elif isinstance(value, _Compressed):
+                post['compressed'] += 1
+                post['compressed_bytes'] += len(value)
+            else:
+                post['resident'] += 1
+                post['resident_bytes'] += self._size(xmlid)
+        return post
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               document/test/test_cache.py
+# Purpose:                Tests for the "lychee.document.cache" module.
+#
+# Copyright (C) 2016 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Tests for the :mod:`lychee.document.cache` module.
+'''
+
+# pylint: disable=protected-access
+
+import os
+import os.path
+import shutil
+import tempfile
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from lxml import etree
+
+from lychee.document import cache
+
+
+class TestSectionCache(unittest.TestCase):
+    '''
+    Tests for SectionCache.
+    '''
+
+    def setUp(self):
+        '''
+        Make a temporary directory with a file, and a cache with a mock loading function.
+        '''
+        self.repo_dir = tempfile.mkdtemp()
+        self.pathname = os.path.join(self.repo_dir, 'section.mei')
+        self.write_file(self.pathname, 'a')
+        self.cache = cache.SectionCache()
+        self.load = mock.MagicMock(side_effect=etree.parse)
+
+    def tearDown(self):
+        '''
+        Remove the temporary directory.
+        '''
+        shutil.rmtree(self.repo_dir)
+
+    def write_file(self, pathname, label):
+        '''
+        Write a <section> with @label to a file.
+        '''
+        with open(pathname, 'w') as the_file:
+            the_file.write('<section label="{0}"/>'.format(label))
+
+    def test_get_1(self):
+        '''
+        The file is loaded once; later calls return a copy from the cache.
+        '''
+        first = self.cache.get(self.pathname, self.load)
+        second = self.cache.get(self.pathname, self.load)
+        assert 1 == self.load.call_count
+        assert 'a' == first.get('label') == second.get('label')
+        assert first is not second
+        assert 1 == self.cache.hits
+        assert 1 == self.cache.misses
+
+    def test_get_2(self):
+        '''
+        Modifying a returned element does not modify the cached element.
+        '''
+        self.cache.get(self.pathname, self.load).set('label', 'z')
+        assert 'a' == self.cache.get(self.pathname, self.load).get('label')
+
+    def test_get_3(self):
+        '''
+        When the file is replaced, it's loaded again.
+        '''
+        self.cache.get(self.pathname, self.load)
+        temp_path = self.pathname + '.tmp'
+        self.write_file(temp_path, 'b')
+        os.rename(temp_path, self.pathname)
+        assert 'b' == self.cache.get(self.pathname, self.load).get('label')
+        assert 2 == self.load.call_count
+        assert 1 == len(self.cache)
+
+    def test_get_4(self):
+        '''
+        When the file doesn't exist, the loading function's exception propagates and nothing is
+        cached.
+        '''
+        missing = os.path.join(self.repo_dir, 'missing.mei')
+        self.load.side_effect = IOError
+        self.assertRaises(IOError, self.cache.get, missing, self.load)
+        assert 0 == len(self.cache)
+
+    def test_get_5(self):
+        '''
+        Elements loaded in a different "mode" are cached separately.
+        '''
+        self.cache.get(self.pathname, self.load, 'plain')
+        self.cache.get(self.pathname, self.load, 'compact')
+        self.cache.get(self.pathname, self.load, 'plain')
+        assert 2 == self.load.call_count
+        assert 2 == len(self.cache)
+        assert 1 == self.cache.hits
+
+    def test_eviction(self):
+        '''
+        The least-recently used entry is evicted when the cache is bigger than "max_bytes".
+        '''
+        other = os.path.join(self.repo_dir, 'other.mei')
+        self.write_file(other, 'b')
+        third = os.path.join(self.repo_dir, 'third.mei')
+        self.write_file(third, 'c')
+        self.cache.max_bytes = 2 * os.stat(self.pathname).st_size
+
+        self.cache.get(self.pathname, self.load)
+        self.cache.get(other, self.load)
+        self.cache.get(self.pathname, self.load)  # now "other" is least-recently used
+        self.cache.get(third, self.load)
+
+        assert 1 == self.cache.evictions
+        assert 2 == len(self.cache)
+        assert self.cache.size <= self.cache.max_bytes
+        self.cache.get(self.pathname, self.load)
+        assert 2 == self.cache.hits
+
+    def test_disabled(self):
+        '''
+        With "max_bytes" of 0, nothing is cached.
+        '''
+        self.cache.max_bytes = 0
+        self.cache.get(self.pathname, self.load)
+        self.cache.get(self.pathname, self.load)
+        assert 2 == self.load.call_count
+        assert 0 == len(self.cache)
+
+    def test_clear_and_stats(self):
+        '''
+        clear() removes entries and resets the counters that stats() reports.
+        '''
+        self.cache.get(self.pathname, self.load)
+        stats = self.cache.stats()
+        assert 1 == stats['misses']
+        assert 1 == stats['entries']
+        assert os.stat(self.pathname).st_size == stats['bytes']
+
+        self.cache.clear()
+        assert {'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0, 'bytes': 0,
+                'max_bytes': cache.DEFAULT_MAX_BYTES} == self.cache.stats()
+
+
+class TestSidecarCache(unittest.TestCase):
+    '''
+    Tests for SidecarCache.
+    '''
+
+    def setUp(self):
+        '''
+        Make a temporary directory with a file, and a mock parsing function.
+        '''
+        self.repo_dir = tempfile.mkdtemp()
+        self.pathname = os.path.join(self.repo_dir, 'section.mei')
+        self.write_file(self.pathname, 'a')
+        self.parse = mock.MagicMock(
+            side_effect=lambda path: etree.parse(path, etree.XMLParser(remove_blank_text=True)))
+
+    def tearDown(self):
+        '''
+        Remove the temporary directory.
+        '''
+        shutil.rmtree(self.repo_dir)
+
+    def write_file(self, pathname, label):
+        '''
+        Write a pretty-printed <section> with @label to a file.
+        '''
+        with open(pathname, 'w') as the_file:
+            the_file.write('<section label="{0}">\n  <measure/>\n</section>\n'.format(label))
+
+    def test_load_1(self):
+        '''
+        The file is parsed once, then loaded from the compact sidecar file.
+        '''
+        sidecar = cache.SidecarCache(self.repo_dir)
+        sidecar.load(self.pathname, self.parse)
+        assert os.path.exists(os.path.join(self.repo_dir, cache.SIDECAR_DIR, 'section.mei.xml'))
+
+        actual = cache.SidecarCache(self.repo_dir).load(self.pathname, self.parse)
+        assert 1 == self.parse.call_count
+        assert b'<section label="a"><measure/></section>' == etree.tostring(actual)
+
+    def test_load_2(self):
+        '''
+        When the file is replaced, the sidecar file is out of date and the file is parsed again.
+        '''
+        for validate in ('mtime', 'hash'):
+            sidecar = cache.SidecarCache(self.repo_dir, validate)
+            self.write_file(self.pathname, 'a')
+            sidecar.load(self.pathname, self.parse)
+            temp_path = self.pathname + '.tmp'
+            self.write_file(temp_path, 'b')
+            os.rename(temp_path, self.pathname)
+            assert 'b' == sidecar.load(self.pathname, self.parse).getroot().get('label')
+            assert (0, 2) == (sidecar.hits, sidecar.misses)
+
+    def test_load_3(self):
+        '''
+        With "hash" validation, a file with the same content but a new mtime uses the sidecar file.
+        '''
+        sidecar = cache.SidecarCache(self.repo_dir, 'hash')
+        sidecar.load(self.pathname, self.parse)
+        stat = os.stat(self.pathname)
+        os.utime(self.pathname, (stat.st_atime, stat.st_mtime + 10))
+        sidecar.load(self.pathname, self.parse)
+        assert 1 == self.parse.call_count
+        assert 1 == sidecar.hits
+
+    def test_load_4(self):
+        '''
+        A corrupt sidecar file is ignored and replaced.
+        '''
+        sidecar = cache.SidecarCache(self.repo_dir)
+        sidecar.load(self.pathname, self.parse)
+        sidecar_path = os.path.join(self.repo_dir, cache.SIDECAR_DIR, 'section.mei.xml')
+        with open(sidecar_path, 'rb') as sidecar_file:
+            header = sidecar_file.readline()
+        with open(sidecar_path, 'wb') as sidecar_file:
+            sidecar_file.write(header + b'<section')
+
+        assert 'a' == sidecar.load(self.pathname, self.parse).getroot().get('label')
+        assert 'a' == sidecar.load(self.pathname, self.parse).getroot().get('label')
+        assert 2 == self.parse.call_count
+
+    def test_load_5(self):
+        '''
+        When the file doesn't exist, the parsing function's exception propagates.
+        '''
+        missing = os.path.join(self.repo_dir, 'missing.mei')
+        sidecar = cache.SidecarCache(self.repo_dir)
+        self.assertRaises(IOError, sidecar.load, missing, self.parse)
+
+    def test_validate(self):
+        '''
+        An invalid "validate" argument raises ValueError.
+        '''
+        self.assertRaises(ValueError, cache.SidecarCache, self.repo_dir, 'size')
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               lychee/document/test/test_diff.py
+# Purpose:                Tests for the "diff" module.
+#
+# Copyright (C) 2017 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Tests for the "diff" module.
+'''
+
+from lxml import etree
+
+from lychee.document import diff
+from lychee.namespaces import xml
+
+
+def make(text):
+    '''
+    Parse XML with "xml:id" attributes, which are written as "id" to keep the tests short.
+    '''
+    elem = etree.fromstring(text)
+    for each in elem.iter():
+        if 'id' in each.attrib:
+            each.set(xml.ID, each.attrib.pop('id'))
+    return elem
+
+
+def strip(elem):
+    '''
+    Serialize an element without @xml:id attributes or blank text, to compare the content of two
+    elements.
+    '''
+    elem = etree.fromstring(etree.tostring(elem), etree.XMLParser(remove_blank_text=True))
+    for each in elem.iter():
+        each.attrib.pop(xml.ID, None)
+    return etree.tostring(elem)
+
+
+class TestStructuralHash(object):
+    '''
+    Tests for structural_hash().
+    '''
+
+    def test_ignores_ids_and_indentation(self):
+        '''
+        Elements that differ only in @xml:id and blank text have the same hash.
+        '''
+        one = make('<a id="a1"><b n="1" id="b1"/></a>')
+        two = make('<a>\n    <b n="1"/>\n</a>')
+        assert diff.structural_hash(one) == diff.structural_hash(two)
+
+    def test_different(self):
+        '''
+        Elements with different attributes, text, or children have different hashes.
+        '''
+        elems = [make(x) for x in ('<a><b n="1"/></a>', '<a><b n="2"/></a>', '<a><c n="1"/></a>',
+                                   '<a>x<b n="1"/></a>', '<a n="1"><b n="1"/></a>')]
+        assert len(elems) == len(set(diff.structural_hash(x) for x in elems))
+
+
+class TestDiff(object):
+    '''
+    Tests for diff() and patch().
+    '''
+
+    OLD = '''<section id="s">
+        <staff n="1" id="st1"><layer n="1" id="l1">
+            <note pname="c" id="n1"/><note pname="d" id="n2"/><note pname="e" id="n3"/>
+        </layer></staff>
+        <staff n="2" id="st2"><layer n="1" id="l2"><note pname="g" id="n4"/></layer></staff>
+    </section>'''
+
+    def check(self, new_text):
+        '''
+        Merge "new_text" into OLD, check the result has the same content, and return the result
+        and the edit script.
+        '''
+        old = make(self.OLD)
+        new = make(new_text)
+        edits = diff.merge(old, new)
+        assert strip(new) == strip(old)
+        return old, edits
+
+    def test_no_change(self):
+        '''
+        The same content, without @xml:id attributes, needs no edits.
+        '''
+        old, edits = self.check('''<section><staff n="1"><layer n="1">
+            <note pname="c"/><note pname="d"/><note pname="e"/></layer></staff>
+            <staff n="2"><layer n="1"><note pname="g"/></layer></staff></section>''')
+        assert [] == edits
+
+    def test_attrib(self):
+        '''
+        A changed note is one attribute edit, and every element keeps its @xml:id.
+        '''
+        old, edits = self.check('''<section><staff n="1"><layer n="1">
+            <note pname="c"/><note pname="f"/><note pname="e"/></layer></staff>
+            <staff n="2"><layer n="1"><note pname="g"/></layer></staff></section>''')
+        assert [diff.ATTRIB] == [x.kind for x in edits]
+        assert 'n2' == edits[0].element.get(xml.ID)
+        ids = [x.get(xml.ID) for x in old.iter()]
+        assert ['s', 'st1', 'l1', 'n1', 'n2', 'n3', 'st2', 'l2', 'n4'] == ids
+
+    def test_insert_delete(self):
+        '''
+        Notes added and removed are inserted and deleted; the others keep their @xml:id.
+        '''
+        old, edits = self.check('''<section><staff n="1"><layer n="1">
+            <note pname="c"/><note pname="e"/><rest/></layer></staff>
+            <staff n="2"><layer n="1"><note pname="g"/></layer></staff></section>''')
+        assert [diff.DELETE, diff.INSERT] == [x.kind for x in edits]
+        assert 'n2' == edits[0].element.get(xml.ID)
+        layer = old.find('.//layer')
+        assert ['n1', 'n3', None] == [x.get(xml.ID) for x in layer]
+
+    def test_move(self):
+        '''
+        Swapped staves are one move, and keep their @xml:id and content.
+        '''
+        old, edits = self.check('''<section>
+            <staff n="2"><layer n="1"><note pname="g"/></layer></staff>
+            <staff n="1"><layer n="1"><note pname="c"/><note pname="d"/><note pname="e"/></layer>
+            </staff></section>''')
+        assert [diff.MOVE] == [x.kind for x in edits]
+        assert ['st2', 'st1'] == [x.get(xml.ID) for x in old]
+
+    def test_repeated(self):
+        '''
+        Equal children around a change are aligned in order, so nothing moves.
+        '''
+        old = make('<layer>' + ''.join('<note pname="c" id="n{}"/>'.format(i) for i in range(5)) +
+                   '</layer>')
+        new = make('<layer><note pname="c"/><note pname="c"/><rest/><note pname="c"/>'
+                   '<note pname="c"/></layer>')
+        edits = diff.merge(old, new)
+        assert [diff.DELETE, diff.INSERT] == [x.kind for x in edits]
+        assert ['n0', 'n1', None, 'n3', 'n4'] == [x.get(xml.ID) for x in old]
+
+    def test_identity_by_n(self):
+        '''
+        A changed staff is aligned by its @n, so it keeps its @xml:id.
+        '''
+        old, edits = self.check('''<section><staff n="1"><layer n="1"><note pname="a"/></layer>
+            </staff><staff n="2"><layer n="1"><note pname="g"/></layer></staff></section>''')
+        assert ['st1', 'st2'] == [x.get(xml.ID) for x in old]
+        assert 'l1' == old[0][0].get(xml.ID)
+
+    def test_by_id(self):
+        '''
+        Elements are aligned by @xml:id first, even when another element has the same content.
+        '''
+        old, edits = self.check('''<section id="s"><staff n="1" id="st1"><layer n="1" id="l1">
+            <note pname="d" id="n1"/><note pname="c"/><note pname="e" id="n3"/></layer>
+            </staff><staff n="2" id="st2"><layer n="1" id="l2"><note pname="g" id="n4"/></layer>
+            </staff></section>''')
+        assert ['n1', 'n2', 'n3'] == [x.get(xml.ID) for x in old.find('.//layer')]
+        assert [diff.ATTRIB, diff.ATTRIB] == [x.kind for x in edits]
+
+    def test_unknown_ids(self):
+        '''
+        An @xml:id that isn't in the old element is ignored for alignment, and the old element
+        keeps its own, like when the inbound views step gives a converted section new ones.
+        '''
+        old, edits = self.check('''<section id="x1"><staff n="1" id="x2"><layer n="1" id="x3">
+            <note pname="c" id="x4"/><note pname="f" id="x5"/><note pname="e" id="x6"/></layer>
+            </staff><staff n="2" id="x7"><layer n="1" id="x8"><note pname="g" id="x9"/></layer>
+            </staff></section>''')
+        assert [diff.ATTRIB] == [x.kind for x in edits]
+        ids = [x.get(xml.ID) for x in old.iter()]
+        assert ['s', 'st1', 'l1', 'n1', 'n2', 'n3', 'st2', 'l2', 'n4'] == ids
+
+    def test_new_not_modified(self):
+        '''
+        patch() inserts copies of the new elements.
+        '''
+        old = make(self.OLD)
+        new = make('<section><staff n="3"/></section>')
+        before = etree.tostring(new)
+        diff.merge(old, new)
+        assert before == etree.tostring(new)
+        assert new[0] is not old[0]
+
+    def test_references(self):
+        '''
+        References to aligned elements are changed to their old @xml:id, and inserted elements are
+        renamed for their aligned ancestors.
+        '''
+        def section(sect, staff, layer, notes, extra=''):
+            ids = ['S{0}-s{1}-m-l{2}-e{3}'.format(sect, staff, layer, x) for x in notes]
+            plist = ' '.join('#' + x for x in ids[:3])
+            return make('''<section id="Sme-s-m-l-e{0}"><staff n="1" id="S{0}-sme-m-l-e{1}">
+                <layer n="1" id="S{0}-s{1}-m-lme-e{2}">
+                <note pname="c" dur="8" id="{3}"/><note pname="d" dur="8" id="{4}"/>
+                <note pname="e" dur="8" id="{5}"/>{6}
+                <tupletSpan num="3" numbase="2" plist="{7}" startid="#{3}" endid="#{5}"/>
+                </layer></staff></section>'''.format(sect, staff, layer, ids[0], ids[1], ids[2],
+                                                     extra, plist))
+
+        old = section('1111111', '2222222', '3333333', ['4444441', '4444442', '4444443'])
+        expected = etree.tostring(old)
+        same = section('9999991', '9999992', '9999993', ['8888881', '8888882', '8888883'])
+        assert [] == diff.merge(old, same)
+        assert expected == etree.tostring(old)
+
+        new = section('9999991', '9999992', '9999993', ['8888881', '8888882', '8888883'],
+                      '<note pname="f" dur="4" id="S9999991-s9999992-m-l9999993-e8888884"/>')
+        edits = diff.merge(old, new)
+        assert [diff.INSERT] == [x.kind for x in edits]
+        layer = old.find('.//layer')
+        notes = [x.get(xml.ID) for x in layer.iter('note')]
+        assert 'S1111111-s2222222-m-l3333333-e8888884' == notes[3]
+        span = layer.find('tupletSpan')
+        assert ' '.join('#' + x for x in notes[:3]) == span.get('plist')
+        assert ('#' + notes[0], '#' + notes[2]) == (span.get('startid'), span.get('endid'))
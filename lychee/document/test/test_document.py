@@ -28,6 +28,7 @@ Tests for the :mod:`lychee.document.document` module.
 
 # pylint: disable=protected-access
 
+import copy
 import inspect
 import os
 import os.path
@@ -443,6 +444,50 @@ class TestSaveAndLoad(DocumentTestCase):
             document._save_out(tree, to_here)
         assert document._SAVE_OUT_ERROR == err.value[0]
 
+    def test__save_out_4(self):
+        '''
+        When the write fails, an existing file is left as it was, and the temporary file is removed.
+        '''
+        to_here = os.path.join(self.repo_dir, 'something.mei')
+        with open(to_here, 'w') as the_file:
+            the_file.write('original')
+
+        def failing_write(output, **kwargs):
+            output.write(b'partial')
+            raise IOError('lol')
+        tree = mock.MagicMock(spec_set=etree._ElementTree)
+        tree.write.side_effect = failing_write
+
+        with pytest.raises(exceptions.CannotSaveError):
+            document._save_out(tree, to_here)
+        with open(to_here, 'r') as the_file:
+            assert 'original' == the_file.read()
+        assert ['something.mei'] == os.listdir(self.repo_dir)
+
+    def test__save_out_5(self):
+        '''
+        Each serialization profile writes the same document differently, and a file that already
+        holds the same bytes isn't written again.
+        '''
+        elem = etree.Element(mei.SECTION)
+        etree.SubElement(elem, mei.MEASURE)
+        saved = {}
+        for profile in ('pretty', 'compact', 'c14n'):
+            to_here = os.path.join(self.repo_dir, '{0}.mei'.format(profile))
+            assert document._save_out(elem, to_here, profile) is True
+            with mock.patch('lychee.document.document._replace_file') as mock_replace:
+                assert document._save_out(elem, to_here, profile) is False
+            assert 0 == mock_replace.call_count
+            with open(to_here, 'rb') as the_file:
+                saved[profile] = the_file.read()
+
+        assert b'\n  <mei:measure/>' in saved['pretty']
+        assert saved['compact'].startswith(b'<?xml')
+        assert b'<mei:measure/>' in saved['compact']
+        assert b'<mei:measure></mei:measure>' in saved['c14n']
+        assert not saved['c14n'].startswith(b'<?xml')
+
+
     @mock.patch('lychee.document.document._check_version_attr')
     @mock.patch('lxml.etree.XMLParser')
     @mock.patch('lxml.etree.parse')
@@ -667,7 +712,7 @@ class TestDocumentInit(unittest.TestCase):
 
         doc = document.Document(self.repo_dir)
 
-        mock_meaf.assert_called_once_with(all_files_path)
+        mock_meaf.assert_called_once_with(all_files_path, 'pretty')
         self.assertEqual(mock_meaf.return_value, doc._all_files)
         self.assertEqual({}, doc._sections)
         self.assertIsNone(doc._score)
@@ -1059,6 +1104,32 @@ class TestGetPutSection(DocumentTestCase):
         assert document._check_valid_section_id(actual)
 
 
+class TestSectionCache(DocumentTestCase):
+    '''
+    Tests for how Document.get_section() uses the process-wide section cache.
+    '''
+
+    def test_parsed_once(self):
+        '''
+        Two Documents for the same repository parse an unchanged section file only once.
+        '''
+        section = etree.Element(mei.SECTION, attrib={xml.ID: 'Sme-s-m-l-e1234567'})
+        self.doc.put_section(section)
+        self.doc.save_everything()
+
+        doc_1 = document.Document(self.repo_dir)
+        doc_2 = document.Document(self.repo_dir)
+
+        with mock.patch('lychee.document.document._load_in') as mock_load_in:
+            mock_load_in.side_effect = etree.parse
+            first = doc_1.get_section('Sme-s-m-l-e1234567')
+            second = doc_2.get_section('Sme-s-m-l-e1234567')
+
+        assert 1 == mock_load_in.call_count
+        assert first is not second
+        assert 'Sme-s-m-l-e1234567' == second.get(xml.ID)
+
+
 class TestGetPutScore(DocumentTestCase):
     '''
     Tests for Document.get_score() and Document.put_score().
@@ -1273,7 +1344,7 @@ class TestSaveLoadEverything(DocumentTestCase):
 
         self.assertEqual(len(save_out_calls), mock_save_out.call_count)
         for each_call in save_out_calls:
-            mock_save_out.assert_any_call(each_call[0], each_call[1])
+            mock_save_out.assert_any_call(each_call[0], each_call[1], 'pretty')
 
         return actual
 
@@ -1483,6 +1554,381 @@ class TestSaveLoadEverything(DocumentTestCase):
                                 save_out_calls=[])
 
 
+class TestIncrementalSave(DocumentTestCase):
+    '''
+    Tests for the "dirty tracking" in Document.save_everything().
+    '''
+
+    def setUp(self):
+        '''
+        Save a document with two sections in the score.
+        '''
+        DocumentTestCase.setUp(self)
+        score = etree.Element(mei.SCORE)
+        etree.SubElement(score, mei.SECTION, attrib={xml.ID: 'Sme-s-m-l-e1111111'})
+        etree.SubElement(score, mei.SECTION, attrib={xml.ID: 'Sme-s-m-l-e2222222'})
+        self.doc.put_score(score)
+        self.first = self.doc.save_everything()
+        self.section_1 = os.path.join(self.repo_dir, 'Sme-s-m-l-e1111111.mei')
+        self.section_2 = os.path.join(self.repo_dir, 'Sme-s-m-l-e2222222.mei')
+
+    def test_first_save(self):
+        '''
+        All files are written by the first save.
+        '''
+        assert isinstance(self.first, document.SavedPathnames)
+        six.assertCountEqual(self, self.first, self.first.changed)
+        assert [] == self.first.unchanged
+        assert 5 == len(self.first)
+
+    @mock.patch('lychee.document.document._save_out')
+    def test_nothing_changed(self, mock_save_out):
+        '''
+        A second save writes nothing, but returns the same pathnames.
+        '''
+        actual = self.doc.save_everything()
+        assert 0 == mock_save_out.call_count
+        six.assertCountEqual(self, self.first, actual)
+        assert [] == actual.changed
+        six.assertCountEqual(self, self.first, actual.unchanged)
+
+    @mock.patch('lychee.document.document._save_out')
+    def test_put_section(self, mock_save_out):
+        '''
+        Only the replaced section is written.
+        '''
+        self.doc.put_section(etree.Element(mei.SECTION, attrib={xml.ID: 'Sme-s-m-l-e2222222'}))
+        actual = self.doc.save_everything()
+        mock_save_out.assert_called_once_with(mock.ANY, self.section_2, 'pretty')
+        assert [self.section_2] == actual.changed
+        assert 5 == len(actual)
+
+    @mock.patch('lychee.document.document._save_out')
+    def test_put_new_section(self, mock_save_out):
+        '''
+        A section that wasn't in the document is written, along with "all_files.mei".
+        '''
+        self.doc.put_section(etree.Element(mei.SECTION, attrib={xml.ID: 'Sme-s-m-l-e3333333'}))
+        actual = self.doc.save_everything()
+        exp = [os.path.join(self.repo_dir, 'Sme-s-m-l-e3333333.mei'),
+               os.path.join(self.repo_dir, 'all_files.mei')]
+        six.assertCountEqual(self, exp, actual.changed)
+        assert 2 == mock_save_out.call_count
+
+    @mock.patch('lychee.document.document._save_out')
+    def test_move_section_to(self, mock_save_out):
+        '''
+        Changing the score order writes only "score.mei".
+        '''
+        self.doc.move_section_to('Sme-s-m-l-e2222222', 0)
+        actual = self.doc.save_everything()
+        score_path = os.path.join(self.repo_dir, 'score.mei')
+        mock_save_out.assert_called_once_with(mock.ANY, score_path, 'pretty')
+        assert [score_path] == actual.changed
+
+    @mock.patch('lychee.document.document._save_out')
+    def test_put_head(self, mock_save_out):
+        '''
+        A new <meiHead> writes only "head.mei".
+        '''
+        self.doc.put_head(etree.Element(mei.MEI_HEAD))
+        actual = self.doc.save_everything()
+        head_path = os.path.join(self.repo_dir, 'head.mei')
+        mock_save_out.assert_called_once_with(mock.ANY, head_path, 'pretty')
+        assert [head_path] == actual.changed
+
+    @mock.patch('lychee.document.document._save_out')
+    def test_reloaded(self, mock_save_out):
+        '''
+        A Document loaded from the saved files writes nothing.
+        '''
+        doc = document.Document(self.repo_dir)
+        doc.get_section('Sme-s-m-l-e1111111')
+        actual = doc.save_everything()
+        assert 0 == mock_save_out.call_count
+        six.assertCountEqual(self, self.first, actual.unchanged)
+
+
+class TestLazyLoading(DocumentTestCase):
+    '''
+    Tests for Document(lazy=True) and Document.load_everything().
+    '''
+
+    def setUp(self):
+        '''
+        Save a document with two sections in the score.
+        '''
+        DocumentTestCase.setUp(self)
+        score = etree.Element(mei.SCORE)
+        etree.SubElement(score, mei.SECTION, attrib={xml.ID: 'Sme-s-m-l-e1111111'})
+        etree.SubElement(score, mei.SECTION, attrib={xml.ID: 'Sme-s-m-l-e2222222'})
+        self.doc.put_score(score)
+        self.first = self.doc.save_everything()
+        self.head_path = os.path.join(self.repo_dir, 'head.mei')
+        self.score_path = os.path.join(self.repo_dir, 'score.mei')
+        document.cache.SECTION_CACHE.clear()
+
+    @mock.patch('lychee.document.document._load_in')
+    @mock.patch('lychee.document.document.etree.parse')
+    def test_init(self, mock_parse, mock_load_in):
+        '''
+        Constructing a lazy Document reads no files.
+        '''
+        document.Document(self.repo_dir, lazy=True)
+        assert 0 == mock_parse.call_count
+        assert 0 == mock_load_in.call_count
+
+    def test_get_section(self):
+        '''
+        Getting a <section> doesn't load the header or the score order.
+        '''
+        doc = document.Document(self.repo_dir, lazy=True)
+        with mock.patch('lychee.document.document._load_in', wraps=document._load_in) as mock_load_in:
+            section = doc.get_section('Sme-s-m-l-e2222222')
+        assert 'Sme-s-m-l-e2222222' == section.get(xml.ID)
+        assert [os.path.join(self.repo_dir, 'Sme-s-m-l-e2222222.mei')] == [
+            each_call[0][0] for each_call in mock_load_in.call_args_list]
+        assert doc._head is None
+        assert '_score_order' not in vars(doc)
+
+    def test_same_as_eager(self):
+        '''
+        A lazy Document holds the same document as an eager one.
+        '''
+        eager = document.Document(self.repo_dir)
+        lazy = document.Document(self.repo_dir, lazy=True)
+        assert eager.get_section_ids() == lazy.get_section_ids()
+        six.assertCountEqual(self, eager.get_section_ids(True), lazy.get_section_ids(True))
+        assert etree.tostring(eager.get_head()) == etree.tostring(lazy.get_head())
+
+    @mock.patch('lychee.document.document._save_out')
+    def test_save_nothing_changed(self, mock_save_out):
+        '''
+        Saving a lazy Document that was never loaded writes nothing.
+        '''
+        doc = document.Document(self.repo_dir, lazy=True)
+        actual = doc.save_everything()
+        assert 0 == mock_save_out.call_count
+        six.assertCountEqual(self, self.first, actual.unchanged)
+        assert doc._head is None
+
+    def test_save_put_section(self):
+        '''
+        A new section is saved without loading the header, and "all_files.mei" still points to it.
+        '''
+        doc = document.Document(self.repo_dir, lazy=True)
+        doc.put_section(etree.Element(mei.SECTION, attrib={xml.ID: 'Sme-s-m-l-e3333333'}))
+        actual = doc.save_everything()
+
+        exp = [os.path.join(self.repo_dir, 'Sme-s-m-l-e3333333.mei'),
+               os.path.join(self.repo_dir, 'all_files.mei')]
+        six.assertCountEqual(self, exp, actual.changed)
+        assert self.head_path in actual.unchanged
+        assert doc._head is None
+        reloaded = document.Document(self.repo_dir)
+        assert reloaded.get_head().find('.//{}'.format(mei.TITLE)) is not None
+
+    def test_save_put_score(self):
+        '''
+        The score order may be replaced before it is loaded.
+        '''
+        doc = document.Document(self.repo_dir, lazy=True)
+        score = etree.Element(mei.SCORE)
+        etree.SubElement(score, mei.SECTION, attrib={xml.ID: 'Sme-s-m-l-e2222222'})
+        etree.SubElement(score, mei.SECTION, attrib={xml.ID: 'Sme-s-m-l-e1111111'})
+        doc.put_score(score)
+        actual = doc.save_everything()
+
+        assert self.score_path in actual.changed
+        assert ['Sme-s-m-l-e2222222', 'Sme-s-m-l-e1111111'] == (
+            document.Document(self.repo_dir).get_section_ids())
+
+    def test_errors_deferred(self):
+        '''
+        A missing file causes an exception when it's needed, not on initialization.
+        '''
+        os.remove(self.head_path)
+        with pytest.raises(exceptions.HeaderNotFoundError):
+            document.Document(self.repo_dir)
+
+        doc = document.Document(self.repo_dir, lazy=True)
+        assert 2 == len(doc.get_section_ids())
+        with pytest.raises(exceptions.HeaderNotFoundError):
+            doc.get_head()
+
+    @mock.patch('lychee.document.document._save_out')
+    def test_load_everything(self, mock_save_out):
+        '''
+        load_everything() keeps every <section>, and they aren't written unless replaced.
+        '''
+        for threads in (None, 1):
+            doc = document.Document(self.repo_dir, lazy=True)
+            doc.load_everything(threads=threads)
+
+            assert doc._head is not None
+            assert 2 == len(doc._score_order)
+            for xmlid in doc.get_section_ids():
+                assert doc.get_section(xmlid) is doc.get_section(xmlid)
+                assert xmlid == doc.get_section(xmlid).get(xml.ID)
+            assert [] == doc.save_everything().changed
+            assert 0 == mock_save_out.call_count
+
+    def test_load_everything_keeps_put_section(self):
+        '''
+        load_everything() doesn't replace a section given to put_section().
+        '''
+        doc = document.Document(self.repo_dir, lazy=True)
+        new_section = etree.Element(mei.SECTION, attrib={xml.ID: 'Sme-s-m-l-e1111111'})
+        doc.put_section(new_section)
+        doc.load_everything()
+        assert new_section is doc.get_section('Sme-s-m-l-e1111111')
+        assert [os.path.join(self.repo_dir, 'Sme-s-m-l-e1111111.mei')] == doc.save_everything().changed
+
+
+class TestSectionBudget(DocumentTestCase):
+    '''
+    Tests for Document(section_budget=...).
+    '''
+
+    def setUp(self):
+        '''
+        Make a Document that holds about one <section> in memory.
+        '''
+        DocumentTestCase.setUp(self)
+        self.sections = []
+        for xmlid in ('Sme-s-m-l-e1111111', 'Sme-s-m-l-e2222222'):
+            section = etree.Element(mei.SECTION, attrib={xml.ID: xmlid})
+            for i in range(10):
+                etree.SubElement(section, mei.MEASURE, n=str(i))
+            self.sections.append(section)
+        budget = len(etree.tostring(self.sections[0])) + 10
+        self.doc = document.Document(self.repo_dir, section_budget=budget)
+        document.cache.SECTION_CACHE.clear()
+
+    def test_unsaved_kept(self):
+        '''
+        Sections not yet saved are compressed when evicted, then saved with their content.
+        '''
+        one, two = self.sections
+        self.doc.put_section(one)
+        self.doc.put_section(two)
+        assert 1 == self.doc.section_store_stats()['compressed']
+
+        actual = self.doc.save_everything()
+        assert 2 == len([x for x in actual.changed if x.endswith('1111111.mei')
+                         or x.endswith('2222222.mei')])
+        reloaded = document.Document(self.repo_dir).get_section('Sme-s-m-l-e1111111')
+        assert 10 == len(reloaded.findall(mei.MEASURE))
+
+    def test_saved_evicted_to_file(self):
+        '''
+        Saved sections are evicted to their files, and loaded again when requested.
+        '''
+        one, two = self.sections
+        self.doc.put_section(one)
+        self.doc.save_everything()
+        self.doc.put_section(two)
+
+        actual = self.doc.section_store_stats()
+        assert (1, 1, 0) == (actual['resident'], actual['on_disk'], actual['compressed'])
+        reloaded = self.doc.get_section('Sme-s-m-l-e1111111')
+        assert 10 == len(reloaded.findall(mei.MEASURE))
+        changed = self.doc.save_everything().changed
+        assert os.path.join(self.repo_dir, 'Sme-s-m-l-e1111111.mei') not in changed
+        assert os.path.join(self.repo_dir, 'Sme-s-m-l-e2222222.mei') in changed
+
+    def test_snapshot(self):
+        '''
+        A DocumentSnapshot evicts every section to its file.
+        '''
+        for section in self.sections:
+            self.doc.put_section(section)
+        self.doc.save_everything()
+        budget = self.doc.section_store_stats()['max_bytes']
+        snapshot = document.DocumentSnapshot(self.repo_dir, section_budget=budget)
+        for xmlid in ('Sme-s-m-l-e1111111', 'Sme-s-m-l-e2222222'):
+            snapshot.get_section(xmlid)
+
+        actual = snapshot.section_store_stats()
+        assert (1, 1, 0) == (actual['resident'], actual['on_disk'], actual['compressed'])
+
+
+class TestSerialization(DocumentTestCase):
+    '''
+    Tests for Document(serialization=...).
+    '''
+
+    def test_compact(self):
+        '''
+        Sections are written in the "compact" profile, and a section put again with the same
+        content is not written.
+        '''
+        doc = document.Document(self.repo_dir, serialization='compact')
+        section = etree.Element(mei.SECTION, attrib={xml.ID: 'Sme-s-m-l-e1111111'})
+        etree.SubElement(section, mei.MEASURE)
+        doc.put_section(section)
+        doc.save_everything()
+        with open(os.path.join(self.repo_dir, 'Sme-s-m-l-e1111111.mei'), 'rb') as the_file:
+            assert b'\n ' not in the_file.read()
+
+        doc.put_section(copy.deepcopy(section))
+        actual = doc.save_everything()
+        assert [] == actual.changed
+
+    def test_invalid(self):
+        '''
+        An unknown profile raises ValueError.
+        '''
+        with pytest.raises(ValueError):
+            document.Document(self.repo_dir, serialization='tiny')
+
+
+class TestSidecar(DocumentTestCase):
+    '''
+    Tests for Document(sidecar=...).
+    '''
+
+    def test_get_section(self):
+        '''
+        Sections and the header are loaded from the sidecar cache once it has been made.
+        '''
+        section = etree.Element(mei.SECTION, attrib={xml.ID: 'Sme-s-m-l-e1111111'})
+        etree.SubElement(section, mei.MEASURE, n='1')
+        self.doc.put_section(section)
+        self.doc.save_everything()
+
+        for expected_parses in (2, 0):
+            document.cache.SECTION_CACHE.clear()
+            doc = document.Document(self.repo_dir, lazy=True, sidecar='mtime')
+            with mock.patch('lychee.document.document._parse_compact',
+                            wraps=document._parse_compact) as mock_parse:
+                actual = doc.get_section('Sme-s-m-l-e1111111')
+                doc.get_head()
+            assert expected_parses == mock_parse.call_count
+            assert '1' == actual[0].get('n')
+            assert actual.text is None
+
+        assert os.path.isdir(os.path.join(self.repo_dir, document.cache.SIDECAR_DIR))
+
+    def test_get_section_after_plain(self):
+        '''
+        A section loaded without the sidecar cache, and so with whitespace, isn't returned from the
+        SECTION_CACHE to a Document that uses the sidecar cache.
+        '''
+        section = etree.Element(mei.SECTION, attrib={xml.ID: 'Sme-s-m-l-e1111111'})
+        etree.SubElement(section, mei.MEASURE, n='1')
+        self.doc.put_section(section)
+        self.doc.save_everything()
+        document.cache.SECTION_CACHE.clear()
+
+        plain = document.Document(self.repo_dir, lazy=True).get_section('Sme-s-m-l-e1111111')
+        compact = document.Document(self.repo_dir, lazy=True, sidecar='mtime').get_section(
+            'Sme-s-m-l-e1111111')
+
+        assert plain.text is not None
+        assert compact.text is None
+
+
 class TestGetFromPutInHead(DocumentTestCase):
     '''
     Tests for Document.get_from_head() and Document.put_in_head().
@@ -1654,3 +2100,54 @@ class TestMoveSectionTo(DocumentTestCase):
         self.doc.move_section_to(sect_ids[2], 0)
 
         assert self.doc.get_section_ids() == [sect_ids[2], sect_ids[0], sect_ids[1]]
+
+
+class TestDocumentSnapshot(DocumentTestCase):
+    '''
+    Tests for DocumentSnapshot.
+    '''
+
+    def setUp(self):
+        '''
+        Save a document with one <section> in the active score.
+        '''
+        DocumentTestCase.setUp(self)
+        score = etree.Element(mei.SCORE)
+        etree.SubElement(score, mei.SECTION)
+        self.section_id = self.doc.put_score(score)[0]
+        self.doc.save_everything()
+
+    def test_section_loaded_once(self):
+        '''
+        A <section> is parsed the first time it's requested, then kept for later calls.
+        '''
+        snapshot = document.DocumentSnapshot(self.repo_dir, key='key')
+        with mock.patch('lychee.document.document._load_in') as mock_load_in:
+            the_section = mock.Mock()
+            the_section.getroot = mock.Mock(return_value='some section')
+            mock_load_in.return_value = the_section
+
+            assert 'some section' == snapshot.get_section(self.section_id)
+            assert 'some section' == snapshot.get_section('#' + self.section_id)
+
+        assert 1 == mock_load_in.call_count
+        assert 'key' == snapshot.key
+
+    def test_read_only(self):
+        '''
+        Methods that would change the document raise CannotSaveError.
+        '''
+        snapshot = document.DocumentSnapshot(self.repo_dir)
+        calls = (
+            (snapshot.save_everything, ()),
+            (snapshot.put_head, (etree.Element(mei.MEI_HEAD),)),
+            (snapshot.put_score, (etree.Element(mei.SCORE),)),
+            (snapshot.put_section, (etree.Element(mei.SECTION),)),
+            (snapshot.move_section_to, (self.section_id, 0)),
+        )
+        for method, args in calls:
+            with pytest.raises(exceptions.CannotSaveError) as exc:
+                method(*args)
+            assert document._ERR_READ_ONLY == exc.value.args[0]
+
+        assert [self.section_id] == snapshot.get_section_ids()
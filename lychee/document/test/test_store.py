@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               document/test/test_store.py
+# Purpose:                Tests for the "lychee.document.store" module.
+#
+# Copyright (C) 2017 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Tests for the :mod:`lychee.document.store` module.
+'''
+
+# pylint: disable=protected-access
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from lxml import etree
+
+from lychee.document import store as store_module
+from lychee.document.store import SectionStore
+from lychee.namespaces import mei, xml
+
+
+def make_section(xmlid, measures=10):
+    '''
+    Make a <section> with some <measure> elements, so it has a reasonable size.
+    '''
+    section = etree.Element(mei.SECTION, attrib={xml.ID: xmlid})
+    for i in range(measures):
+        etree.SubElement(section, mei.MEASURE, n=str(i))
+    return section
+
+
+class TestSectionStore(object):
+    '''
+    Tests for SectionStore.
+    '''
+
+    def test_no_budget(self):
+        '''
+        Without a budget, the store works like a dict.
+        '''
+        one = make_section('one')
+        store = SectionStore({'one': one, 'two': None})
+        store['three'] = make_section('three')
+        assert one is store['one']
+        assert store['two'] is None
+        assert {'one': one, 'two': None, 'three': store['three']} == store
+        del store['two']
+        assert ['one', 'three'] == sorted(store)
+        assert 0 == store.evictions
+
+    def test_evict_saved(self):
+        '''
+        A saved element over the budget is discarded, and the least-recently used goes first.
+        '''
+        size = len(etree.tostring(make_section('one')))
+        store = SectionStore(max_bytes=2 * size, is_saved=lambda xmlid: True)
+        store['one'] = make_section('one')
+        store['two'] = make_section('two')
+        store['one']
+        store['six'] = make_section('six')
+
+        assert store['two'] is None
+        assert store.is_resident('one')
+        assert store.is_resident('six')
+        assert 1 == store.evictions
+
+    def test_evict_compressed(self):
+        '''
+        An element that isn't saved is compressed, and parsed again when requested.
+        '''
+        size = len(etree.tostring(make_section('one')))
+        store = SectionStore(max_bytes=size, is_saved=lambda xmlid: xmlid == 'two')
+        one = make_section('one')
+        store['one'] = one
+        store['two'] = make_section('two')
+
+        assert not store.is_resident('one')
+        post = store['one']
+        assert post is not one
+        assert etree.tostring(one) == etree.tostring(post)
+        assert 1 == store.reloads
+        # now "two" is evicted to its file
+        assert store['two'] is None
+
+    def test_keep_newest(self):
+        '''
+        The most recent element is kept even if it is larger than the budget.
+        '''
+        store = SectionStore(max_bytes=1)
+        store['one'] = make_section('one')
+        store['two'] = make_section('two')
+        assert store.is_resident('two')
+        assert not store.is_resident('one')
+
+    def test_stats(self):
+        '''
+        stats() reports the elements and their sizes.
+        '''
+        size = len(etree.tostring(make_section('one')))
+        store = SectionStore({'four': None}, max_bytes=size)
+        store['one'] = make_section('one')
+        store['two'] = make_section('two')
+        actual = store.stats()
+
+        assert 3 == actual['sections']
+        assert (1, size) == (actual['resident'], actual['resident_bytes'])
+        assert 1 == actual['compressed']
+        assert 0 < actual['compressed_bytes'] < size
+        assert 1 == actual['on_disk']
+        assert size == actual['max_bytes']
+        assert (1, 0) == (actual['evictions'], actual['reloads'])
+
+    def test_read_does_not_serialize(self):
+        '''
+        Getting a resident element with a budget doesn't compute its size again.
+        '''
+        store = SectionStore(max_bytes=10 ** 9)
+        store['one'] = make_section('one', measures=100)
+        with mock.patch.object(store_module, 'etree', wraps=etree) as mock_etree:
+            for _ in range(10):
+                store['one']
+        assert 0 == mock_etree.tostring.call_count
+        assert len(etree.tostring(store['one'])) == store.stats()['resident_bytes']
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               lychee/log_queue.py
+# Purpose:                Deliver log messages in batches from a background thread.
+#
+# Copyright (C) 2017 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Deliver log messages in batches from a background thread.
+
+.. warning::
+    This module is intended for internal *Lychee* use only, so the API may change without notice.
+    Use :func:`lychee.logs.start_queue` to turn it on.
+
+Without a :class:`LogQueue`, every log message is delivered through the
+:const:`~lychee.signals.LOG_MESSAGE` signal by the thread that logged it, so a conversion waits for
+every slot: printing to stdout, or sending the message to the GUI over the WebSocket. With a
+:class:`LogQueue`, the message is only added to a bounded buffer, and a worker thread gives the
+messages to the "sinks" in batches.
+
+A sink is a function that takes a list of messages, each a dictionary like the keyword arguments of
+:const:`~lychee.signals.LOG_MESSAGE`. This module has three:
+
+- :func:`signal_sink` emits :const:`~lychee.signals.LOG_MESSAGE` for each message, so the slots
+  (including :func:`~lychee.signals.simple_log_outputter`) and the WebSocket get them as before.
+- :class:`StreamSink` writes each batch to a file-like object, like stdout, and flushes it once.
+- :class:`JSONLinesSink` appends each message to a file as one line of JSON.
+
+When the sinks fall behind, the buffer fills up. Above half full, only one in ``sample`` debug
+messages is kept. When it is full, debug messages are dropped, and other messages replace the
+oldest message in the buffer. The number of messages dropped is reported to the sinks in a message
+from the "logs" logger.
+'''
+
+import collections
+import json
+import sys
+import threading
+
+
+_DEBUG = 'DEBUG'
+_DROPPED_MESSAGE = 'dropped {0} log messages'
+
+
+def signal_sink(entries):
+    '''
+    Emit the :const:`~lychee.signals.LOG_MESSAGE` signal for every message.
+    '''
+    import lychee.signals
+    for entry in entries:
+        lychee.signals.LOG_MESSAGE.emit(**entry)
+
+
+class StreamSink(object):
+    '''
+    Write messages to a file-like object, one line each, like
+    :func:`~lychee.signals.simple_log_outputter`.
+    '''
+
+    def __init__(self, stream=None):
+        '''
+        :param stream: The file-like object. The default is :const:`sys.stdout` when the messages
+            are written.
+        '''
+        self.stream = stream
+
+    def __call__(self, entries):
+        stream = sys.stdout if self.stream is None else self.stream
+        stream.write(''.join('{time} {level} {logger}: {message}\n'.format(**entry)
+                             for entry in entries))
+        stream.flush()
+
+
+class JSONLinesSink(object):
+    '''
+    Append messages to a file, each as a JSON object on its own line.
+    '''
+
+    def __init__(self, pathname):
+        '''
+        :param str pathname: The file to append to. It's created if it doesn't exist.
+        '''
+        self.pathname = pathname
+        self._file = None
+
+    def __call__(self, entries):
+        if self._file is None:
+            self._file = open(self.pathname, 'a')
+        self._file.write(''.join(json.dumps(entry, sort_keys=True) + '\n' for entry in entries))
+        self._file.flush()
+
+    def close(self):
+        '''
+        Close the file. It's opened again if more messages arrive.
+        '''
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class LogQueue(object):
+    '''
+    Buffer log messages and give them to the sinks in a worker thread.
+
+    The :attr:`dropped` attribute counts the messages dropped because the buffer was too full, and
+    :attr:`errors` counts the exceptions raised by sinks, which are otherwise ignored.
+    '''
+
+    def __init__(self, sinks, capacity=4096, batch_size=256, interval=0.05, sample=10):
+        '''
+        :param sinks: The functions that receive each batch of messages.
+        :type sinks: list of callable
+        :param int capacity: The most messages that may wait in the buffer.
+        :param int batch_size: The most messages given to the sinks at once.
+        :param float interval: The longest time, in seconds, that a message waits for a batch to
+            fill up.
+        :param int sample: When the buffer is more than half full, one in ``sample`` debug messages
+            is kept.
+        '''
+        self.sinks = list(sinks)
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.interval = interval
+        self.sample = sample
+        self.dropped = 0
+        self.errors = 0
+
+        self._cond = threading.Condition(threading.Lock())
+        self._buffer = collections.deque()
+        # debug messages seen while the buffer was more than half full
+        self._sampled = 0
+        # number of messages accepted, and number delivered (or dropped after they were accepted)
+        self._accepted = 0
+        self._done = 0
+        # number of dropped messages already reported to the sinks
+        self._reported = 0
+        self._flushing = 0
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name='lychee-log-queue')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def put(self, entry):
+        '''
+        Add a message to the buffer, or drop it if the buffer is too full. This never waits for the
+        sinks.
+
+        :param dict entry: The message.
+        '''
+        with self._cond:
+            if self._closed:
+                return
+            size = len(self._buffer)
+            if size * 2 > self.capacity:
+                if entry['level'] == _DEBUG:
+                    self._sampled += 1
+                    if size >= self.capacity or self._sampled % self.sample:
+                        self.dropped += 1
+                        return
+                if size >= self.capacity:
+                    self._buffer.popleft()
+                    self.dropped += 1
+                    self._done += 1
+
+            self._buffer.append(entry)
+            self._accepted += 1
+            if size == 0 or size + 1 >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self):
+        '''
+        Wait until every message put before this call is given to the sinks.
+        '''
+        with self._cond:
+            target = self._accepted
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while self._done < target and self._thread.is_alive():
+                    self._cond.wait()
+            finally:
+                self._flushing -= 1
+
+    def close(self):
+        '''
+        Give the waiting messages to the sinks, then stop the worker thread.
+        '''
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    @property
+    def pending(self):
+        '''
+        The number of messages waiting in the buffer.
+        '''
+        with self._cond:
+            return len(self._buffer)
+
+    def _run(self):
+        '''
+        Give batches of messages to the sinks until the queue is closed.
+        '''
+        while True:
+            with self._cond:
+                while not self._buffer:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+                if len(self._buffer) < self.batch_size and not (self._closed or self._flushing):
+                    self._cond.wait(self.interval)
+
+                batch = [self._buffer.popleft()
+                         for _ in range(min(self.batch_size, len(self._buffer)))]
+                count = len(batch)
+                if self.dropped > self._reported:
+                    batch.append({'level': 'INFO', 'logger': 'logs', 'status': 'comment',
+                                  'message': _DROPPED_MESSAGE.format(self.dropped - self._reported),
+                                  'time': '0'})
+                    self._reported = self.dropped
+
+            for sink in self.sinks:
+                try:
+                    sink(batch)
+                except Exception:
+                    self.errors += 1
+
+            with self._cond:
+                self._done += count
+                self._cond.notify_all()
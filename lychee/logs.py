@@ -24,10 +24,37 @@
 #--------------------------------------------------------------------------------------------------
 """
 Configure Lithoxyl logs for Lychee.
+
+Every action logged with ``log.debug()``, ``log.info()``, or ``log.wrap()`` usually creates a
+Lithoxyl action and sends its entries through the :const:`lychee.signals.LOG_MESSAGE` signal. For
+the converters, which log an action for every note, that costs more than the conversion itself.
+
+Use :func:`set_level` to make the actions below a level "quiet." A quiet action is
+:const:`QUIET_ACTION`, which does nothing, and a function decorated with ``log.wrap()`` at a quiet
+level is called directly, with :const:`QUIET_ACTION` as its injected action. For example,
+``set_level('info')`` skips the ``debug`` actions for every note, chord, and accidental.
+
+The failures of quiet actions are not lost when they happen inside an action started with
+``summarize=True``, like the action for each <layer> and <staff> in the LilyPond converter. When
+that action is quiet too, it counts the failures inside it, then logs them as one failure when it
+finishes. Failures of quiet actions outside a summarizing action are not logged.
+
+By default the :const:`~lychee.signals.LOG_MESSAGE` signal is emitted by the thread that logged the
+message, so it waits for every slot. Call :func:`start_queue` to deliver the messages in batches from
+a background thread instead (see :mod:`lychee.log_queue`), and :func:`stop_queue` to deliver the
+remaining messages and go back to the default.
 """
 
 from __future__ import unicode_literals
+import collections
+import functools
+import sys
+import threading
+
 from lithoxyl import logger, SensibleFilter, SensibleSink
+from lithoxyl.common import get_level, DEBUG, INFO, CRITICAL
+
+from lychee import log_queue
 
 
 INBOUND_LOG = None
@@ -35,17 +62,222 @@ DOCUMENT_LOG = None
 VCS_LOG = None
 OUTBOUND_LOG = None
 SESSION_LOG = None
+LOG_QUEUE = None
+
+_ERR_UNKNOWN_LEVEL = 'Unknown log level: {0}'
+
+# the value of the lowest level that is logged; actions below it are quiet
+_min_level = DEBUG._value
+# holds a "stack" of Counter objects, for the failures in each summarizing action of a thread
+_tallies = threading.local()
+
+
+def set_level(level):
+    """
+    Choose the lowest level of action that is logged.
+
+    :param str level: ``'debug'`` (the default, which logs every action), ``'info'``, or
+        ``'critical'``. Actions below this level are quiet.
+    :raises: :exc:`ValueError` when ``level`` is not one of these.
+    """
+    global _min_level
+    found = get_level(level, None)
+    if found not in (DEBUG, INFO, CRITICAL):
+        raise ValueError(_ERR_UNKNOWN_LEVEL.format(level))
+    _min_level = found._value
+
+
+def start_queue(sinks=None, **kwargs):
+    """
+    Deliver log messages from a background thread, with a :class:`~lychee.log_queue.LogQueue`.
+
+    :param sinks: The functions that receive each batch of messages. The default emits the
+        :const:`~lychee.signals.LOG_MESSAGE` signal for each message, with
+        :func:`~lychee.log_queue.signal_sink`.
+    :type sinks: list of callable
+    :param kwargs: Given to the :class:`~lychee.log_queue.LogQueue`.
+    :returns: The new queue, which is also :const:`LOG_QUEUE`.
+    :rtype: :class:`~lychee.log_queue.LogQueue`
+
+    If a queue is already running, it's stopped first.
+    """
+    global LOG_QUEUE
+    stop_queue()
+    LOG_QUEUE = log_queue.LogQueue([log_queue.signal_sink] if sinks is None else sinks, **kwargs)
+    return LOG_QUEUE
+
+
+def stop_queue():
+    """
+    Deliver the messages waiting in :const:`LOG_QUEUE`, if there is one, then go back to emitting
+    :const:`~lychee.signals.LOG_MESSAGE` in the thread that logs each message.
+    """
+    global LOG_QUEUE
+    queue, LOG_QUEUE = LOG_QUEUE, None
+    if queue is not None:
+        queue.close()
+
+
+def _count(message, fargs, kwargs):
+    """
+    Count a failure of a quiet action in the innermost summarizing action, if there is one.
+    """
+    stack = getattr(_tallies, 'stack', None)
+    if stack:
+        if message is None:
+            message = 'failure'
+        elif fargs or kwargs:
+            try:
+                message = message.format(*fargs, **(kwargs or {}))
+            except (IndexError, KeyError, ValueError):
+                pass
+        stack[-1][message] += 1
+
+
+class QuietAction(object):
+    """
+    An action below the logging level. It has the methods of a Lithoxyl action, but only counts
+    failures and exceptions for a summarizing action.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is not None:
+            _count('exception: {0}', (exc_type.__name__,), None)
+
+    def begin(self, message=None, *a, **kw):
+        return self
+
+    def warn(self, message, *a, **kw):
+        pass
+
+    def success(self, message=None, *a, **kw):
+        pass
+
+    def failure(self, message=None, *a, **kw):
+        _count(message, a, kw)
+
+    def exception(self, message=None, *a, **kw):
+        _count(message, a, kw)
+
+    def __getitem__(self, key):
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        pass
+
+
+QUIET_ACTION = QuietAction()
+
+
+class SummaryAction(QuietAction):
+    """
+    A quiet action with ``summarize=True``. It counts the failures of the quiet actions inside it,
+    and logs them as one failure at the lowest logged level when it finishes.
+    """
+
+    def __init__(self, log, name):
+        self.log = log
+        self.name = name
+        self.tally = collections.Counter()
+
+    def __enter__(self):
+        stack = getattr(_tallies, 'stack', None)
+        if stack is None:
+            stack = _tallies.stack = []
+        stack.append(self.tally)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        super(SummaryAction, self).__exit__(exc_type, exc_val, exc_tb)
+        _tallies.stack.pop()
+        if self.tally:
+            details = '; '.join('{0} (x{1})'.format(message, count)
+                                for message, count in sorted(self.tally.items()))
+            with logger.Logger.action(self.log, _min_level, self.name) as action:
+                action.failure('{count} failures: {details}', count=sum(self.tally.values()),
+                               details=details)
+
+
+class LycheeLogger(logger.Logger):
+    """
+    A Lithoxyl :class:`~lithoxyl.logger.Logger` whose actions are quiet below the level chosen with
+    :func:`set_level`. Its action methods and :meth:`wrap` also accept ``summarize=True``.
+    """
+
+    def _action(self, level, action_name, kw):
+        """
+        Return a new action, or a quiet action if ``level`` is not logged.
+        """
+        summarize = kw.pop('summarize', False)
+        if level._value < _min_level:
+            return SummaryAction(self, action_name) if summarize else QUIET_ACTION
+        return self.action_type(logger=self, level=level, name=action_name,
+                                reraise=kw.pop('reraise', None),
+                                parent=kw.pop('parent_action', None),
+                                data=kw, frame=sys._getframe(2))
+
+    def debug(self, action_name, **kw):
+        return self._action(DEBUG, action_name, kw)
+
+    def info(self, action_name, **kw):
+        return self._action(INFO, action_name, kw)
+
+    def critical(self, action_name, **kw):
+        return self._action(CRITICAL, action_name, kw)
+
+    def action(self, level, action_name, **kw):
+        return self._action(get_level(level), action_name, kw)
+
+    def wrap(self, level, action_name=None, inject_as=None, enable_wrap=True, **kw):
+        """
+        Decorate a function to run in an action, like :meth:`lithoxyl.logger.Logger.wrap`. When
+        ``level`` is quiet, the function is called directly.
+        """
+        summarize = kw.pop('summarize', False)
+        level = get_level(level)
+        wrapper = super(LycheeLogger, self).wrap(level, action_name, inject_as, enable_wrap, **kw)
+
+        def action_wrapper(func_to_log):
+            if not enable_wrap:
+                return func_to_log
+            logged_func = wrapper(func_to_log)
+            name = action_name or func_to_log.__name__
+
+            @functools.wraps(logged_func)
+            def quiet_or_logged_func(*a, **kwargs):
+                if level._value >= _min_level:
+                    return logged_func(*a, **kwargs)
+                elif summarize:
+                    action = SummaryAction(self, name)
+                    if inject_as:
+                        kwargs[inject_as] = action
+                    with action:
+                        return func_to_log(*a, **kwargs)
+                if inject_as:
+                    kwargs[inject_as] = QUIET_ACTION
+                return func_to_log(*a, **kwargs)
+
+            return quiet_or_logged_func
+
+        return action_wrapper
 
 
 class LycheeEmitter(object):
     """
     An "emitter" for the Lithoxyl :class:`SensibleSink` that sends log messages through the
-    :const:`lychee.signals.LOG_MESSAGE` signal.
+    :const:`lychee.signals.LOG_MESSAGE` signal, or puts them in :const:`LOG_QUEUE` when it's running.
     """
 
     def emit_entry(self, action, entry):
-        import lychee.signals
-        lychee.signals.LOG_MESSAGE.emit(**entry)
+        queue = LOG_QUEUE
+        if queue is not None:
+            queue.put(entry)
+        else:
+            import lychee.signals
+            lychee.signals.LOG_MESSAGE.emit(**entry)
 
     on_begin = on_warn = on_end = on_comment = emit_entry
 
@@ -79,7 +311,7 @@ def logging_init():
     Initialize Lychee's logging stuff.
 
     This function is called automatically when the :mod:`logs` module is imported. All the ``*_LOG``
-    :class:`~lithoxyl.logger.Logger` instances are created always and only when
+    :class:`LycheeLogger` instances are created always and only when
     ``INBOUND_LOG is None``.
     """
     global INBOUND_LOG
@@ -93,11 +325,11 @@ def logging_init():
         emitter = LycheeEmitter()
         sink = SensibleSink(filters=[log_filter], formatter=LycheeFormatter(), emitter=emitter)
 
-        INBOUND_LOG = logger.Logger('inbound', sinks=[sink])
-        DOCUMENT_LOG = logger.Logger('document', sinks=[sink])
-        VCS_LOG = logger.Logger('vcs', sinks=[sink])
-        OUTBOUND_LOG = logger.Logger('outbound', sinks=[sink])
-        SESSION_LOG = logger.Logger('session', sinks=[sink])
+        INBOUND_LOG = LycheeLogger('inbound', sinks=[sink])
+        DOCUMENT_LOG = LycheeLogger('document', sinks=[sink])
+        VCS_LOG = LycheeLogger('vcs', sinks=[sink])
+        OUTBOUND_LOG = LycheeLogger('outbound', sinks=[sink])
+        SESSION_LOG = LycheeLogger('session', sinks=[sink])
 
 
 logging_init()
@@ -39,7 +39,8 @@ REGISTER_FORMAT = signal.Signal(args=['dtype', 'who', 'outbound'], name='outboun
 To request that Lychee produce output data in a given format, call this signal before calling
 :const:`ACTION_START`.
 
-:kwarg str dtype: The data type to produce ('abjad', 'lilypond', 'mei', 'verovio').
+:kwarg str dtype: The data type to produce ('abjad', 'lilypond', 'mei', 'verovio',
+    'verovio-stream').
 :kwarg str who: (Optional). A unique identifier for the component requesting a format.
 :kwarg bool outbound: (Optional). Whether to run an "outbound" step immediately.
 
@@ -62,7 +63,8 @@ UNREGISTER_FORMAT = signal.Signal(args=['dtype', 'who'], name='outbound.UNREGIST
 '''
 Tell Lychee that an interface component is no longer expecting output for a specific "dtype".
 
-:kwarg str dtype: The data type to produce ('abjad', 'lilypond', 'mei', 'verovio').
+:kwarg str dtype: The data type to produce ('abjad', 'lilypond', 'mei', 'verovio',
+    'verovio-stream').
 :kwarg str who: (Optional). A unique identifier for the component requesting a format.
 
 Refer to the discussion above for :const:`REGISTER_FORMAT`.
@@ -100,6 +102,12 @@ as the conversions finish.
 **Type of "Document" Parameter**
 
 - If ``dtype`` is ``'mei'`` then ``document`` should be an :class:`lxml.etree.Element`.
+- If ``dtype`` is ``'verovio'`` then ``document`` is a unicode string.
+- If ``dtype`` is ``'verovio-stream'`` then ``document`` is an iterator of UTF-8 encoded ``bytes``
+  that make up the same document as for ``'verovio'``. The document is converted before the
+  signal is emitted, but serialized as the iterator is consumed, so the whole serialized document
+  is never held in memory. Write the chunks to a file or socket as they arrive, or use
+  :func:`lychee.converters.outbound.verovio.write_for_verovio` directly.
 '''
 
 
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               lychee/tests/test_batch.py
+# Purpose:                Tests for the "lychee.batch" module.
+#
+# Copyright (C) 2016 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+"""
+Tests for the "lychee.batch" module.
+"""
+
+import os
+
+import pytest
+import six
+
+from lychee import batch
+
+
+STAFF = b'\\new Staff { \\clef "treble" c\'4 d\'8 e\'8 r2 }'
+
+
+@pytest.fixture
+def corpus(tmpdir):
+    """A directory with LilyPond files in subdirectories, one of which is invalid."""
+    tmpdir.join('in', 'a', 'one.ly').write(STAFF, ensure=True)
+    tmpdir.join('in', 'a', 'b', 'two.ly').write(STAFF, ensure=True)
+    tmpdir.join('in', 'bad.ly').write(b'\\clef {', ensure=True)
+    tmpdir.join('in', 'notes.txt').write(b'not music', ensure=True)
+    return tmpdir
+
+
+class TestFindJobs(object):
+    """
+    For find_jobs().
+    """
+
+    def test_directory(self, corpus):
+        """A directory is searched recursively, and the output mirrors its tree."""
+        indir = str(corpus.join('in'))
+        outdir = str(corpus.join('out'))
+        actual = batch.find_jobs([indir], outdir, 'fast')
+        assert [
+            (os.path.join(indir, 'bad.ly'), os.path.join(outdir, 'bad.mei')),
+            (os.path.join(indir, 'a', 'one.ly'), os.path.join(outdir, 'a', 'one.mei')),
+            (os.path.join(indir, 'a', 'b', 'two.ly'), os.path.join(outdir, 'a', 'b', 'two.mei')),
+        ] == sorted([(job.infile, job.outfile) for job in actual], key=lambda x: x[0].count(os.sep))
+        assert all(job.backend == 'fast' for job in actual)
+
+    def test_glob(self, corpus):
+        """A glob is relative to its directory, and files aren't found twice."""
+        indir = str(corpus.join('in'))
+        outdir = str(corpus.join('out'))
+        pattern = os.path.join(indir, 'a', '*.ly')
+        actual = batch.find_jobs([pattern, os.path.join(indir, 'a', 'one.ly')], outdir)
+        assert [os.path.join(outdir, 'one.mei')] == [job.outfile for job in actual]
+
+    def test_nothing(self, corpus):
+        """Nothing is found."""
+        assert [] == batch.find_jobs([str(corpus.join('in', '*.txt'))], str(corpus))
+
+
+class TestRun(object):
+    """
+    For convert_file(), run(), and main().
+    """
+
+    @pytest.mark.parametrize('processes', [1, 2])
+    def test_run(self, corpus, processes):
+        """Files are converted and written; failures are reported without stopping the batch."""
+        jobs = batch.find_jobs([str(corpus.join('in'))], str(corpus.join('out')))
+        out = six.StringIO()
+        results, seconds = batch.run(jobs, processes=processes, out=out)
+
+        assert 3 == len(results)
+        assert seconds > 0.0
+        failed = [result.job.infile for result in results if result.error]
+        assert [str(corpus.join('in', 'bad.ly'))] == failed
+        assert corpus.join('out', 'a', 'b', 'two.mei').check(file=True)
+        assert b'<mei:staff n="1">' in corpus.join('out', 'a', 'one.mei').read_binary()
+        assert not corpus.join('out', 'bad.mei').check()
+        assert 3 == len(out.getvalue().splitlines())
+        assert '1 failed' in batch.summarize(results, seconds)
+
+    def test_lmei_to_ly(self, corpus):
+        """A Lychee-MEI file converts back to LilyPond."""
+        corpus.join('one.mei').write(batch.ly_to_lmei(STAFF))
+        result = batch.convert_file(batch.Job(str(corpus.join('one.mei')),
+                                              str(corpus.join('one.ly')), None))
+        assert result.error is None
+        assert b"c'4 d'8 e'8 r2" in corpus.join('one.ly').read_binary()
+
+    def test_summarize(self):
+        """The summary has the number of files and files per second."""
+        results = [batch.Result(None, 1.0, None)] * 4
+        assert '4 files in 2.00s (2.0 files/s), 0 failed' == batch.summarize(results, 2.0)
+
+    def test_main(self, corpus, capsys):
+        """The exit status is 1 when a file failed and 2 when no files are found."""
+        outdir = str(corpus.join('out'))
+        assert 1 == batch.main([str(corpus.join('in')), '-o', outdir, '-j', '1'])
+        assert '3 files in' in capsys.readouterr()[0]
+        assert 0 == batch.main([str(corpus.join('in', 'a')), '-o', outdir, '-j', '1'])
+        assert 2 == batch.main([str(corpus.join('in', '*.txt')), '-o', outdir])
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               lychee/tests/test_log_queue.py
+# Purpose:                Tests for the "log_queue" module.
+#
+# Copyright (C) 2017 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Tests for the "log_queue" module.
+'''
+
+import json
+import os
+import threading
+
+import six
+
+from lychee import log_queue
+
+
+def entry(message, level='INFO'):
+    return {'level': level, 'logger': 'inbound', 'message': message, 'status': 'end', 'time': '1'}
+
+
+class TestLogQueue(object):
+    '''
+    Tests for LogQueue.
+    '''
+
+    def test_batches(self):
+        '''
+        Messages are given to every sink in order, in batches no larger than "batch_size."
+        '''
+        batches = []
+        others = []
+        queue = log_queue.LogQueue([batches.append, others.extend], batch_size=4, interval=10)
+        try:
+            for i in range(10):
+                queue.put(entry(str(i)))
+            queue.flush()
+        finally:
+            queue.close()
+        assert [str(i) for i in range(10)] == [x['message'] for x in others]
+        assert all(len(x) <= 4 for x in batches)
+        assert 0 == queue.dropped
+
+    def test_backpressure(self):
+        '''
+        While the sink is blocked, debug messages are sampled, then dropped, and other messages
+        replace the oldest ones. The number dropped is reported.
+        '''
+        blocked = threading.Event()
+        release = threading.Event()
+        received = []
+
+        def slow_sink(entries):
+            received.extend(entries)
+            blocked.set()
+            release.wait()
+
+        queue = log_queue.LogQueue([slow_sink], capacity=8, batch_size=1, sample=2)
+        try:
+            queue.put(entry('first'))
+            blocked.wait()
+            for i in range(8):
+                queue.put(entry('debug {}'.format(i), level='DEBUG'))
+            assert 6 == queue.pending
+            for i in range(5):
+                queue.put(entry('info {}'.format(i)))
+            assert 8 == queue.pending
+            release.set()
+            queue.flush()
+        finally:
+            release.set()
+            queue.close()
+
+        messages = [x['message'] for x in received]
+        assert ['first', 'debug 3', 'debug 4', 'debug 6', 'info 0', 'info 1', 'info 2', 'info 3', 'info 4'] == (
+            messages[:1] + [x for x in messages[1:] if not x.startswith('dropped')])
+        assert 5 == queue.dropped
+        assert 'dropped 5 log messages' in messages
+
+    def test_sink_error(self):
+        '''
+        A sink that fails doesn't stop the others.
+        '''
+        received = []
+
+        def bad_sink(entries):
+            raise RuntimeError()
+
+        queue = log_queue.LogQueue([bad_sink, received.extend])
+        try:
+            queue.put(entry('one'))
+            queue.flush()
+        finally:
+            queue.close()
+        assert ['one'] == [x['message'] for x in received]
+        assert 1 == queue.errors
+
+    def test_close(self):
+        '''
+        Closing delivers the waiting messages, and later messages are ignored.
+        '''
+        received = []
+        queue = log_queue.LogQueue([received.extend], interval=10)
+        queue.put(entry('one'))
+        queue.close()
+        queue.put(entry('two'))
+        assert ['one'] == [x['message'] for x in received]
+
+
+class TestSinks(object):
+    '''
+    Tests for the sinks.
+    '''
+
+    def test_stream(self):
+        '''
+        StreamSink writes one line per message.
+        '''
+        stream = six.StringIO()
+        log_queue.StreamSink(stream)([entry('one'), entry('two')])
+        assert '1 INFO inbound: one\n1 INFO inbound: two\n' == stream.getvalue()
+
+    def test_json_lines(self, tmpdir):
+        '''
+        JSONLinesSink appends one JSON object per line.
+        '''
+        pathname = os.path.join(str(tmpdir), 'log.jsonl')
+        sink = log_queue.JSONLinesSink(pathname)
+        sink([entry('one')])
+        sink([entry('two')])
+        sink.close()
+        with open(pathname) as log_file:
+            assert [entry('one'), entry('two')] == [json.loads(x) for x in log_file]
@@ -130,3 +130,133 @@ class TestLycheeEmitter(object):
     def test_comment(self):
         emitter = lychee.logs.LycheeEmitter()
         self.run_test(emitter.on_comment)
+
+
+class TestQuietLevels(object):
+    """
+    For :func:`set_level` and :class:`LycheeLogger`.
+    """
+
+    def setup_method(self):
+        self.slot = mock.MagicMock(spec=signalslot.slot.BaseSlot)
+        self.slot.is_alive = True
+        lychee.signals.LOG_MESSAGE.connect(self.slot)
+        self.log = lychee.logs.LycheeLogger('test', sinks=lychee.logs.INBOUND_LOG.sinks)
+
+    def teardown_method(self):
+        lychee.signals.LOG_MESSAGE.disconnect(self.slot)
+        lychee.logs.set_level('debug')
+
+    def messages(self):
+        return [x[1]['message'] for x in self.slot.call_args_list]
+
+    def test_default(self):
+        """
+        Every action is logged by default.
+        """
+        with self.log.debug('debug action') as action:
+            pass
+        assert not isinstance(action, lychee.logs.QuietAction)
+        with self.log.info('info action') as action:
+            action.failure('it failed')
+        assert ['it failed'] == self.messages()
+
+    def test_quiet(self):
+        """
+        Actions below the level are the quiet action, and wrapped functions are called directly.
+        """
+        @self.log.wrap('debug', 'wrapped', 'action')
+        def func(x, action):
+            action.failure('{x} failed', x=x)
+            return action
+
+        lychee.logs.set_level('info')
+        with self.log.debug('debug action') as action:
+            action.failure('it failed')
+        assert action is lychee.logs.QUIET_ACTION
+        assert lychee.logs.QUIET_ACTION is func(4)
+        assert [] == self.messages()
+
+    def test_summarize(self):
+        """
+        Failures inside a quiet summarizing action are logged as one failure.
+        """
+        @self.log.wrap('debug', 'note', 'action')
+        def note(x, action):
+            if x % 2:
+                action.failure('odd {x}', x=x % 3)
+
+        @self.log.wrap('debug', 'layer', summarize=True)
+        def layer():
+            for x in range(6):
+                note(x)
+
+        lychee.logs.set_level('info')
+        layer()
+        assert ['3 failures: odd 0 (x1); odd 1 (x1); odd 2 (x1)'] == self.messages()
+        self.slot.reset_mock()
+        with self.log.debug('layer', summarize=True):
+            note(1)
+            note(7)
+        assert ['2 failures: odd 1 (x2)'] == self.messages()
+
+    def test_summarize_exception(self):
+        """
+        An exception in a quiet summarizing action is counted, and still raised.
+        """
+        lychee.logs.set_level('info')
+        with pytest.raises(RuntimeError):
+            with self.log.debug('layer', summarize=True):
+                raise RuntimeError()
+        assert ['1 failures: exception: RuntimeError (x1)'] == self.messages()
+
+    def test_unknown_level(self):
+        """
+        Only the levels of Lychee's actions may be set.
+        """
+        with pytest.raises(ValueError):
+            lychee.logs.set_level('warning')
+
+
+class TestStartQueue(object):
+    """
+    For :func:`start_queue` and :func:`stop_queue`.
+    """
+
+    def test_queued(self):
+        """
+        With a queue, messages are delivered by its sinks, and LOG_MESSAGE is not emitted.
+        """
+        slot = mock.MagicMock(spec=signalslot.slot.BaseSlot)
+        slot.is_alive = True
+        received = []
+        lychee.signals.LOG_MESSAGE.connect(slot)
+        try:
+            queue = lychee.logs.start_queue([received.extend])
+            assert queue is lychee.logs.LOG_QUEUE
+            with lychee.logs.INBOUND_LOG.info('queued action') as action:
+                action.failure('it failed')
+        finally:
+            lychee.logs.stop_queue()
+            lychee.signals.LOG_MESSAGE.disconnect(slot)
+        assert lychee.logs.LOG_QUEUE is None
+        assert ['it failed'] == [x['message'] for x in received]
+        assert not slot.called
+
+    def test_default_sink(self):
+        """
+        The default sink emits LOG_MESSAGE.
+        """
+        slot = mock.MagicMock(spec=signalslot.slot.BaseSlot)
+        slot.is_alive = True
+        lychee.signals.LOG_MESSAGE.connect(slot)
+        try:
+            lychee.logs.start_queue()
+            with lychee.logs.INBOUND_LOG.info('queued action') as action:
+                action.failure('it failed')
+            lychee.logs.LOG_QUEUE.flush()
+            slot.assert_called_once_with(level='INFO', logger='inbound', message='it failed',
+                                         status='failure', time=mock.ANY)
+        finally:
+            lychee.logs.stop_queue()
+            lychee.signals.LOG_MESSAGE.disconnect(slot)
@@ -35,14 +35,20 @@ Mercurial integration module for *Lychee*. This is a wrapper for :mod:`mercurial
 '''
 
 
+import os.path
+import re
 import time
 
+from lychee.document.cache import SIDECAR_DIR
 from lychee.logs import VCS_LOG as log
 from lychee.signals import vcs
 
 
 _SIGNALS = None  # NOTE: this is defined at the end of this module
 
+# the line in ".hgignore" so that Mercurial ignores the files in a SidecarCache directory
+_IGNORE_SIDECAR = '^{0}/'.format(re.escape(SIDECAR_DIR))
+
 
 def connect_signals():
     '''
@@ -64,9 +70,24 @@ def init_repo(session, **kwargs):
     '''
     Initialize a repository in the "repodir" directory.
 
-    This function currently does nothing.
+    Mercurial initializes the repository when the session creates its :class:`hug.Hug` instance, so
+    this function only makes sure that the repository's ``.hgignore`` file ignores the
+    :const:`~lychee.document.cache.SIDECAR_DIR` directory. If the line is added, the ``.hgignore``
+    file is also added to the repository, to be included in the next commit.
     '''
-    pass
+    pathname = os.path.join(session.hug.repo_dir, '.hgignore')
+    try:
+        with open(pathname) as hgignore:
+            contents = hgignore.read()
+    except IOError:
+        contents = ''
+
+    if _IGNORE_SIDECAR not in contents.splitlines():
+        with open(pathname, 'a') as hgignore:
+            if contents and not contents.endswith('\n'):
+                hgignore.write('\n')
+            hgignore.write(_IGNORE_SIDECAR + '\n')
+        session.hug.add([pathname])
 
 
 def add(pathnames, session, **kwargs):
@@ -29,7 +29,7 @@ Outbound views processing for MEI.
 from lychee import document
 
 
-def get_view(repo_dir, views_info, dtype):  # TODO: untested until T33
+def get_view(repo_dir, views_info, dtype, doc=None):  # TODO: untested until T33
     '''
     Do the outbound views processing for the provided document. In other words, this function lets
     you get a "view" on Lychee's document.
@@ -43,5 +43,6 @@ def get_view(repo_dir, views_info, dtype):  # TODO: untested until T33
     if not views_info.startswith('Sme-'):
         raise NotImplementedError('MEI outbound views can only process <section> elements so far.')
     else:
-        doc = document.Document(repo_dir)
+        if doc is None:
+            doc = document.Document(repo_dir, lazy=True)
         return views_info, doc.get_section(views_info)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               lychee/workflow/commit_queue.py
+# Purpose:                Batch VCS commits in a background thread.
+#
+# Copyright (C) 2017 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Batch VCS commits in a background thread.
+
+.. warning::
+    This module is intended for internal *Lychee* use only, so the API may change without notice.
+
+Without a :class:`CommitQueue`, every action that changes the document waits for the VCS to add
+and commit the files before running the outbound steps. With a :class:`CommitQueue`, the VCS step
+only records the pathnames, and a worker thread commits them later. The pathnames of several
+actions are combined into one commit when they arrive within ``delay`` seconds of the first, or
+until ``edits`` actions are waiting.
+
+Call :meth:`CommitQueue.flush` before anything that needs the VCS history to include every change,
+like checking out another revision.
+'''
+
+import threading
+import time
+
+from lychee.logs import VCS_LOG as log
+
+
+class CommitQueue(object):
+    '''
+    Run VCS commits for batches of changed pathnames in a worker thread.
+
+    The :attr:`lock` is held while the worker commits. Other threads that use the same VCS
+    repository object should hold it too, since Mercurial repository objects are not thread-safe.
+    The :attr:`commits` attribute counts the commits made.
+    '''
+
+    def __init__(self, commit, delay=None, edits=None, lock=None):
+        '''
+        :param commit: A function that takes a list of pathnames, then adds and commits them.
+        :param float delay: The number of seconds to wait after the first uncommitted change for
+            more changes. The default of ``None`` waits until ``edits`` changes are waiting.
+        :param int edits: The number of changes after which to commit without waiting. The default
+            of ``None`` waits for ``delay``. If both are ``None``, every change is committed as soon
+            as possible, but the actions still don't wait for it.
+        :param lock: The lock to hold while committing. The default is a new
+            :class:`threading.RLock`.
+        '''
+        self._commit = commit
+        self.delay = delay
+        self.edits = edits
+        self.lock = threading.RLock() if lock is None else lock
+        self.commits = 0
+
+        self._cond = threading.Condition(threading.Lock())
+        # pathnames waiting to be committed, in the order first submitted
+        self._pending = []
+        # time of the first uncommitted change
+        self._pending_since = None
+        # number of changes submitted, and number committed (or failed)
+        self._submitted = 0
+        self._done = 0
+        self._flushing = 0
+        self._closed = False
+        self._error = None
+
+        self._thread = threading.Thread(target=self._run, name='lychee-commit-queue')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, pathnames):
+        '''
+        Add the pathnames of one change to the next commit.
+
+        :param pathnames: The pathnames changed.
+        :type pathnames: list of str
+        '''
+        with self._cond:
+            for pathname in pathnames:
+                if pathname not in self._pending:
+                    self._pending.append(pathname)
+            if self._pending_since is None:
+                self._pending_since = time.time()
+            self._submitted += 1
+            self._cond.notify_all()
+
+    def flush(self):
+        '''
+        Wait until every change submitted before this call is committed.
+
+        :raises: The exception raised by the commit function, if a commit failed since the last
+            call to :meth:`flush`.
+        '''
+        with self._cond:
+            target = self._submitted
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while self._done < target and self._thread.is_alive():
+                    self._cond.wait()
+            finally:
+                self._flushing -= 1
+            error, self._error = self._error, None
+
+        if error is not None:
+            raise error
+
+    def close(self):
+        '''
+        Commit the waiting changes, then stop the worker thread.
+        '''
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    @property
+    def pending(self):
+        '''
+        The number of changes submitted but not yet committed.
+        '''
+        with self._cond:
+            return self._submitted - self._done
+
+    def _ready(self):
+        '''
+        Return the number of seconds until the pending changes should be committed, or ``0`` if
+        they should be committed now. Call this with the condition held.
+        '''
+        if self._closed or self._flushing:
+            return 0
+        if self.edits is not None and self._submitted - self._done >= self.edits:
+            return 0
+        if self.delay is None:
+            return None if self.edits is not None else 0
+        return max(0, self._pending_since + self.delay - time.time())
+
+    def _run(self):
+        '''
+        Commit batches of changes until the queue is closed.
+        '''
+        while True:
+            with self._cond:
+                while True:
+                    if self._submitted > self._done:
+                        wait = self._ready()
+                        if wait == 0:
+                            break
+                    elif self._closed:
+                        return
+                    else:
+                        wait = None
+                    self._cond.wait(wait)
+
+                pathnames = self._pending
+                target = self._submitted
+                self._pending = []
+                self._pending_since = None
+
+            error = None
+            try:
+                with self.lock:
+                    with log.info('commit {count} batched changes', count=target - self._done):
+                        self._commit(pathnames)
+                self.commits += 1
+            except Exception as exc:
+                error = exc
+
+            with self._cond:
+                self._done = target
+                if error is not None:
+                    self._error = error
+                self._cond.notify_all()
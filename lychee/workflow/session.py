@@ -26,10 +26,13 @@
 Manage a document editing session through several workflow actions.
 '''
 
+from multiprocessing.pool import ThreadPool
 import os
 import os.path
 import shutil
 import tempfile
+import threading
+import weakref
 
 from lxml import etree
 
@@ -42,6 +45,7 @@ from lychee import exceptions
 from lychee.logs import SESSION_LOG as log
 from lychee import signals
 from lychee.workflow import steps
+from lychee.workflow.commit_queue import CommitQueue
 
 
 _CANNOT_SAFELY_HG_INIT = 'Could not safely initialize the repository'
@@ -68,6 +72,36 @@ signals.vcs.ERROR.connect(_error_slot)
 signals.outbound.ERROR.connect(_error_slot)
 
 
+def _make_commit(session):
+    '''
+    Return a function for a :class:`~lychee.workflow.commit_queue.CommitQueue` that commits for
+    ``session``. The function holds a weak reference, so the session can still be garbage collected.
+    '''
+    session = weakref.ref(session)
+
+    def commit(pathnames):
+        "Commit ``pathnames`` if the session still exists."
+        the_session = session()
+        if the_session is not None:
+            steps._vcs_commit(the_session, pathnames)
+
+    return commit
+
+
+def _outbound_worker(args):
+    '''
+    Run :func:`~lychee.workflow.steps.do_outbound_steps` in a worker thread.
+
+    :param args: The ``repo_dir``, ``views_info``, ``dtype``, and ``doc`` arguments for
+        :func:`~lychee.workflow.steps.do_outbound_steps`.
+    :type args: 4-tuple
+    :returns: The outbound ``dtype`` and the dictionary returned by
+        :func:`~lychee.workflow.steps.do_outbound_steps`.
+    :rtype: 2-tuple of str and dict
+    '''
+    return args[2], steps.do_outbound_steps(*args)
+
+
 class InteractiveSession(object):
     '''
     Manage the Lychee-MEI :class:`~lychee.document.Document`, Mercurial repository, and
@@ -76,15 +110,45 @@ class InteractiveSession(object):
     Version control is disabled by default, and must be enabled with the ``vcs`` parameter. Do note
     that *most* documentation referring to the Lychee "repository" refers to the directory in which
     the music document is stored, whether or not the directory is a VCS repository.
+
+    Outbound conversions run one after another by default. Use the ``outbound_workers`` parameter to
+    run the outbound steps for all registered formats at once, in a pool of threads.
+
+    For very large documents, use the ``section_budget`` parameter to limit the memory held by the
+    ``<section>`` elements of the session's :class:`~lychee.document.Document` objects, and the
+    ``sidecar`` parameter to load them through a sidecar cache. The ``serialization`` parameter sets
+    how the document's files are written.
+
+    By default, each action waits for the VCS to commit its changes. Use the ``commit_delay`` or
+    ``commit_edits`` parameters to commit in a background thread instead, combining the changes of
+    several actions into one commit. Then the VCS history may not include the most recent changes
+    until :meth:`flush_vcs` is called; this happens automatically before checking out a revision and
+    when the repository directory is unset.
     '''
 
     def __init__(self, *args, **kwargs):
         '''
         :param str vcs: The VCS system to use. This is the string ``'mercurial'`` or ``None``.
+        :param int outbound_workers: The number of threads used to run outbound conversions. The
+            default of ``None`` runs outbound conversions sequentially, in the calling thread.
+        :param int section_budget: The maximum total size, in bytes, of ``<section>`` elements held
+            in memory by each :class:`~lychee.document.Document`. The default of ``None`` has no
+            limit.
+        :param str sidecar: How the :class:`~lychee.document.Document` validates its sidecar
+            cache: ``'mtime'``, ``'hash'``, or the default of ``None`` for no sidecar cache.
+        :param str serialization: The profile the :class:`~lychee.document.Document` uses to write
+            files: ``'pretty'`` (the default), ``'compact'``, or ``'c14n'``.
+        :param float commit_delay: When given, commit in the background, combining the changes made
+            within this many seconds of the first uncommitted change.
+        :param int commit_edits: When given, commit in the background, combining up to this many
+            changes in one commit.
         :raises: :exc:`lychee.exceptions.RepositoryError` when ``vcs`` is not valid.
         '''
         self._doc = None
         self._hug = None
+        self._commit_queue = None
+        # pathname -> SHA-1 of the file as last committed by this session
+        self._vcs_manifest = {}
         self._temp_dir = False
         self._repo_dir = None
         self._registrar = registrar.Registrar()
@@ -100,6 +164,9 @@ class InteractiveSession(object):
         self._inbound_converted = None
         self._inbound_views_info = None
 
+        # read-only Document shared by the outbound steps; see _get_outbound_snapshot()
+        self._outbound_snapshot = None
+
         # handle VCS enablement
         self._vcs = None
         if 'vcs' in kwargs and kwargs['vcs']:
@@ -108,6 +175,24 @@ class InteractiveSession(object):
             else:
                 raise exceptions.RepositoryError(_UNSUPPORTED_VCS)
 
+        # handle parallel outbound conversion
+        self._outbound_workers = None
+        if 'outbound_workers' in kwargs and kwargs['outbound_workers']:
+            self._outbound_workers = int(kwargs['outbound_workers'])
+
+        # memory budget for <section> elements
+        self._section_budget = None
+        if 'section_budget' in kwargs and kwargs['section_budget']:
+            self._section_budget = int(kwargs['section_budget'])
+        self._sidecar = kwargs.get('sidecar')
+        self._serialization = kwargs.get('serialization') or 'pretty'
+
+        # handle batched VCS commits
+        self._commit_delay = kwargs.get('commit_delay')
+        self._commit_edits = kwargs.get('commit_edits')
+        # held while using the "hug" object, which the CommitQueue may use from its own thread
+        self._hug_lock = threading.RLock()
+
     @property
     def hug(self):
         '''
@@ -115,6 +200,35 @@ class InteractiveSession(object):
         '''
         return self._hug
 
+    @property
+    def commit_queue(self):
+        '''
+        The :class:`~lychee.workflow.commit_queue.CommitQueue` for background VCS commits, or
+        ``None`` if each action commits its own changes.
+        '''
+        return self._commit_queue
+
+    @property
+    def vcs_manifest(self):
+        '''
+        A dictionary of the SHA-1 hash of each file, as it was when this session last committed it.
+        The VCS step uses it to skip files that have not changed since, and to skip the commit if
+        no file changed. This assumes this session makes all the commits in the repository; clear
+        the dictionary if that isn't true. It's cleared when an action updates the working copy to
+        another revision.
+        '''
+        return self._vcs_manifest
+
+    def flush_vcs(self):
+        '''
+        Wait until the VCS has committed every change made by previous actions. This does nothing
+        unless ``commit_delay`` or ``commit_edits`` was given when this session was created.
+
+        :raises: The exception raised by a background commit, if one failed.
+        '''
+        if self._commit_queue is not None:
+            self._commit_queue.flush()
+
     @property
     def vcs_enabled(self):
         '''
@@ -152,7 +266,8 @@ class InteractiveSession(object):
         if self._repo_dir is None:
             self.set_repo_dir('')
 
-        self._doc = document.Document(self._repo_dir)
+        self._doc = document.Document(self._repo_dir, section_budget=self._section_budget,
+                                      sidecar=self._sidecar, serialization=self._serialization)
         return self._doc
 
     @log.wrap('info', 'set the repository directory')
@@ -204,6 +319,9 @@ class InteractiveSession(object):
                 self._hug = hug.Hug(self._repo_dir, safe=True)
             except hg_error.RepoError:
                 raise exceptions.RepositoryError(_CANNOT_SAFELY_HG_INIT)
+            if self._commit_delay is not None or self._commit_edits is not None:
+                self._commit_queue = CommitQueue(_make_commit(self), self._commit_delay,
+                                                 self._commit_edits, lock=self._hug_lock)
 
         if run_outbound:
             self._run_outbound()
@@ -214,8 +332,12 @@ class InteractiveSession(object):
     def unset_repo_dir(self):
         '''
         Unset the repository directory, deleting the repository if it's in a temporary directory,
-        and do not set a new repository.
+        and do not set a new repository. Changes waiting for a background commit are committed first.
         '''
+        if self._commit_queue is not None:
+            self._commit_queue.close()
+            self._commit_queue = None
+
         if self._temp_dir and self._repo_dir:
             # If we don't check _repo_dir, and it's already None, then the call to rmtree() would
             # raise a TypeError.
@@ -225,6 +347,8 @@ class InteractiveSession(object):
         self._temp_dir = False
         self._hug = None
         self._doc = None
+        self._outbound_snapshot = None
+        self._vcs_manifest = {}
 
     def get_repo_dir(self):
         '''
@@ -258,7 +382,9 @@ class InteractiveSession(object):
         self._cleanup_for_new_action()
         initial_revision = None
         if self._vcs == 'mercurial' and 'revision' in kwargs:
-            initial_revision = self._hug.summary()['parent'].split(' ')[0]
+            self.flush_vcs()
+            with self._hug_lock:
+                initial_revision = self._hug.summary()['parent'].split(' ')[0]
 
         try:
             if 'dtype' in kwargs and 'doc' in kwargs:
@@ -275,8 +401,11 @@ class InteractiveSession(object):
                 if 'views_info' in kwargs:
                     self._inbound_views_info = kwargs['views_info']
                 if self._vcs == 'mercurial' and 'revision' in kwargs:
+                    # the files will no longer be as this session last committed them
+                    self._vcs_manifest.clear()
                     try:
-                        self._hug.update(kwargs['revision'])
+                        with self._hug_lock:
+                            self._hug.update(kwargs['revision'])
                     except RuntimeError:
                         # raised when the revision is invalid
                         action.failure(_UNKNOWN_REVISION)
@@ -287,7 +416,8 @@ class InteractiveSession(object):
         finally:
             self._cleanup_for_new_action()
             if initial_revision:
-                self._hug.update(initial_revision)
+                with self._hug_lock:
+                    self._hug.update(initial_revision)
 
     def _run_inbound_doc_vcs(self, dtype, doc, views_info):
         '''
@@ -323,32 +453,102 @@ class InteractiveSession(object):
             converted=self._inbound_converted,
             session=self,
             views_info=self._inbound_views_info)
+        self._outbound_snapshot = None
 
         steps.do_vcs(session=self, pathnames=document_pathnames)
 
     def _run_outbound(self):
         '''
         Run the outbound conversions.
+
+        If ``outbound_workers`` was given when this :class:`InteractiveSession` was created, and
+        more than one format is registered, the outbound steps for every format run at once in a
+        thread pool. The :const:`~lychee.signals.outbound.CONVERSION_FINISHED` signal is always
+        emitted from the calling thread, once for each format, in the order the conversions finish.
         '''
         changeset = ''
+        revision = ''
         if self._vcs == 'mercurial':
-            summary = self._hug.summary()
+            with self._hug_lock:
+                summary = self._hug.summary()
+            revision = summary.get('parent', '')
             if 'tag' in summary:
                 changeset = summary['tag']
             else:
                 changeset = summary['parent']
 
         signals.outbound.STARTED.emit()
-        for outbound_dtype in self._registrar.get_registered_formats():
-            post = steps.do_outbound_steps(
-                self.get_repo_dir(),
-                self._inbound_views_info,  # might be None, but that's okay
-                outbound_dtype)
-            signals.outbound.CONVERSION_FINISHED.emit(
-                dtype=outbound_dtype,
-                placement=post['placement'],
-                document=post['document'],
-                changeset=changeset)
+        outbound_dtypes = self._registrar.get_registered_formats()
+        if len(outbound_dtypes) == 0:
+            return
+
+        snapshot = self._get_outbound_snapshot(revision)
+
+        if self._outbound_workers and len(outbound_dtypes) > 1:
+            repo_dir = self.get_repo_dir()
+            pool = ThreadPool(min(self._outbound_workers, len(outbound_dtypes)))
+            try:
+                jobs = [(repo_dir, self._inbound_views_info, dtype, snapshot)
+                        for dtype in outbound_dtypes]
+                for outbound_dtype, post in pool.imap_unordered(_outbound_worker, jobs):
+                    signals.outbound.CONVERSION_FINISHED.emit(
+                        dtype=outbound_dtype,
+                        placement=post['placement'],
+                        document=post['document'],
+                        changeset=changeset)
+            finally:
+                pool.close()
+                pool.join()
+
+        else:
+            for outbound_dtype in outbound_dtypes:
+                post = steps.do_outbound_steps(
+                    self.get_repo_dir(),
+                    self._inbound_views_info,  # might be None, but that's okay
+                    outbound_dtype,
+                    snapshot)
+                signals.outbound.CONVERSION_FINISHED.emit(
+                    dtype=outbound_dtype,
+                    placement=post['placement'],
+                    document=post['document'],
+                    changeset=changeset)
+
+    def _get_outbound_snapshot(self, revision):
+        '''
+        Return the read-only :class:`~lychee.document.DocumentSnapshot` shared by the outbound
+        steps, loading a new one only if the repository changed since the last call.
+
+        :param str revision: The current VCS revision, or an empty string if the VCS is disabled.
+        :returns: The snapshot, or ``None`` if the document could not be loaded. In that case each
+            outbound step loads the document itself, and reports the error as it always did.
+        :rtype: :class:`lychee.document.DocumentSnapshot` or ``None``
+
+        The snapshot is invalidated when the document step saves the document, when the VCS
+        revision changes, and when the "all_files.mei" file is modified by anything else.
+        '''
+        repo_dir = self.get_repo_dir()
+        all_files_path = os.path.join(repo_dir, 'all_files.mei')
+
+        def make_key():
+            "Identify the state of the repository."
+            if os.path.exists(all_files_path):
+                all_files_stat = os.stat(all_files_path)
+                return (revision, all_files_stat.st_mtime, all_files_stat.st_size)
+            else:
+                return (revision, None, None)
+
+        if self._outbound_snapshot is None or self._outbound_snapshot.key != make_key():
+            try:
+                self._outbound_snapshot = document.DocumentSnapshot(
+                    repo_dir, section_budget=self._section_budget, sidecar=self._sidecar,
+                    serialization=self._serialization)
+            except exceptions.DocumentError:
+                self._outbound_snapshot = None
+            else:
+                # NB: loading an empty repository writes "all_files.mei" so get the key afterward
+                self._outbound_snapshot.key = make_key()
+
+        return self._outbound_snapshot
 
     def _cleanup_for_new_action(self):
         '''
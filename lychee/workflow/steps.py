@@ -44,13 +44,16 @@ views/conversion steps. The views/conversion steps themselves are likely to happ
 possibly simultaneously, depending on which outbound formats are registered.
 '''
 
+import hashlib
+
 from lxml import etree
 
 from lychee import converters
 from lychee import document
+from lychee.document import diff
 from lychee import exceptions
 from lychee.logs import SESSION_LOG as log
-from lychee.namespaces import mei
+from lychee.namespaces import mei, xml
 from lychee import signals
 from lychee.views import inbound as views_in
 from lychee.views import outbound as views_out
@@ -114,6 +117,8 @@ def do_inbound_views(session, dtype, document, converted, views_info):
     :type converted: :class:`lxml.etree.Element`
     :param str views_info: The ``views_info`` argument from the :const:`~lychee.signals.ACTION_START`
         signal. This is interpreted as the Lychee-MEI @xml:id that should be used for ``converted``.
+        If it's ``None`` and the active score has one ``<section>``, that section's @xml:id is used,
+        so the "document" step changes that section rather than adding a new one.
 
     This function chooses an inbound views-processor then runs it. Resulting data is emitted from
     the processor with the :const:`~lychee.signals.inbound.VIEWS_FINISH` signal and not returned
@@ -123,6 +128,8 @@ def do_inbound_views(session, dtype, document, converted, views_info):
     '''
     try:
         _choose_inbound_views(dtype)
+        if views_info is None:
+            views_info = _single_section_id(session)
         signals.inbound.VIEWS_START.emit(
             document=document, converted=converted, session=session, views_info=views_info
         )
@@ -146,21 +153,56 @@ def do_document(session, converted, views_info):
     :type session: :class:`lychee.workflow.session.InteractiveSession`
     :param converted:
     :param views_info:
-    :returns: A list of the pathnames in this Lychee-MEI document.
-    :rtype: list of str
-
-    .. note:: This function is only partially implemented. At the moment, it simply replaces the
-        active score with a new one containing only the just-converted ``<section>``.
+    :returns: A list of the pathnames in this Lychee-MEI document. Its ``changed`` attribute holds
+        the pathnames of the files that were written.
+    :rtype: :class:`lychee.document.SavedPathnames`
+
+    When the active score has one ``<section>``, and ``converted`` has the same @xml:id or none, the
+    stored ``<section>`` is changed in place with :func:`lychee.document.diff.merge`. It keeps its
+    @xml:id, and so do the descendants aligned with a converted element, even though the inbound
+    views step gave those new ones, so it's saved to the same file, and only if something changed.
+    Otherwise the active score is replaced with one containing only ``converted``.
     '''
-    score = etree.Element(mei.SCORE)
-    score.append(converted)
     doc = session.get_document()
-    doc.put_score(score)
+    stored = _stored_section(doc, converted)
+
+    if stored is None:
+        score = etree.Element(mei.SCORE)
+        score.append(converted)
+        doc.put_score(score)
+    elif diff.merge(stored, converted):
+        doc.put_section(stored)
+
     document_pathnames = doc.save_everything()
 
     return document_pathnames
 
 
+def _single_section_id(session):
+    '''
+    Return the @xml:id of the only ``<section>`` in the active score, or ``None`` if it has another
+    number of sections.
+    '''
+    score_order = session.get_document().get_section_ids()
+    return score_order[0] if len(score_order) == 1 else None
+
+
+def _stored_section(doc, converted):
+    '''
+    Find the stored ``<section>`` that the "document" step should merge "converted" into.
+
+    :returns: The ``<section>``, or ``None`` if the active score should be replaced.
+    :rtype: :class:`lxml.etree.Element`
+    '''
+    score_order = doc.get_section_ids()
+    if len(score_order) != 1 or converted.get(xml.ID) not in (None, score_order[0]):
+        return None
+    try:
+        return doc.get_section(score_order[0])
+    except exceptions.SectionNotFoundError:
+        return None
+
+
 @log.wrap('info', 'run the "VCS" step')
 def do_vcs(session, pathnames):
     '''
@@ -170,12 +212,15 @@ def do_vcs(session, pathnames):
     :type session: :class:`lychee.workflow.session.InteractiveSession`
     :param pathnames: A list of the pathnames in this Lychee-MEI document (as returned by
         :func:`do_document`).
-    :type pathnames: list of str
+    :type pathnames: list of str or :class:`~lychee.document.SavedPathnames`
     :returns: ``None``
 
     If the VCS step is disabled in the :class:`Session` instance given as ``session``, then the
-    VCS step is skipped.
+    VCS step is skipped. If ``pathnames`` is a :class:`~lychee.document.SavedPathnames`,
+    only the files that were written are given to the VCS.
     '''
+    if isinstance(pathnames, document.SavedPathnames):
+        pathnames = pathnames.changed
     if session.vcs_enabled:
         signals.vcs.START.emit(session=session, pathnames=pathnames)
     else:
@@ -184,7 +229,7 @@ def do_vcs(session, pathnames):
 
 
 @log.wrap('info', 'run the "outbound" steps')
-def do_outbound_steps(repo_dir, views_info, dtype):
+def do_outbound_steps(repo_dir, views_info, dtype, doc=None):
     '''
     Run the outbound veiws and conversion steps for a single outbound "dtype."
 
@@ -194,6 +239,9 @@ def do_outbound_steps(repo_dir, views_info, dtype):
     :type views_info: str
     :param str dtype: The data type to use for outbound conversion, as specified in
         :const:`lychee.converters.OUTBOUND_CONVERTERS`.
+    :param doc: An optional read-only snapshot of the document in ``repo_dir``, shared by all the
+        outbound formats of an action. If omitted, the document is loaded from ``repo_dir``.
+    :type doc: :class:`lychee.document.DocumentSnapshot`
     :returns: Post-conversion data as described below.
     :rtype: dict
     :raises: :exc:`lychee.exceptions.InvalidDataTypeError` when there is no module available for
@@ -219,15 +267,19 @@ def do_outbound_steps(repo_dir, views_info, dtype):
 
     if dtype in ('document', 'vcs'):
         # these dtypes don't have real "views" information, so we'll do them early
-        converted = converters.OUTBOUND_CONVERTERS[dtype](repo_dir)
+        if dtype == 'document' and doc is not None:
+            converted = converters.OUTBOUND_CONVERTERS[dtype](repo_dir, doc=doc)
+        else:
+            converted = converters.OUTBOUND_CONVERTERS[dtype](repo_dir)
         return {'dtype': dtype, 'document': converted, 'placement': None}
 
     elif dtype in converters.OUTBOUND_CONVERTERS:
-        doc = document.Document(repo_dir)
+        if doc is None:
+            doc = document.Document(repo_dir, lazy=True)
         if len(doc.get_section_ids()) == 0:
             raise exceptions.SectionNotFoundError(_SCORE_IS_EMPTY)
 
-        from_views = _do_outbound_views(repo_dir, views_info, dtype)
+        from_views = _do_outbound_views(repo_dir, views_info, dtype, doc)
         converted = converters.OUTBOUND_CONVERTERS[dtype](from_views['convert'])
         return {'dtype': dtype, 'document': converted, 'placement': from_views['placement']}
 
@@ -239,11 +291,57 @@ def _vcs_driver(session, pathnames, **kwargs):
     '''
     Slot for vcs.START that actually runs the "VCS step," and will only be called when the VCS
     system is enabled.
+
+    If the session has a :class:`~lychee.workflow.commit_queue.CommitQueue`, the pathnames are
+    given to the queue, which commits them later with :func:`_vcs_commit`. If there are no
+    pathnames, nothing is done.
+    '''
+    if not pathnames:
+        return
+
+    queue = getattr(session, 'commit_queue', None)
+    if queue is None:
+        _vcs_commit(session, pathnames)
+    else:
+        queue.submit(pathnames)
+
+
+def _content_hash(pathname):
     '''
+    Return the SHA-1 hash of a file, or ``None`` if it cannot be read.
+    '''
+    try:
+        with open(pathname, 'rb') as the_file:
+            return hashlib.sha1(the_file.read()).hexdigest()
+    except (IOError, OSError):
+        return None
+
+
+def _vcs_commit(session, pathnames):
+    '''
+    Emit the signals to add and commit ``pathnames`` in the VCS.
+
+    If the session has a :attr:`~lychee.workflow.session.InteractiveSession.vcs_manifest`, files
+    with the same content as when this function last committed them are not given to the VCS, and
+    if no files are left, the signals are not emitted.
+    '''
+    manifest = getattr(session, 'vcs_manifest', None)
+    if manifest is not None:
+        hashes = {pathname: _content_hash(pathname) for pathname in pathnames}
+        pathnames = [pathname for pathname in pathnames
+                     if hashes[pathname] is None or manifest.get(pathname) != hashes[pathname]]
+        if not pathnames:
+            return
+
     signals.vcs.INIT.emit(session=session)
     signals.vcs.ADD.emit(pathnames=pathnames, session=session)
     signals.vcs.COMMIT.emit(message=None, session=session)
 
+    if manifest is not None:
+        for pathname in pathnames:
+            if hashes[pathname] is not None:
+                manifest[pathname] = hashes[pathname]
+
 
 @log.wrap('debug', 'choose inbound converter format')
 def _choose_inbound_converter(dtype):
@@ -304,7 +402,7 @@ def flush_inbound_views():
 
 
 @log.wrap('info', 'run the "outbound views" step')
-def _do_outbound_views(repo_dir, views_info, dtype):
+def _do_outbound_views(repo_dir, views_info, dtype, doc=None):
     '''
     Private helper function for :func:`do_outbound_steps`.
 
@@ -319,10 +417,11 @@ def _do_outbound_views(repo_dir, views_info, dtype):
         'mei': views_out.mei.get_view,
         'lilypond': views_out.mei.get_view,
         'verovio': views_out.mei.get_view,
+        'verovio-stream': views_out.mei.get_view,
     }
 
     if dtype in views_dict:
-        placement, convert = views_dict[dtype](repo_dir, views_info, dtype)
+        placement, convert = views_dict[dtype](repo_dir, views_info, dtype, doc=doc)
     else:
         raise exceptions.ViewsError(_NO_OUTBOUND_VIEWS.format(dtype))
 
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------------------------------------
+# Program Name:           Lychee
+# Program Description:    MEI document manager for formalized document control
+#
+# Filename:               lychee/workflow/tests/test_commit_queue.py
+# Purpose:                Tests for the "lychee.workflow.commit_queue" module.
+#
+# Copyright (C) 2017 Christopher Antila
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program.  If not, see <http://www.gnu.org/licenses/>.
+#--------------------------------------------------------------------------------------------------
+'''
+Tests for the :mod:`lychee.workflow.commit_queue` module.
+'''
+
+import os.path
+import threading
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from mercurial import hg, ui
+import pytest
+
+from lychee.vcs import hg as vcs_hg_module
+from lychee.workflow import session, steps
+from lychee.workflow.commit_queue import CommitQueue
+
+
+class TestCommitQueue(object):
+    '''
+    Tests for CommitQueue.
+    '''
+
+    def setup_method(self):
+        '''
+        Make a commit function that records its calls.
+        '''
+        self.committed = []
+        self.commit = lambda pathnames: self.committed.append(pathnames)
+        self.queue = None
+
+    def teardown_method(self):
+        '''
+        Stop the queue.
+        '''
+        if self.queue is not None:
+            self.queue.close()
+
+    def test_edits(self):
+        '''
+        Changes are combined until "edits" are waiting, without duplicate pathnames.
+        '''
+        self.queue = CommitQueue(self.commit, edits=3)
+        self.queue.submit(['a', 'b'])
+        self.queue.submit(['b'])
+        assert [] == self.committed
+        self.queue.submit(['c'])
+        self.queue.flush()
+        assert [['a', 'b', 'c']] == self.committed
+        assert 0 == self.queue.pending
+
+    def test_delay(self):
+        '''
+        Changes are committed after "delay" seconds, without waiting for flush().
+        '''
+        done = threading.Event()
+        self.queue = CommitQueue(lambda pathnames: done.set(), delay=0.01)
+        self.queue.submit(['a'])
+        assert done.wait(5)
+
+    def test_flush(self):
+        '''
+        flush() commits the waiting changes without waiting for the delay.
+        '''
+        self.queue = CommitQueue(self.commit, delay=3600)
+        self.queue.submit(['a'])
+        self.queue.flush()
+        assert [['a']] == self.committed
+        self.queue.flush()
+        assert 1 == self.queue.commits
+
+    def test_error(self):
+        '''
+        An exception from the commit function is raised by the next flush().
+        '''
+        self.queue = CommitQueue(mock.Mock(side_effect=RuntimeError('lol')), edits=1)
+        self.queue.submit(['a'])
+        with pytest.raises(RuntimeError):
+            self.queue.flush()
+        self.queue.flush()
+
+    def test_close(self):
+        '''
+        close() commits the waiting changes and stops the thread.
+        '''
+        queue = CommitQueue(self.commit, delay=3600)
+        queue.submit(['a'])
+        queue.close()
+        assert [['a']] == self.committed
+        assert not queue._thread.is_alive()
+
+
+class TestSessionCommitQueue(object):
+    '''
+    Tests for background commits in an InteractiveSession.
+    '''
+
+    def setup_method(self):
+        '''
+        Make a session with background commits.
+        '''
+        vcs_hg_module.connect_signals()
+        self.session = session.InteractiveSession(vcs='mercurial', commit_edits=2)
+        self.repo_dir = self.session.set_repo_dir('')
+
+    def teardown_method(self):
+        '''
+        Clean up the session.
+        '''
+        self.session.unset_repo_dir()
+
+    def write(self, name):
+        '''
+        Write a file in the repository and return its pathname.
+        '''
+        pathname = os.path.join(self.repo_dir, name)
+        with open(pathname, 'w') as the_file:
+            the_file.write(name)
+        return pathname
+
+    def count_commits(self):
+        '''
+        Return the number of changesets in the repository.
+        '''
+        return len(hg.repository(ui.ui(), self.repo_dir))
+
+    def test_batched(self):
+        '''
+        The VCS step submits to the queue, and flush_vcs() makes one commit for the batch.
+        '''
+        assert self.session.commit_queue is not None
+        steps._vcs_driver(self.session, [self.write('one.mei')])
+        assert 1 == self.session.commit_queue.pending
+        steps._vcs_driver(self.session, [self.write('two.mei')])
+        self.session.flush_vcs()
+        assert 1 == self.count_commits()
+
+    def test_ignore_sidecar_dir(self):
+        '''
+        The first commit adds an ".hgignore" file so the sidecar cache directory isn't tracked.
+        '''
+        os.mkdir(os.path.join(self.repo_dir, '.lychee-cache'))
+        self.write(os.path.join('.lychee-cache', 'one.mei.xml'))
+        steps._vcs_driver(self.session, [self.write('one.mei')])
+        steps._vcs_driver(self.session, [self.write('two.mei')])
+        self.session.flush_vcs()
+
+        repo = hg.repository(ui.ui(), self.repo_dir)
+        assert ['.hgignore', 'one.mei', 'two.mei'] == sorted(repo['tip'].files())
+        status = repo.status(unknown=True, ignored=True)
+        assert [] == status.unknown
+        assert ['.lychee-cache/one.mei.xml'] == status.ignored
+
+    def test_unset_repo_dir(self):
+        '''
+        Unsetting the repository directory commits the waiting changes.
+        '''
+        self.session._temp_dir = False
+        try:
+            steps._vcs_driver(self.session, [self.write('one.mei')])
+            self.session.unset_repo_dir()
+            assert self.session.commit_queue is None
+            assert 1 == self.count_commits()
+        finally:
+            self.session._temp_dir = True
+            self.session._repo_dir = self.repo_dir
+            self.session.unset_repo_dir()
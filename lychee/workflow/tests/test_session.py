@@ -30,6 +30,7 @@ import os.path
 import shutil
 import sys
 import tempfile
+import threading
 import unittest
 
 try:
@@ -43,8 +44,11 @@ import pytest
 import signalslot
 
 from lychee.converters import registrar
+from lychee.document import document
 from lychee import exceptions
+from lychee.namespaces import mei, xml
 from lychee import signals
+from lychee.vcs import hg as vcs_hg_module
 from lychee.workflow import session
 from lychee.workflow import steps
 
@@ -111,6 +115,14 @@ class TestGeneral(TestInteractiveSession):
             session.InteractiveSession(vcs='git')
         # TODO: check the err
 
+    def test_init_with_outbound_workers(self):
+        '''
+        The __init__() method sets the "outbound_workers" appropriately.
+        '''
+        assert self.session._outbound_workers is None
+        actual = session.InteractiveSession(outbound_workers='4')
+        assert actual._outbound_workers == 4
+
     @mock.patch('lychee.workflow.session.steps.flush_inbound_converters')
     @mock.patch('lychee.workflow.session.steps.flush_inbound_views')
     def test_cleanup_for_new_action(self, mock_flush_views, mock_flush_conv):
@@ -471,6 +483,28 @@ class TestActionStart(TestInteractiveSession):
         # the tag name (the "tip" part) should be removed
         self.session._hug.update.assert_called_with(parent_revision[:-4])  # final call
 
+    def test_hg_update_clears_manifest(self):
+        '''
+        Updating to another revision clears the "vcs_manifest," so the next VCS step doesn't skip
+        files that were changed by the update.
+        '''
+        vcs_hg_module.connect_signals()
+        self.session = session.InteractiveSession(vcs='mercurial')
+        repo_dir = self.session.set_repo_dir('')
+        pathname = os.path.join(repo_dir, 'section.mei')
+        for contents in ('<section n="1"/>', '<section n="2"/>'):
+            with open(pathname, 'w') as the_file:
+                the_file.write(contents)
+            steps._vcs_commit(self.session, [pathname])
+        assert '1:' in self.session.hug.summary()['parent']
+        assert [pathname] == list(self.session.vcs_manifest)
+        self.session._run_outbound = mock.Mock()
+
+        self.session._action_start(revision='0')
+
+        self.session._run_outbound.assert_called_with()
+        assert {} == self.session.vcs_manifest
+
     def test_when_hg_update_fails(self):
         '''
         A unit test (fully mocked) for when running Hug.update() fails.
@@ -580,7 +614,8 @@ class TestRunOutbound(TestInteractiveSession):
         mock_do_out.assert_called_once_with(
             self.session.get_repo_dir(),
             views_info,
-            outbound_dtype)
+            outbound_dtype,
+            self.session._outbound_snapshot)
         mock_out_finished.emit.assert_called_once_with(
             dtype=outbound_dtype,
             placement=mock_do_out.return_value['placement'],
@@ -641,7 +676,8 @@ class TestRunOutbound(TestInteractiveSession):
         mock_do_out.assert_called_once_with(
             self.session.get_repo_dir(),
             views_info,
-            outbound_dtype)
+            outbound_dtype,
+            self.session._outbound_snapshot)
         mock_out_finished.emit.assert_called_once_with(
             dtype=outbound_dtype,
             placement=mock_do_out.return_value['placement'],
@@ -649,6 +685,127 @@ class TestRunOutbound(TestInteractiveSession):
             changeset='')
 
 
+class TestRunOutboundParallel(TestInteractiveSession):
+    '''
+    Tests for InteractiveSession._run_outbound() with the "outbound_workers" thread pool.
+    '''
+
+    def setUp(self):
+        "Make an InteractiveSession that runs outbound conversions in three threads."
+        self.session = session.InteractiveSession(outbound_workers=3)
+
+    @mock.patch('lychee.workflow.steps.do_outbound_steps')
+    @mock.patch('lychee.signals.outbound.CONVERSION_FINISHED')
+    @mock.patch('lychee.signals.outbound.STARTED')
+    def test_three_formats_parallel(self, mock_out_started, mock_out_finished, mock_do_out):
+        '''
+        Three formats are registered for outbound conversion, which runs in a thread pool.
+        '''
+        threads = threading.active_count()
+        outbound_dtypes = ['document', 'mei', 'vcs']
+        views_info = 'IBV'
+        self.session._inbound_views_info = views_info
+        mock_do_out.side_effect = lambda repo_dir, views_info, dtype, doc: {
+            'placement': views_info,
+            'document': dtype,
+        }
+
+        for dtype in outbound_dtypes:
+            signals.outbound.REGISTER_FORMAT.emit(dtype=dtype, who='test_three_formats_parallel')
+        try:
+            self.session._run_outbound()
+        finally:
+            for dtype in outbound_dtypes:
+                signals.outbound.UNREGISTER_FORMAT.emit(dtype=dtype, who='test_three_formats_parallel')
+
+        mock_out_started.emit.assert_called_once_with()
+        assert threading.active_count() == threads
+        assert mock_do_out.call_count == 3
+        assert mock_out_finished.emit.call_count == 3
+        for dtype in outbound_dtypes:
+            mock_do_out.assert_any_call(
+                self.session.get_repo_dir(),
+                views_info,
+                dtype,
+                self.session._outbound_snapshot)
+            mock_out_finished.emit.assert_any_call(
+                dtype=dtype,
+                placement=views_info,
+                document=dtype,
+                changeset='')
+
+    @mock.patch('lychee.workflow.steps.do_outbound_steps')
+    @mock.patch('lychee.signals.outbound.CONVERSION_FINISHED')
+    @mock.patch('lychee.signals.outbound.STARTED')
+    def test_parallel_error(self, mock_out_started, mock_out_finished, mock_do_out):
+        '''
+        An exception raised by an outbound step in a worker thread reaches the caller.
+        '''
+        threads = threading.active_count()
+        outbound_dtypes = ['document', 'vcs']
+        mock_do_out.side_effect = exceptions.SectionNotFoundError
+
+        for dtype in outbound_dtypes:
+            signals.outbound.REGISTER_FORMAT.emit(dtype=dtype, who='test_parallel_error')
+        try:
+            with pytest.raises(exceptions.SectionNotFoundError):
+                self.session._run_outbound()
+        finally:
+            for dtype in outbound_dtypes:
+                signals.outbound.UNREGISTER_FORMAT.emit(dtype=dtype, who='test_parallel_error')
+
+        assert threading.active_count() == threads
+        assert mock_out_finished.emit.call_count == 0
+
+
+class TestOutboundSnapshot(TestInteractiveSession):
+    '''
+    Tests for InteractiveSession._get_outbound_snapshot().
+    '''
+
+    def test_reused(self):
+        '''
+        The same snapshot is returned while the repository doesn't change.
+        '''
+        first = self.session._get_outbound_snapshot('')
+        second = self.session._get_outbound_snapshot('')
+        assert isinstance(first, document.DocumentSnapshot)
+        assert first is second
+
+    def test_new_revision(self):
+        '''
+        A new snapshot is made when the VCS revision changes.
+        '''
+        first = self.session._get_outbound_snapshot('1:b62a4c54b0a0')
+        second = self.session._get_outbound_snapshot('2:69a1ba0a9a10')
+        assert first is not second
+        assert second is self.session._get_outbound_snapshot('2:69a1ba0a9a10')
+
+    def test_document_saved(self):
+        '''
+        A new snapshot is made after the document is saved.
+        '''
+        first = self.session._get_outbound_snapshot('')
+        score = etree.Element(mei.SCORE)
+        etree.SubElement(score, mei.SECTION)
+        doc = self.session.get_document()
+        doc.put_score(score)
+        doc.save_everything()
+
+        second = self.session._get_outbound_snapshot('')
+
+        assert first is not second
+        assert doc.get_section_ids() == second.get_section_ids()
+
+    @mock.patch('lychee.workflow.session.document.DocumentSnapshot')
+    def test_cannot_load(self, mock_snapshot):
+        '''
+        When the document can't be loaded, there is no snapshot.
+        '''
+        mock_snapshot.side_effect = exceptions.HeaderNotFoundError
+        assert self.session._get_outbound_snapshot('') is None
+
+
 class TestRunInboundDocVcs(TestInteractiveSession):
     '''
     Tests for _run_inbound_doc_vcs(), a helper method for _action_start().
@@ -785,3 +942,31 @@ class TestRunInboundDocVcs(TestInteractiveSession):
             session=self.session,
             views_info=self.session._inbound_views_info)
         mock_vcs.assert_called_once_with(session=self.session, pathnames=mock_doc.return_value)
+
+    def test_run_inbound_twice(self):
+        '''
+        Integration test for _run_inbound_doc_vcs().
+
+        Two changes to a score with one <section> change that section in place, so there is only
+        one section file, and the staves and measures keep their @xml:id.
+        '''
+        score = '''\\score { << \\new Staff { \\clef "treble" \\time 2/4 c'4 d'4 | e'4 f'4 | }
+            \\new Staff { \\clef "bass" \\time 2/4 c4 d4 | e4 f4 | } >> }'''
+        self.session = session.InteractiveSession(vcs='mercurial')
+        repo_dir = self.session.set_repo_dir('')
+
+        self.session._run_inbound_doc_vcs('LilyPond', score, None)
+        section_id = self.session._inbound_views_info
+        section = self.session.get_document().get_section(section_id)
+        staff_ids = [x.get(xml.ID) for x in section.iter(mei.STAFF, mei.MEASURE)]
+
+        self.session._inbound_converted = None
+        self.session._inbound_views_info = None
+        self.session._run_inbound_doc_vcs('LilyPond', score.replace("e'4", "g'4"), None)
+
+        assert section_id == self.session._inbound_views_info
+        sections = [x for x in os.listdir(repo_dir) if x.startswith('Sme-s-m-l-e')]
+        assert ['{}.mei'.format(section_id)] == sections
+        section = self.session.get_document().get_section(section_id)
+        assert staff_ids == [x.get(xml.ID) for x in section.iter(mei.STAFF, mei.MEASURE)]
+        assert ['c', 'd', 'g', 'f'] == [x.get('pname') for x in section.find(mei.STAFF).iter(mei.NOTE)]
@@ -104,6 +104,36 @@ class TestDocumentStep(TestInteractiveSession):
         assert [xmlid] == doc.get_section_ids(all_sections=True)
         assert os.path.exists(section_pathname)
 
+    def test_document_2(self):
+        '''
+        That do_document() merges a converted <section> into the one already in the active score,
+        which keeps its @xml:id, and is only saved when it changed.
+        '''
+        def convert(pname):
+            section = etree.Element(mei.SECTION)
+            staff = etree.SubElement(section, mei.STAFF, n='1')
+            layer = etree.SubElement(staff, mei.LAYER, n='1')
+            etree.SubElement(layer, mei.NOTE, pname='c')
+            etree.SubElement(layer, mei.NOTE, pname=pname)
+            return section
+
+        first = convert('d')
+        first[0].set(xml.ID, 'St1')
+        steps.do_document(self.session, first, 'views info')
+        doc = self.session.get_document()
+        xmlid = doc.get_section_ids()[0]
+        section_pathname = os.path.join(self.session.get_repo_dir(), '{}.mei'.format(xmlid))
+
+        pathnames = steps.do_document(self.session, convert('d'), 'views info')
+        assert [] == pathnames.changed
+
+        pathnames = steps.do_document(self.session, convert('e'), 'views info')
+        assert [section_pathname] == pathnames.changed
+        assert [xmlid] == doc.get_section_ids(all_sections=True)
+        section = doc.get_section(xmlid)
+        assert 'St1' == section[0].get(xml.ID)
+        assert ['c', 'e'] == [x.get('pname') for x in section.iter(mei.NOTE)]
+
 
 class TestVCSStep(TestInteractiveSession):
     '''
@@ -143,6 +173,21 @@ class TestVCSStep(TestInteractiveSession):
         start_slot.assert_called_with(session=self.session, pathnames=['pathnames'])
         finished_slot.assert_called_with()
 
+    def test_do_vcs_3(self):
+        '''
+        That do_vcs() only gives changed files to the VCS when it gets a SavedPathnames.
+        '''
+        start_slot = make_slot_mock()
+        signals.vcs.START.connect(start_slot)
+        pathnames = document.SavedPathnames(changed=['changed'], unchanged=['unchanged'])
+
+        try:
+            steps.do_vcs(self.session, pathnames)
+        finally:
+            signals.vcs.START.disconnect(start_slot)
+
+        start_slot.assert_called_with(session=self.session, pathnames=['changed'])
+
     def test_do_vcs_2(self):
         '''
         That do_vcs() works when the VCS is disabled.
@@ -191,6 +236,45 @@ class TestVCSStep(TestInteractiveSession):
         add_slot.assert_called_with(pathnames='names', session='sess')
         commit_slot.assert_called_with(message=None, session='sess')
 
+    def test_vcs_driver_2(self):
+        '''
+        That _vcs_driver() does nothing without pathnames.
+        '''
+        init_slot = make_slot_mock()
+        signals.vcs.INIT.connect(init_slot)
+        try:
+            steps._vcs_driver(session=self.session, pathnames=[])
+        finally:
+            signals.vcs.INIT.disconnect(init_slot)
+        assert 0 == init_slot.call_count
+
+    def test_vcs_commit_manifest(self):
+        '''
+        That _vcs_commit() only gives files to the VCS if they changed since last committed, and
+        emits nothing if none changed.
+        '''
+        repo_dir = self.session.get_repo_dir()
+        one = os.path.join(repo_dir, 'one.mei')
+        two = os.path.join(repo_dir, 'two.mei')
+        for pathname in (one, two):
+            with open(pathname, 'w') as the_file:
+                the_file.write('first')
+        add_slot = make_slot_mock()
+        signals.vcs.ADD.connect(add_slot)
+
+        try:
+            steps._vcs_commit(self.session, [one, two])
+            steps._vcs_commit(self.session, [one, two])
+            assert 1 == add_slot.call_count
+            with open(two, 'w') as the_file:
+                the_file.write('second')
+            steps._vcs_commit(self.session, [one, two])
+        finally:
+            signals.vcs.ADD.disconnect(add_slot)
+
+        assert 2 == add_slot.call_count
+        add_slot.assert_called_with(pathnames=[two], session=self.session)
+
 
 class TestInboundConversionStep(TestInteractiveSession):
     '''
@@ -454,6 +538,45 @@ class TestOutboundSteps(object):
         vcs_mock.assert_called_once_with(repo_dir)
         assert expected == actual
 
+    def test_noviews_converters_with_doc(self):
+        '''
+        The "document" converter receives the shared Document, if there is one.
+        '''
+        dtype = 'document'
+        repo_dir = 'dirrrrr!'
+        doc = 'the snapshot'
+        doc_mock = mock.MagicMock()
+        doc_mock.return_value = 'docs4u.org'
+
+        orig_doc = converters.OUTBOUND_CONVERTERS[dtype]
+        converters.OUTBOUND_CONVERTERS[dtype] = doc_mock
+        try:
+            actual = steps.do_outbound_steps(repo_dir, 'views', dtype, doc)
+        finally:
+            converters.OUTBOUND_CONVERTERS[dtype] = orig_doc
+
+        doc_mock.assert_called_once_with(repo_dir, doc=doc)
+        assert doc_mock.return_value == actual['document']
+
+    @mock.patch('lychee.workflow.steps._do_outbound_views')
+    def test_views_converters_with_doc(self, mock_views, temp_doc_sec):
+        '''
+        The views processor receives the shared Document, if there is one.
+        '''
+        dtype = 'mei'
+        doc = document.DocumentSnapshot(temp_doc_sec)
+        mei_mock = mock.MagicMock()
+        mock_views.return_value = {'convert': 'vc', 'placement': 'vp'}
+
+        orig_mei = converters.OUTBOUND_CONVERTERS[dtype]
+        converters.OUTBOUND_CONVERTERS[dtype] = mei_mock
+        try:
+            steps.do_outbound_steps(temp_doc_sec, 'views', dtype, doc)
+        finally:
+            converters.OUTBOUND_CONVERTERS[dtype] = orig_mei
+
+        mock_views.assert_called_once_with(temp_doc_sec, 'views', dtype, doc)
+
     @mock.patch('lychee.workflow.steps._do_outbound_views')
     def test_views_converters(self, mock_views, temp_doc_sec):
         '''
@@ -477,6 +600,37 @@ class TestOutboundSteps(object):
         mei_mock.assert_called_once_with(mock_views.return_value['convert'])
         assert expected == actual
 
+    @mock.patch('lychee.workflow.steps._do_outbound_views')
+    def test_verovio_stream(self, mock_views, temp_doc_sec):
+        '''
+        The "verovio-stream" dtype gives an iterator of chunks that make the same document as the
+        "verovio" dtype.
+        '''
+        section = etree.Element(mei.SECTION)
+        etree.SubElement(etree.SubElement(section, mei.SCORE_DEF), mei.STAFF_DEF, n='1')
+        mock_views.return_value = {'convert': section, 'placement': 'vp'}
+
+        expected = steps.do_outbound_steps(temp_doc_sec, 'views', 'verovio')
+        actual = steps.do_outbound_steps(temp_doc_sec, 'views', 'verovio-stream')
+
+        assert 'verovio-stream' == actual['dtype']
+        assert 'vp' == actual['placement']
+        assert not isinstance(actual['document'], (bytes, unicode))
+        assert expected['document'] == b''.join(actual['document']).decode('utf-8')
+
+    @mock.patch('lychee.converters.outbound.mei.create_measures')
+    @mock.patch('lychee.workflow.steps._do_outbound_views')
+    def test_verovio_stream_error(self, mock_views, mock_create, temp_doc_sec):
+        '''
+        The "verovio-stream" dtype converts the document before do_outbound_steps() returns, so a
+        conversion error is raised there and not while the chunks are consumed.
+        '''
+        mock_views.return_value = {'convert': etree.Element(mei.SECTION), 'placement': 'vp'}
+        mock_create.side_effect = exceptions.OutboundConversionError('no measures')
+
+        with pytest.raises(exceptions.OutboundConversionError):
+            steps.do_outbound_steps(temp_doc_sec, 'views', 'verovio-stream')
+
     def test_empty_document(self, temp_doc):
         '''
         With an outbound dtype that does require views processing, but there are no sections in the
@@ -518,7 +672,7 @@ class TestOutboundSteps(object):
         actual = steps._do_outbound_views(repo_dir, views_info, dtype)
 
         assert expected == actual
-        mock_get_view.assert_called_with(repo_dir, views_info, dtype)
+        mock_get_view.assert_called_with(repo_dir, views_info, dtype, doc=None)
 
     def test_views_doesnt_work(self):
         '''